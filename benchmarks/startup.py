@@ -0,0 +1,102 @@
+"""
+Startup benchmark of the lamblayer CLI.
+
+Measures the wall time of `lamblayer version` and `--help`, and checks that heavy
+modules (boto3, botocore, requests) are not imported by them.
+Exits with 1 if any command is slower than `--max-ms` or imports a heavy module,
+so it can guard the startup latency in CI.
+
+    python benchmarks/startup.py --runs 10 --max-ms 300
+"""
+
+import os
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+import time
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+COMMANDS = [
+    ["version"],
+    ["--help"],
+    ["create", "--help"],
+    ["set", "--help"],
+]
+HEAVY_MODULES = ["boto3", "botocore", "requests"]
+
+RUN_SCRIPT = "import sys; from lamblayer.cli import main; main(sys.argv[1:])"
+# run the command in-process, and report heavy modules left in sys.modules.
+IMPORTS_SCRIPT = """
+import sys, json
+from lamblayer.cli import main
+try:
+    main(sys.argv[2:], standalone_mode=False)
+except SystemExit:
+    pass
+heavy = json.loads(sys.argv[1])
+print(json.dumps(sorted(m for m in heavy if m in sys.modules)))
+"""
+
+
+def run(args, env):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", RUN_SCRIPT] + args,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        check=True,
+    )
+    return (time.perf_counter() - start) * 1000
+
+
+def run_interpreter(env):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", "pass"], env=env, check=True)
+    return (time.perf_counter() - start) * 1000
+
+
+def heavy_imports(args, env):
+    process = subprocess.run(
+        [sys.executable, "-c", IMPORTS_SCRIPT, json.dumps(HEAVY_MODULES)] + args,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(process.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10, help="runs per command")
+    parser.add_argument(
+        "--max-ms", type=float, default=300.0, help="maximum median milliseconds"
+    )
+    args = parser.parse_args()
+
+    env = dict(os.environ, PYTHONPATH=ROOT)
+    # the baseline of the interpreter itself.
+    baseline = statistics.median(run_interpreter(env) for _ in range(args.runs))
+    print(f"{'python -c pass':<24} {baseline:8.1f} ms")
+
+    failed = False
+    for command in COMMANDS:
+        median = statistics.median(run(command, env) for _ in range(args.runs))
+        heavy = heavy_imports(command, env)
+        status = "ok"
+        if median > args.max_ms:
+            status = f"slower than {args.max_ms:.0f} ms"
+            failed = True
+        if heavy:
+            status = f"imports {', '.join(heavy)}"
+            failed = True
+        print(f"{' '.join(['lamblayer'] + command):<24} {median:8.1f} ms  {status}")
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
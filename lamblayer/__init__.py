@@ -1 +1,27 @@
 __version__ = "0.1.0"
+
+from .exceptions import (
+    LamblayerBaseError,
+    LamblayerInvalidOptionError,
+    LamblayerParamValidationError,
+    LamblayerCreateLayerError,
+    LamblayerSetLayerError,
+    LamblayerUpdateFunctionError,
+    LamblayerDownloadError,
+    LamblayerExtractError,
+    LamblayerResolveLayerError,
+    LamblayerInventoryError,
+    LamblayerPruneError,
+    LamblayerAnalyzeError,
+    LamblayerProfileError,
+)
+
+
+def __getattr__(name):
+    # the client imports boto3, so it is imported on first access,
+    # and the CLI can read __version__ without it.
+    if name == "LamblayerClient":
+        from .client import LamblayerClient
+
+        return LamblayerClient
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,412 @@
+import os
+import io
+import json
+import zipfile
+
+import click
+from botocore.exceptions import BotoCoreError, ClientError
+from requests.exceptions import RequestException
+
+from .lamblayer import Lamblayer, DEFAULT_MAX_WORKERS
+from .set import expand_function_paths, load_function_json, resolve_layers
+from .init import get_http_session, get_layer_content
+from .resolver import LayerResolver
+from .split import MAX_UNZIPPED_SIZE, get_unit
+from .cache import get_cache_dir, write_json_atomic
+from .utils import RecordWriter
+from .exceptions import LamblayerAnalyzeError
+
+
+# the end of central directory record is within the last 64 KiB + 22 bytes,
+# and the central directory of a small layer is also in it.
+TAIL_SIZE = 128 * 1024
+COLUMNS = ["FunctionName", "Kind", "Package", "Files", "Bytes", "Layers"]
+
+
+class Analyze(Lamblayer):
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
+
+    def __call__(self, *args, **kwargs):
+        return self.analyze(*args, **kwargs)
+
+    def analyze(
+        self,
+        function_paths,
+        output="table",
+        max_workers=DEFAULT_MAX_WORKERS,
+        rate_limit=None,
+        lockfile=None,
+    ):
+        """
+        Show the files shipped in more than one layer of each function.
+
+        Params
+        ======
+        function_paths: str, list
+            function config file paths, directories, glob patterns or manifest files.
+        output: str
+            the format of the records. [json | ndjson | csv | table]
+        max_workers: int
+            the maximum number of concurrent API calls and HTTP requests.
+        rate_limit: float
+            the maximum number of API calls per second.
+        lockfile: str
+            resolve layer names from this lockfile, as `set` does. it is not written.
+
+        Returns
+        =======
+        reports: list
+            reports from `analyze_functions`
+        """
+        if rate_limit is not None:
+            # a copy with its own retrier, so the rate limit applies only to this call.
+            params = dict(locals(), rate_limit=None)
+            del params["self"]
+            return self._with_rate_limit(rate_limit).analyze(**params)
+        if isinstance(function_paths, str):
+            function_paths = [function_paths]
+
+        functions = [
+            function
+            for path in expand_function_paths(function_paths)
+            for function in load_function_json(path)[1]
+        ]
+        reports = self.analyze_functions(functions, max_workers, lockfile)
+
+        with RecordWriter(output, COLUMNS) as writer:
+            writer.write([record for report in reports for record in report["Records"]])
+        if output == "table":
+            for report in reports:
+                click.echo(format_summary(report))
+
+        failed = [report for report in reports if report["Status"] == "failed"]
+        if failed:
+            raise LamblayerAnalyzeError(
+                f"failed to analyze {len(failed)} of {len(reports)} functions."
+            )
+        return reports
+
+    def analyze_functions(
+        self, functions, max_workers=DEFAULT_MAX_WORKERS, lockfile=None
+    ):
+        """
+        Find the files shipped in more than one layer of each function.
+
+        Layer specs are resolved as `set` does, and the central directory of each
+        layer version is read by HTTP Range requests, without downloading the files.
+        The files are indexed by path, and the copies of a path in the earlier layers
+        are overwritten in `/opt` by the last one. The earlier copies are
+        - "duplicated", if they have the same CRC and size as the last one.
+        - "shadowed", otherwise, which is a different version of the file.
+
+        Params
+        ======
+        functions: list
+            dicts of "FunctionName" and "Layers". "Layers" are replaced by
+            the resolved ARNs in place.
+        max_workers: int
+            the maximum number of concurrent API calls and HTTP requests.
+        lockfile: str
+            resolve layer names from this lockfile. it is not written.
+
+        Returns
+        =======
+        reports: list
+            dicts of "FunctionName", "Status", "Layers", "UnzippedSize",
+            "DuplicatedBytes", "ShadowedBytes", "Records" and "Error" for each function.
+            Status is "analyzed" or "failed". Records are dicts of the COLUMNS,
+            the largest first.
+        """
+        client = self._get_client("lambda")
+        resolver = LayerResolver(
+            client,
+            self.retrier,
+            self.session.region_name,
+            self.account_id if lockfile else None,
+            self.profile,
+            lockfile,
+            logger=self.logger,
+        )
+        errors = resolve_layers(functions, resolver, max_workers, self.logger)
+
+        http = get_http_session(max_workers)
+        layer_version_arns = sorted(
+            {
+                arn
+                for function in functions
+                for arn in function["Layers"]
+                if arn not in errors
+            }
+        )
+        self.logger.info(f"reading {len(layer_version_arns)} layers")
+        listings = dict(
+            zip(
+                layer_version_arns,
+                self._map_concurrently(
+                    lambda arn: self._list_layer(arn, client, http),
+                    layer_version_arns,
+                    max_workers,
+                ),
+            )
+        )
+
+        reports = []
+        for function in functions:
+            report = {
+                "FunctionName": function["FunctionName"],
+                "Status": "analyzed",
+                "Layers": function["Layers"],
+                "UnzippedSize": 0,
+                "DuplicatedBytes": 0,
+                "ShadowedBytes": 0,
+                "Records": [],
+                "Error": None,
+            }
+            function_errors = [
+                errors[arn] if arn in errors else listings[arn]["Error"]
+                for arn in function["Layers"]
+                if arn in errors or listings[arn]["Error"]
+            ]
+            if function_errors:
+                report["Status"] = "failed"
+                report["Error"] = function_errors[0]
+            else:
+                report.update(
+                    self._analyze_layers(
+                        function["FunctionName"],
+                        function["Layers"],
+                        [listings[arn]["Files"] for arn in function["Layers"]],
+                    )
+                )
+            reports.append(report)
+        return reports
+
+    def _analyze_layers(self, function_name, layer_version_arns, listings):
+        """
+        Index the files of the layers by path, and sum up the earlier copies
+        by package.
+
+        Params
+        ======
+        function_name: str
+            the name of the function
+        layer_version_arns: list
+            the ARNs of the layer versions, in the order of the function.
+        listings: list
+            the files of each layer from `_list_layer`.
+
+        Returns
+        =======
+        report: dict
+            "UnzippedSize", "DuplicatedBytes", "ShadowedBytes" and "Records".
+        """
+        # ex) arn:aws:lambda:us-east-1:123456789012:layer:my_layer:3 -> my_layer:3
+        layer_names = [":".join(arn.split(":")[6:8]) for arn in layer_version_arns]
+        copies = {}
+        unzipped_size = 0
+        for i, files in enumerate(listings):
+            for name, crc, size in files:
+                copies.setdefault(name, []).append((i, crc, size))
+                unzipped_size += size
+
+        groups = {}
+        for name, path_copies in copies.items():
+            if len(path_copies) < 2:
+                continue
+            last = path_copies[-1]
+            for i, crc, size in path_copies[:-1]:
+                kind = "duplicated" if (crc, size) == last[1:] else "shadowed"
+                layers = tuple(layer_names[j] for j, _, _ in path_copies)
+                key = (kind, get_unit(name), layers)
+                files, total = groups.get(key, (0, 0))
+                groups[key] = (files + 1, total + size)
+
+        records = [
+            {
+                "FunctionName": function_name,
+                "Kind": kind,
+                "Package": package,
+                "Files": files,
+                "Bytes": total,
+                "Layers": list(layers),
+            }
+            for (kind, package, layers), (files, total) in groups.items()
+        ]
+        records.sort(key=lambda record: (-record["Bytes"], record["Package"]))
+
+        if unzipped_size > MAX_UNZIPPED_SIZE:
+            self.logger.warning(
+                f"{function_name}: the layers are {unzipped_size} bytes unzipped, "
+                f"over the limit of {MAX_UNZIPPED_SIZE} bytes."
+            )
+        return {
+            "UnzippedSize": unzipped_size,
+            "DuplicatedBytes": sum(
+                record["Bytes"] for record in records if record["Kind"] == "duplicated"
+            ),
+            "ShadowedBytes": sum(
+                record["Bytes"] for record in records if record["Kind"] == "shadowed"
+            ),
+            "Records": records,
+        }
+
+    def _list_layer(self, layer_version_arn, client, http):
+        """
+        Return the files in the layer zip content.
+
+        A layer version is immutable, so the listing is cached by its CodeSha256
+        at `{cache_dir}/listings/`.
+
+        Params
+        ======
+        layer_version_arn: str
+            the ARN of the layer version
+        client: Lambda.Client
+        http: requests.Session
+
+        Returns
+        =======
+        listing: dict
+            "Files", a list of [name, CRC, size] of the files, and "Error".
+        """
+        try:
+            content_url, code_sha256 = get_layer_content(
+                layer_version_arn, client, self.retrier
+            )
+            listing_path = os.path.join(
+                get_cache_dir(),
+                "listings",
+                code_sha256.replace("/", "_").replace("+", "-") + ".json",
+            )
+            try:
+                with open(listing_path, "r") as f:
+                    return {"Files": json.load(f), "Error": None}
+            except (FileNotFoundError, ValueError):
+                pass
+
+            fileobj = HTTPRangeFile(content_url, http)
+            with zipfile.ZipFile(fileobj) as zf:
+                files = [
+                    [info.filename, info.CRC, info.file_size]
+                    for info in zf.infolist()
+                    if not info.is_dir()
+                ]
+            self.logger.debug(
+                f"{layer_version_arn}: {len(files)} files, "
+                f"read {fileobj.bytes_read} of {fileobj.size} bytes "
+                f"in {fileobj.requests} requests"
+            )
+            write_json_atomic(listing_path, files, indent=None)
+        except (
+            BotoCoreError,
+            ClientError,
+            RequestException,
+            zipfile.BadZipFile,
+            LamblayerAnalyzeError,
+        ) as e:
+            error = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{layer_version_arn}: {error}")
+            return {"Files": [], "Error": error}
+        return {"Files": files, "Error": None}
+
+
+class HTTPRangeFile(io.RawIOBase):
+    """
+    A read-only file of a url, which is read by HTTP Range requests on demand.
+
+    zipfile reads only the end of central directory record and the central directory,
+    so a layer zip is listed in one or two requests without downloading the files.
+    A server without Range support returns the whole content in the first request.
+    """
+
+    def __init__(self, url, http, tail_size=TAIL_SIZE):
+        self.url = url
+        self.http = http
+        self.position = 0
+        self.requests = 0
+        self.bytes_read = 0
+        response = self._get(f"bytes=-{tail_size}")
+        if response.status_code == 206:
+            self.size = int(response.headers["Content-Range"].split("/")[-1])
+        else:
+            self.size = len(response.content)
+        self.buffer = response.content
+        self.buffer_offset = self.size - len(self.buffer)
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self.position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self.position + offset
+        elif whence == io.SEEK_END:
+            position = self.size + offset
+        else:
+            raise ValueError(f"invalid whence: {whence}")
+        if position < 0:
+            # zipfile expects OSError as a real file raises.
+            raise OSError(f"negative seek position: {position}")
+        self.position = position
+        return self.position
+
+    def readinto(self, b):
+        end = min(self.position + len(b), self.size)
+        if self.position >= end:
+            return 0
+        # zipfile expects a read to return all bytes, so the range is fetched
+        # unless the buffer has all of it.
+        if not (
+            self.buffer_offset <= self.position
+            and end <= self.buffer_offset + len(self.buffer)
+        ):
+            response = self._get(f"bytes={self.position}-{end - 1}")
+            if response.status_code != 206:
+                raise LamblayerAnalyzeError(
+                    f"the server doesn't support Range requests: {response.status_code}"
+                )
+            self.buffer = response.content
+            self.buffer_offset = self.position
+
+        start = self.position - self.buffer_offset
+        data = self.buffer[start : end - self.buffer_offset]
+        b[: len(data)] = data
+        self.position += len(data)
+        return len(data)
+
+    def _get(self, byte_range):
+        response = self.http.get(self.url, headers={"Range": byte_range})
+        response.raise_for_status()
+        self.requests += 1
+        self.bytes_read += len(response.content)
+        return response
+
+
+def format_summary(report):
+    """
+    Format the summary of a report from `Analyze.analyze_functions`.
+    """
+    if report["Status"] == "failed":
+        return f"{report['FunctionName']}: failed, {report['Error']}"
+    duplicated = sum(
+        record["Files"]
+        for record in report["Records"]
+        if record["Kind"] == "duplicated"
+    )
+    shadowed = sum(
+        record["Files"] for record in report["Records"] if record["Kind"] == "shadowed"
+    )
+    return (
+        f"{report['FunctionName']}: {len(report['Layers'])} layers, "
+        f"{report['UnzippedSize']} bytes unzipped, "
+        f"{report['DuplicatedBytes']} bytes duplicated in {duplicated} files, "
+        f"{report['ShadowedBytes']} bytes shadowed in {shadowed} files."
+    )
@@ -0,0 +1,525 @@
+import os
+import zlib
+import time
+import stat
+import shutil
+import struct
+import hashlib
+import zipfile
+import fnmatch
+import threading
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from .cache import CHUNK_SIZE
+from .exceptions import LamblayerCreateLayerError, LamblayerExtractError
+
+
+# the earliest timestamp which can be represented in a zip archive.
+REPRODUCIBLE_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+# the default deflate level, the same as zlib's default.
+COMPRESS_LEVEL = 6
+
+ZIP_STORED = zipfile.ZIP_STORED
+ZIP_DEFLATED = zipfile.ZIP_DEFLATED
+ZIP_VERSION = 20
+ZIP_MAX_ENTRIES = 0xFFFF
+ZIP_MAX_SIZE = 0xFFFFFFFF
+UNIX_SYSTEM = 3
+UTF8_FLAG = 0x800
+
+LOCAL_HEADER = struct.Struct("<IHHHHHIIIHH")
+LOCAL_HEADER_SIGNATURE = 0x04034B50
+CENTRAL_HEADER = struct.Struct("<IHHHHHHIIIHHHHHII")
+CENTRAL_HEADER_SIGNATURE = 0x02014B50
+END_OF_CENTRAL_DIRECTORY = struct.Struct("<IHHHHIIH")
+END_OF_CENTRAL_DIRECTORY_SIGNATURE = 0x06054B50
+
+# an entry of the zip archive, data is already compressed by compress_type.
+ZipEntry = namedtuple(
+    "ZipEntry",
+    [
+        "arcname",
+        "date_time",
+        "external_attr",
+        "compress_type",
+        "crc",
+        "file_size",
+        "data",
+    ],
+)
+
+
+def iter_layer_entries(src, wrap_dir1="", wrap_dir2=""):
+    """
+    Walk the src directory once, and yield the entries of the layer archive.
+    In layer, folder structure will be following, `{wrap_dir1}/{wrap_dir2}/your_files`.
+
+    Params
+    ======
+    src: str
+        a root directory to put in the layer.
+    wrap_dir1: str
+        a wrap directory1 name.
+    wrap_dir2: str
+        a wrap directory2 name.
+
+    Yields
+    ======
+    path: str
+        the path of the file or directory on the local filesystem.
+    arcname: str
+        the name of the entry in the archive. directory names end with "/".
+    """
+    if not os.path.isdir(src):
+        raise FileNotFoundError(f"No such directory: '{src}'")
+
+    prefix = "/".join(d.strip("/") for d in (wrap_dir1, wrap_dir2) if d.strip("/"))
+
+    # wrap directories themselves have no counterpart under src.
+    if prefix:
+        parts = prefix.split("/")
+        for i in range(1, len(parts) + 1):
+            yield src, "/".join(parts[:i]) + "/"
+
+    # follow symlinks, in the same way as `shutil.copytree` did.
+    for root, dirs, files in os.walk(src, followlinks=True):
+        # sort in place, so that the walk order does not depend on the filesystem.
+        dirs.sort()
+        files.sort()
+        rel_root = os.path.relpath(root, src)
+        rel_root = "" if rel_root == os.curdir else rel_root.replace(os.sep, "/")
+        base = "/".join(p for p in (prefix, rel_root) if p)
+
+        if rel_root:
+            yield root, base + "/"
+        for name in files:
+            arcname = f"{base}/{name}" if base else name
+            yield os.path.join(root, name), arcname
+
+
+def write_ziparchive(
+    fileobj,
+    entries,
+    reproducible=False,
+    index=None,
+    compress_level=COMPRESS_LEVEL,
+    store=None,
+    jobs=None,
+):
+    """
+    Write a zip archive of the entries into fileobj.
+    Each file is deflated in memory and written into the archive, without any temporary copy.
+
+    Entries are compressed on a thread pool (zlib releases the GIL while compressing),
+    and written in the order of entries, so the archive does not depend on jobs.
+
+    If reproducible is True, the archive only depends on the file contents,
+    entries have a fixed timestamp, normalized modes and a fixed compression level.
+
+    Params
+    ======
+    fileobj: file object
+        a writable binary file object.
+    entries: iterable
+        (path, arcname) pairs, ex) from `iter_layer_entries`
+    reproducible: bool
+        write a reproducible archive, or not.
+    index: FileIndex
+        reuse the deflated contents of unchanged files from the index, or None.
+    compress_level: int
+        the deflate level from 1 (fastest) to 9 (smallest), or 0 to store all files.
+    store: list
+        glob patterns of arcnames which are stored without compression,
+        ex) already compressed files like "*.whl" or "*.gz".
+    jobs: int
+        the number of compression threads. default: the number of CPUs.
+
+    """
+    store = list(store or [])
+    jobs = jobs or os.cpu_count() or 1
+    # the entries are only (path, arcname) pairs, so the count is checked before writing.
+    entries = list(entries)
+    if len(entries) > ZIP_MAX_ENTRIES:
+        raise LamblayerCreateLayerError(
+            f"zip archive exceeds {ZIP_MAX_ENTRIES} entries: {len(entries)} entries"
+        )
+
+    def compress(entry):
+        path, arcname = entry
+        stored = compress_level == 0 or any(
+            fnmatch.fnmatchcase(arcname, pattern) for pattern in store
+        )
+        return _compress_entry(
+            path, arcname, reproducible, index, None if stored else compress_level
+        )
+
+    writer = ZipWriter(fileobj)
+    if jobs <= 1:
+        for entry in entries:
+            writer.write(compress(entry))
+    else:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            for zip_entry in _map_ordered(executor, compress, entries, jobs * 4):
+                writer.write(zip_entry)
+    writer.close()
+
+
+def _map_ordered(executor, func, items, window):
+    """
+    Yield func(item) in the order of items, keeping at most window items in flight,
+    so that the memory usage does not depend on the number of items.
+    """
+    pending = deque()
+    for item in items:
+        pending.append(executor.submit(func, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+class ZipWriter:
+    """
+    A minimal zip archive writer, which takes entries already compressed.
+    Unlike `zipfile.ZipFile`, the compressed data of an entry can come from anywhere,
+    ex) the pack of the last build, so unchanged files are never compressed again.
+
+    The limits of a zip archive without ZIP64 are checked before an entry is written,
+    so the central directory written by `close` always fits.
+    """
+
+    def __init__(self, fileobj):
+        self.fileobj = fileobj
+        self.offset = 0
+        self.central_directory = []
+        self.central_directory_size = 0
+
+    def write(self, entry):
+        """
+        Write the local header and the data of the entry.
+
+        Params
+        ======
+        entry: ZipEntry
+            the compressed entry.
+        """
+        if len(self.central_directory) >= ZIP_MAX_ENTRIES:
+            raise LamblayerCreateLayerError(
+                f"zip archive exceeds {ZIP_MAX_ENTRIES} entries at {entry.arcname}"
+            )
+        if entry.file_size > ZIP_MAX_SIZE or len(entry.data) > ZIP_MAX_SIZE:
+            raise LamblayerCreateLayerError(
+                f"zip archive exceeds 4 GiB at {entry.arcname}"
+            )
+        try:
+            name = entry.arcname.encode("ascii")
+            flags = 0
+        except UnicodeEncodeError:
+            name = entry.arcname.encode("utf-8")
+            flags = UTF8_FLAG
+        dostime, dosdate = _dos_date_time(entry.date_time)
+
+        header = LOCAL_HEADER.pack(
+            LOCAL_HEADER_SIGNATURE,
+            ZIP_VERSION,
+            flags,
+            entry.compress_type,
+            dostime,
+            dosdate,
+            entry.crc,
+            len(entry.data),
+            entry.file_size,
+            len(name),
+            0,
+        )
+        central_header = (
+            CENTRAL_HEADER.pack(
+                CENTRAL_HEADER_SIGNATURE,
+                UNIX_SYSTEM << 8 | ZIP_VERSION,
+                ZIP_VERSION,
+                flags,
+                entry.compress_type,
+                dostime,
+                dosdate,
+                entry.crc,
+                len(entry.data),
+                entry.file_size,
+                len(name),
+                0,
+                0,
+                0,
+                0,
+                entry.external_attr,
+                self.offset,
+            )
+            + name
+        )
+        # the offsets of the next entry and the central directory must fit in 4 bytes.
+        end = self.offset + len(header) + len(name) + len(entry.data)
+        if end + self.central_directory_size + len(central_header) > ZIP_MAX_SIZE:
+            raise LamblayerCreateLayerError(
+                f"zip archive exceeds 4 GiB at {entry.arcname}"
+            )
+        self.central_directory.append(central_header)
+        self.central_directory_size += len(central_header)
+        self.fileobj.write(header)
+        self.fileobj.write(name)
+        self.fileobj.write(entry.data)
+        self.offset = end
+
+    def close(self):
+        """
+        Write the central directory and the end of central directory record.
+        """
+        central_directory = b"".join(self.central_directory)
+        self.fileobj.write(central_directory)
+        self.fileobj.write(
+            END_OF_CENTRAL_DIRECTORY.pack(
+                END_OF_CENTRAL_DIRECTORY_SIGNATURE,
+                0,
+                0,
+                len(self.central_directory),
+                len(self.central_directory),
+                len(central_directory),
+                self.offset,
+                0,
+            )
+        )
+
+
+def _compress_entry(
+    path, arcname, reproducible, index=None, compress_level=COMPRESS_LEVEL
+):
+    """
+    Compress an entry of the archive.
+
+    Params
+    ======
+    path: str
+        the path of the file or directory on the local filesystem.
+    arcname: str
+        the name of the entry in the archive.
+    reproducible: bool
+        use a fixed timestamp and a normalized mode, or not.
+    index: FileIndex
+        the index to look up the deflated content of the file, or None.
+    compress_level: int
+        the deflate level, or None to store the file without compression.
+
+    Returns
+    =======
+    entry: ZipEntry
+    """
+    st = os.stat(path)
+    if reproducible:
+        date_time = REPRODUCIBLE_DATE_TIME
+    else:
+        date_time = _mtime_date_time(st.st_mtime)
+
+    if arcname.endswith("/"):
+        mode = stat.S_IFDIR | 0o755 if reproducible else st.st_mode
+        # 0x10 is the MS-DOS directory flag.
+        return ZipEntry(arcname, date_time, mode << 16 | 0x10, ZIP_STORED, 0, 0, b"")
+
+    if reproducible:
+        # only the executable bit survives from the original permission.
+        executable = st.st_mode & stat.S_IXUSR
+        mode = stat.S_IFREG | (0o755 if executable else 0o644)
+    else:
+        mode = st.st_mode
+
+    if compress_level is None:
+        crc, file_size, data = _read_file(path)
+        return ZipEntry(
+            arcname, date_time, mode << 16, ZIP_STORED, crc, file_size, data
+        )
+
+    if index is None:
+        crc, file_size, data = _deflate_file(path, compress_level)
+    else:
+        digest = index.hash(path)
+        deflated = index.get_deflated(digest, compress_level)
+        if deflated is None:
+            deflated = _deflate_file(path, compress_level)
+        index.put_deflated(digest, compress_level, *deflated)
+        crc, file_size, data = deflated
+    return ZipEntry(arcname, date_time, mode << 16, ZIP_DEFLATED, crc, file_size, data)
+
+
+def _deflate_file(path, compress_level=COMPRESS_LEVEL):
+    """
+    Return (crc, file_size, data) of the file, data is the raw deflate stream.
+    """
+    compressor = zlib.compressobj(compress_level, zlib.DEFLATED, -zlib.MAX_WBITS)
+    crc = 0
+    file_size = 0
+    chunks = []
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+            file_size += len(chunk)
+            chunks.append(compressor.compress(chunk))
+    chunks.append(compressor.flush())
+    return crc, file_size, b"".join(chunks)
+
+
+def _read_file(path):
+    """
+    Return (crc, file_size, data) of the file, data is the content as is.
+    """
+    with open(path, "rb") as f:
+        data = f.read()
+    return zlib.crc32(data), len(data), data
+
+
+def _mtime_date_time(mtime):
+    """
+    Return the local date_time of mtime, in the same way as `zipfile.ZipFile.write`.
+    """
+    date_time = time.localtime(mtime)[:6]
+    if date_time < REPRODUCIBLE_DATE_TIME:
+        return REPRODUCIBLE_DATE_TIME
+    return date_time
+
+
+def _dos_date_time(date_time):
+    """
+    Return (time, date) of date_time in the MS-DOS format.
+    """
+    year, month, day, hour, minute, second = date_time
+    dosdate = (year - 1980) << 9 | month << 5 | day
+    dostime = hour << 11 | minute << 5 | second // 2
+    return dostime, dosdate
+
+
+def extract_layers(zip_paths, dest, store=None):
+    """
+    Extract layer zip archives into a merged directory, in the same way as
+    Lambda extracts layers into `/opt`. Layers are applied in order, so a file
+    of the later layer overrides the same path of the earlier layers.
+
+    Overridden files are never written, and files already present in dest with
+    the same size and CRC are skipped.
+    If store is passed, each file is written once into the content addressed store,
+    and hardlinked into dest, so that dest directories of many functions share it.
+
+    Params
+    ======
+    zip_paths: list
+        layer zip archive paths, in the order of the function layers.
+    dest: str
+        the merged directory.
+    store: str
+        the content addressed store directory, or None.
+
+    Returns
+    =======
+    stats: dict
+        the number of "written", "linked" and "skipped" files.
+    """
+    # find the winner of each path, the last layer wins.
+    winners = {}
+    for zip_path in zip_paths:
+        with zipfile.ZipFile(zip_path) as zf:
+            for zinfo in zf.infolist():
+                winners[zinfo.filename] = zip_path
+
+    stats = {"written": 0, "linked": 0, "skipped": 0}
+    for zip_path in zip_paths:
+        with zipfile.ZipFile(zip_path) as zf:
+            for zinfo in zf.infolist():
+                if winners[zinfo.filename] != zip_path:
+                    continue
+                target = _safe_join(dest, zinfo.filename)
+                if zinfo.is_dir():
+                    os.makedirs(target, exist_ok=True)
+                    continue
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+
+                if _has_same_content(target, zinfo):
+                    stats["skipped"] += 1
+                elif store is not None:
+                    _link_member(zf, zinfo, target, store)
+                    stats["linked"] += 1
+                else:
+                    _extract_member(zf, zinfo, target)
+                    stats["written"] += 1
+    return stats
+
+
+def _safe_join(dest, arcname):
+    """
+    Join the arcname to dest, refusing the path which escapes from dest.
+    """
+    target = os.path.normpath(os.path.join(dest, arcname))
+    if os.path.isabs(arcname) or not (
+        target == os.path.normpath(dest)
+        or target.startswith(os.path.normpath(dest) + os.sep)
+    ):
+        raise LamblayerExtractError(f"unsafe path in layer: {arcname}")
+    return target
+
+
+def _member_mode(zinfo):
+    """
+    Return the permission of the member, only the executable bit is respected.
+    """
+    executable = (zinfo.external_attr >> 16) & stat.S_IXUSR
+    return 0o755 if executable else 0o644
+
+
+def _has_same_content(path, zinfo):
+    """
+    Return whether the file has the same size and CRC as the member.
+    """
+    if not os.path.isfile(path) or os.path.getsize(path) != zinfo.file_size:
+        return False
+    crc = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            crc = zlib.crc32(chunk, crc)
+    return crc == zinfo.CRC
+
+
+def _extract_member(zf, zinfo, target):
+    """
+    Stream the member into target.
+    The file is replaced rather than overwritten, which keeps hardlinked files intact.
+    """
+    temp_path = f"{target}.{os.getpid()}.tmp"
+    with zf.open(zinfo) as src_f, open(temp_path, "wb") as dst_f:
+        shutil.copyfileobj(src_f, dst_f, CHUNK_SIZE)
+    os.chmod(temp_path, _member_mode(zinfo))
+    os.replace(temp_path, target)
+
+
+def _link_member(zf, zinfo, target, store):
+    """
+    Store the member into the content addressed store, and hardlink it into target.
+    If a hardlink is not allowed (ex. across filesystems), the object is copied.
+    """
+    os.makedirs(store, exist_ok=True)
+    temp_path = os.path.join(store, f"{os.getpid()}-{threading.get_ident()}.tmp")
+    h = hashlib.sha256()
+    with zf.open(zinfo) as src_f, open(temp_path, "wb") as dst_f:
+        for chunk in iter(lambda: src_f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+            dst_f.write(chunk)
+
+    mode = _member_mode(zinfo)
+    digest = h.hexdigest()
+    object_path = os.path.join(store, digest[:2], f"{digest}-{mode:o}")
+    if os.path.exists(object_path):
+        os.remove(temp_path)
+    else:
+        os.makedirs(os.path.dirname(object_path), exist_ok=True)
+        os.chmod(temp_path, mode)
+        os.replace(temp_path, object_path)
+
+    temp_target = f"{target}.{os.getpid()}.tmp"
+    try:
+        os.link(object_path, temp_target)
+    except OSError:
+        shutil.copy2(object_path, temp_target)
+    os.replace(temp_target, target)
@@ -0,0 +1,443 @@
+import os
+import json
+import time
+import base64
+import hashlib
+import threading
+
+
+CHUNK_SIZE = 1024 * 1024
+# files modified within this window of the index are hashed again on the next build,
+# since a later change in the same timestamp granularity is not visible in the stat.
+RACY_WINDOW_NS = 2 * 10**9
+# deflated contents unused for this seconds are dropped from the pack.
+PACK_ENTRY_TTL = 7 * 24 * 60 * 60
+# the pack is compacted when the dropped contents exceed both this size and the live ones.
+PACK_COMPACT_MIN_SIZE = 64 * 1024 * 1024
+
+
+def get_cache_dir():
+    """
+    Return the root directory of the lamblayer cache.
+
+    The directory is searched in the following order,
+    1. Environment variable LAMBLAYER_CACHE_DIR
+    2. $XDG_CACHE_HOME/lamblayer
+    3. ~/.cache/lamblayer
+
+    Returns
+    =======
+    cache_dir: str
+        the root directory of the lamblayer cache
+    """
+    cache_dir = os.getenv("LAMBLAYER_CACHE_DIR")
+    if cache_dir:
+        return cache_dir
+    xdg_cache_home = os.getenv("XDG_CACHE_HOME") or os.path.join(
+        os.path.expanduser("~"), ".cache"
+    )
+    return os.path.join(xdg_cache_home, "lamblayer")
+
+
+def hash_file(path):
+    """
+    Return the sha256 hex digest of the file content.
+
+    Params
+    ======
+    path: str
+        the file path
+
+    Returns
+    =======
+    digest: str
+        sha256 hex digest of the file content
+    """
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def get_code_sha256(fileobj):
+    """
+    Return the CodeSha256 of the file object, reading it to the end.
+
+    Params
+    ======
+    fileobj: file object
+        a readable binary file object.
+
+    Returns
+    =======
+    code_sha256: str
+        base64 encoded sha256 digest, in the same format as Lambda API.
+    """
+    h = hashlib.sha256()
+    for chunk in iter(lambda: fileobj.read(CHUNK_SIZE), b""):
+        h.update(chunk)
+    return base64.b64encode(h.digest()).decode()
+
+
+def tree_digest(entries, params, index=None):
+    """
+    Return a digest of the layer, which is keyed by the per-file content hash
+    of the tree and the layer parameters.
+
+    Params
+    ======
+    entries: iterable
+        (path, arcname) pairs of the layer archive
+    params: dict
+        the layer parameters of layer.json
+    index: FileIndex
+        the index to look up the content hashes, or None to hash every file.
+
+    Returns
+    =======
+    digest: str
+        sha256 hex digest of the layer
+    """
+    hash_func = index.hash if index is not None else hash_file
+    h = hashlib.sha256()
+    h.update(json.dumps(params, sort_keys=True).encode())
+    for path, arcname in sorted(entries, key=lambda entry: entry[1]):
+        if arcname.endswith("/"):
+            h.update(f"\0D\0{arcname}".encode())
+        else:
+            h.update(f"\0F\0{arcname}\0{hash_func(path)}".encode())
+    return h.hexdigest()
+
+
+def write_json_atomic(path, obj, indent=2):
+    """
+    Write obj as json into path, replacing the file atomically.
+
+    Params
+    ======
+    path: str
+        the file path
+    obj: dict
+        json serializable object
+    indent: int
+        the indent of json, or None for the compact format.
+    """
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(obj, f, indent=indent)
+    os.replace(temp_path, path)
+
+
+class LayerCache:
+    """
+    A local manifest cache of the published layer versions.
+    The manifest is stored as `{cache_dir}/layers/{digest}.json`.
+    """
+
+    def __init__(self, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        self.path = os.path.join(cache_dir, "layers")
+
+    def get(self, digest, region, account_id):
+        """
+        Return the cached layer version of the digest.
+
+        Params
+        ======
+        digest: str
+            digest of the layer
+        region: str
+            AWS region
+        account_id: str
+            AWS account id
+
+        Returns
+        =======
+        layer_version: dict or None
+            {"LayerVersionArn": str, "CodeSha256": str}, or None if not cached.
+        """
+        manifest = self._load(digest)
+        return manifest["Versions"].get(f"{region}:{account_id}")
+
+    def put(self, digest, region, account_id, layer_version_arn, code_sha256):
+        """
+        Store the published layer version of the digest.
+
+        Params
+        ======
+        digest: str
+            digest of the layer
+        region: str
+            AWS region
+        account_id: str
+            AWS account id
+        layer_version_arn: str
+            the ARN of the layer version
+        code_sha256: str
+            the CodeSha256 of the layer version
+        """
+        manifest = self._load(digest)
+        manifest["Versions"][f"{region}:{account_id}"] = {
+            "LayerVersionArn": layer_version_arn,
+            "CodeSha256": code_sha256,
+        }
+        write_json_atomic(self._manifest_path(digest), manifest)
+
+    def _manifest_path(self, digest):
+        return os.path.join(self.path, f"{digest}.json")
+
+    def _load(self, digest):
+        try:
+            with open(self._manifest_path(digest), "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {"Versions": {}}
+
+
+class FileIndex:
+    """
+    A persistent index of the files under root, which maps the stat fingerprint
+    (size, mtime_ns, inode, ctime_ns) of each file to its content hash, so the next build
+    only hashes the files whose fingerprint has changed.
+
+    The deflated contents are kept in a pack file next to the index, so unchanged files
+    are not compressed again either. The pack is append-only, a build writes only
+    the newly deflated contents at its end, and the index keeps the offset of each one.
+    Contents unused for PACK_ENTRY_TTL are dropped from the index, and the pack is
+    compacted once the dropped contents take more than the half of it.
+    The index is stored as `{cache_dir}/index/{sha256 of root}.json`, and the pack as
+    `{cache_dir}/index/{sha256 of root}.pack`.
+
+    If root is None, the index is not persisted, and only memoizes the hashes in a build.
+    """
+
+    def __init__(self, root=None, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        self.root = os.path.abspath(root) if root is not None else None
+        self.started_at = time.time_ns()
+        self.files = {}
+        self.seen = {}
+        self.hashed = 0
+        self.reused = 0
+
+        self.deflated = {}
+        self.pack_fd = None
+        self.append_fd = None
+        self.lock = threading.Lock()
+
+        self.path = None
+        if self.root is not None:
+            key = hashlib.sha256(self.root.encode()).hexdigest()
+            self.path = os.path.join(cache_dir, "index", f"{key}.json")
+            self.pack_path = os.path.join(cache_dir, "index", f"{key}.pack")
+            self._load()
+
+    def hash(self, path):
+        """
+        Return the sha256 hex digest of the file content,
+        which is hashed only if the fingerprint differs from the index.
+
+        Params
+        ======
+        path: str
+            the file path
+
+        Returns
+        =======
+        digest: str
+            sha256 hex digest of the file content
+        """
+        key = os.path.abspath(path)
+        record = self.seen.get(key)
+        if record is not None:
+            return record[4]
+
+        # ctime changes on any write even if mtime is set back, ex) by `touch -d`.
+        st = os.stat(key)
+        fingerprint = [st.st_size, st.st_mtime_ns, st.st_ino, st.st_ctime_ns]
+        record = self.files.get(key)
+        if record is not None and record[:4] == fingerprint:
+            self.reused += 1
+        else:
+            record = fingerprint + [hash_file(key)]
+            self.hashed += 1
+        self.seen[key] = record
+        return record[4]
+
+    def get_deflated(self, digest, level):
+        """
+        Return the deflated content of the digest from the pack.
+
+        Params
+        ======
+        digest: str
+            sha256 hex digest of the file content
+        level: int
+            the compression level
+
+        Returns
+        =======
+        deflated: tuple or None
+            (crc, file_size, data), or None if not packed.
+        """
+        record = self.deflated.get(f"{level}:{digest}")
+        if record is None or self.pack_fd is None:
+            return None
+        crc, file_size, offset, length = record[:4]
+        data = os.pread(self.pack_fd, length, offset)
+        if len(data) != length:
+            return None
+        record[4] = self.started_at // 10**9
+        return crc, file_size, data
+
+    def put_deflated(self, digest, level, crc, file_size, data):
+        """
+        Append the deflated content of the digest to the pack for the next builds.
+        A content which is already packed is not written again.
+
+        Params
+        ======
+        digest: str
+            sha256 hex digest of the file content
+        level: int
+            the compression level
+        crc: int
+            CRC-32 of the file content
+        file_size: int
+            the uncompressed size
+        data: bytes
+            the raw deflate stream
+        """
+        if self.path is None:
+            return
+        key = f"{level}:{digest}"
+        used_at = self.started_at // 10**9
+        with self.lock:
+            record = self.deflated.get(key)
+            if record is not None:
+                record[4] = used_at
+                return
+            if self.append_fd is None:
+                os.makedirs(os.path.dirname(self.pack_path), exist_ok=True)
+                self.append_fd = os.open(
+                    self.pack_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644
+                )
+                if self.pack_fd is None:
+                    self.pack_fd = os.open(self.pack_path, os.O_RDONLY)
+            # O_APPEND writes at the end even if another build appends to the pack,
+            # so the offset is taken from the position after the write.
+            written = 0
+            while written < len(data):
+                written += os.write(self.append_fd, data[written:])
+            offset = os.lseek(self.append_fd, 0, os.SEEK_CUR) - len(data)
+            self.deflated[key] = [crc, file_size, offset, len(data), used_at]
+
+    def save(self):
+        """
+        Persist the fingerprints seen in this build, and the offsets of the pack.
+        Files which are no longer in the tree, outside of root, or modified within
+        RACY_WINDOW_NS of the build are dropped, and so are the deflated contents
+        unused for PACK_ENTRY_TTL.
+        """
+        if self.append_fd is not None:
+            os.close(self.append_fd)
+            self.append_fd = None
+        if self.path is None:
+            self._close_pack()
+            return
+
+        expired_at = self.started_at // 10**9 - PACK_ENTRY_TTL
+        deflated = {
+            key: record
+            for key, record in self.deflated.items()
+            if record[4] >= expired_at
+        }
+        pack_inode = None
+        if self.pack_fd is not None:
+            live_size = sum(record[3] for record in deflated.values())
+            dead_size = os.fstat(self.pack_fd).st_size - live_size
+            if dead_size >= PACK_COMPACT_MIN_SIZE and dead_size > live_size:
+                deflated = self._compact(deflated)
+            pack_inode = os.stat(self.pack_path).st_ino
+        self._close_pack()
+
+        prefix = self.root.rstrip(os.sep) + os.sep
+        racy_since = self.started_at - RACY_WINDOW_NS
+        files = {
+            key[len(prefix) :]: record
+            for key, record in self.seen.items()
+            if key.startswith(prefix) and max(record[1], record[3]) < racy_since
+        }
+        write_json_atomic(
+            self.path,
+            {
+                "Root": self.root,
+                "Files": files,
+                "Deflated": deflated,
+                "Pack": pack_inode,
+            },
+            indent=None,
+        )
+        self.deflated = deflated
+
+    def _compact(self, deflated):
+        """
+        Rewrite the pack with the live contents only.
+
+        Params
+        ======
+        deflated: dict
+            the records of the live contents
+
+        Returns
+        =======
+        deflated: dict
+            the records with the offsets in the new pack
+        """
+        compacted = {}
+        temp_path = f"{self.pack_path}.{os.getpid()}.tmp"
+        with open(temp_path, "wb") as f:
+            for key, record in sorted(deflated.items(), key=lambda item: item[1][2]):
+                crc, file_size, offset, length, used_at = record
+                data = os.pread(self.pack_fd, length, offset)
+                if len(data) != length:
+                    continue
+                compacted[key] = [crc, file_size, f.tell(), length, used_at]
+                f.write(data)
+        os.replace(temp_path, self.pack_path)
+        return compacted
+
+    def _close_pack(self):
+        if self.pack_fd is not None:
+            os.close(self.pack_fd)
+            self.pack_fd = None
+
+    def _load(self):
+        try:
+            with open(self.path, "r") as f:
+                index = json.load(f)
+            files, deflated = index["Files"], index["Deflated"]
+        except (FileNotFoundError, ValueError, KeyError):
+            return
+        try:
+            self.pack_fd = os.open(self.pack_path, os.O_RDONLY)
+        except FileNotFoundError:
+            deflated = {}
+        else:
+            # the offsets are not valid for a pack compacted by another build.
+            if os.fstat(self.pack_fd).st_ino != index.get("Pack"):
+                deflated = {}
+        self.files = {
+            os.path.join(self.root, key): record for key, record in files.items()
+        }
+        # the records of an older index don't have the last used time.
+        used_at = self.started_at // 10**9
+        self.deflated = {
+            key: record[:4] + [record[4] if len(record) > 4 else used_at]
+            for key, record in deflated.items()
+        }
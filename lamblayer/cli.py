@@ -1,27 +1,14 @@
-import os
-import re
 from logging import getLogger, StreamHandler, Formatter
 
 import click
-from botocore.exceptions import BotoCoreError, ClientError
 
-from .init import Init
-from .create import Create
-from .set import Set
-from .list import List
+from . import __version__
 from .exceptions import LamblayerBaseError
 
 
-ROOT = os.path.dirname(__file__)
-VERSION_RE = re.compile(r"""__version__ = ['"]([0-9.]+)['"]""")
-
-
-def get_version():
-    init = open(os.path.join(ROOT, "__init__.py")).read()
-    return VERSION_RE.search(init).group(1)
-
-
-VERSION = get_version()
+# subcommand modules pull in boto3 and requests, they are imported in each command,
+# so that `lamblayer version` and `--help` start without loading them.
+VERSION = __version__
 RUNTIMES = [
     "python2.7",
     "python3.6",
@@ -124,7 +111,157 @@ def version():
     help="layer config file",
     show_default=True,
 )
-def create(ctx, profile, region, log_level, packages, src, wrap_dir1, wrap_dir2, layer):
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    default=False,
+    help="publish a new layer version, even if the content has not changed.",
+    show_default=True,
+)
+@click.option(
+    "--reproducible",
+    is_flag=True,
+    default=False,
+    help="create a reproducible zip archive.",
+    show_default=True,
+)
+@click.option(
+    "--s3-bucket",
+    default=None,
+    help="upload the zip archive to S3 bucket, and create the layer from it.",
+)
+@click.option(
+    "--s3-key",
+    default=None,
+    help="S3 key of the zip archive",
+    show_default="{LayerName}/{digest}.zip",
+)
+@click.option(
+    "--regions",
+    default=None,
+    help="comma separated AWS regions to publish the layer",
+)
+@click.option(
+    "--profiles",
+    default=None,
+    help="comma separated AWS credential profiles to publish the layer",
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent publishing",
+    show_default=True,
+)
+@click.option(
+    "--rate-limit",
+    default=10.0,
+    help="the maximum number of API calls per second",
+    show_default=True,
+)
+@click.option(
+    "--wheelhouse",
+    default=None,
+    help="a local directory or an index url of wheels for --packages",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    default=False,
+    help="build --packages only from the wheelhouse and the wheel cache.",
+    show_default=True,
+)
+@click.option(
+    "--exclude",
+    multiple=True,
+    help="glob pattern of the files to drop from the layer. can be repeated.",
+)
+@click.option(
+    "--include",
+    multiple=True,
+    help="glob pattern of the files to keep, even if they are dropped. can be repeated.",
+)
+@click.option(
+    "--slim",
+    is_flag=True,
+    default=False,
+    help="drop bytecode caches, dist-info RECORD, tests and docs.",
+    show_default=True,
+)
+@click.option(
+    "--pyc-only",
+    default=None,
+    help="replace *.py by *.pyc compiled for the runtime, ex) python3.9",
+)
+@click.option(
+    "--strip",
+    is_flag=True,
+    default=False,
+    help="strip debug symbols of native extensions.",
+    show_default=True,
+)
+@click.option(
+    "--compression-level",
+    type=click.IntRange(0, 9),
+    default=6,
+    help="deflate level of the zip archive, 1 (fastest) to 9 (smallest), 0 to store.",
+    show_default=True,
+)
+@click.option(
+    "--store",
+    multiple=True,
+    help="glob pattern of the files to store without compression, ex) '*.whl'. can be repeated.",
+)
+@click.option(
+    "--jobs",
+    type=int,
+    default=None,
+    help="the number of threads to compress the zip archive. default: the number of CPUs.",
+)
+@click.option(
+    "--split",
+    "split_parts",
+    type=click.IntRange(min=1),
+    default=1,
+    help="split the layer into this number of layers {LayerName}-{n} by package.",
+    show_default=True,
+)
+@click.option(
+    "--function",
+    "function_path",
+    default=None,
+    help="function config file or manifest to replace the layer in Layers by the created layers.",
+)
+def create(
+    ctx,
+    profile,
+    region,
+    log_level,
+    packages,
+    src,
+    wrap_dir1,
+    wrap_dir2,
+    layer,
+    no_cache,
+    reproducible,
+    s3_bucket,
+    s3_key,
+    regions,
+    profiles,
+    max_workers,
+    rate_limit,
+    wheelhouse,
+    offline,
+    exclude,
+    include,
+    slim,
+    pyc_only,
+    strip,
+    compression_level,
+    store,
+    jobs,
+    split_parts,
+    function_path,
+):
     if profile is None:
         profile = ctx.obj["profile"]
     if region is None:
@@ -135,15 +272,41 @@ def create(ctx, profile, region, log_level, packages, src, wrap_dir1, wrap_dir2,
     logger = get_logger(log_level)
     logger.info(f"lamblayer : v{VERSION}")
 
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .create import Create
+
     try:
         create_command = Create(profile, region, log_level)
-        create_command(packages, src, wrap_dir1, wrap_dir2, layer)
-    except (BotoCoreError, ClientError) as e:
-        logger.error(f"{e.__class__.__name__}: {e}")
-    except LamblayerBaseError as e:
-        logger.error(f"{e.__class__.__name__}: {e}")
-    except FileNotFoundError as e:
+        create_command(
+            packages,
+            src,
+            wrap_dir1,
+            wrap_dir2,
+            layer,
+            use_cache=not no_cache,
+            reproducible=reproducible,
+            s3_bucket=s3_bucket,
+            s3_key=s3_key,
+            profiles=split_option(profiles),
+            regions=split_option(regions),
+            max_workers=max_workers,
+            rate_limit=rate_limit,
+            wheelhouse=wheelhouse,
+            offline=offline,
+            exclude=list(exclude),
+            include=list(include),
+            slim=slim,
+            pyc_only=pyc_only,
+            strip=strip,
+            compress_level=compression_level,
+            store=list(store),
+            jobs=jobs,
+            split=split_parts,
+            function_path=function_path,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
+        ctx.exit(1)
     else:
         logger.info("completed")
 
@@ -172,11 +335,69 @@ def create(ctx, profile, region, log_level, packages, src, wrap_dir1, wrap_dir2,
 )
 @click.option(
     "--function",
-    default="function.json",
-    help="function config file",
+    default=["function.json"],
+    multiple=True,
+    help="function config file, directory, glob pattern or manifest. can be repeated.",
+    show_default=True,
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent updates",
+    show_default=True,
+)
+@click.option(
+    "--wait",
+    is_flag=True,
+    default=False,
+    help="wait until the update of each function is completed.",
     show_default=True,
 )
-def set(ctx, profile, region, log_level, function):
+@click.option(
+    "--rate-limit",
+    default=10.0,
+    help="the maximum number of API calls per second",
+    show_default=True,
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="print the plan, and stop without updating functions.",
+    show_default=True,
+)
+@click.option(
+    "--lockfile",
+    default=None,
+    help="resolve layer names from the lockfile, and write newly resolved ones into it.",
+)
+@click.option(
+    "--update-lock",
+    is_flag=True,
+    default=False,
+    help="resolve all layer names again, ignoring the lockfile.",
+    show_default=True,
+)
+@click.option(
+    "--resolve-ttl",
+    type=float,
+    default=None,
+    help="cache resolved layer names on disk for the seconds.",
+)
+def set(
+    ctx,
+    profile,
+    region,
+    log_level,
+    function,
+    max_workers,
+    wait,
+    rate_limit,
+    dry_run,
+    lockfile,
+    update_lock,
+    resolve_ttl,
+):
     if profile is None:
         profile = ctx.obj["profile"]
     if region is None:
@@ -187,20 +408,270 @@ def set(ctx, profile, region, log_level, function):
     logger = get_logger(log_level)
     logger.info(f"lamblayer : v{VERSION}")
 
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .set import Set
+
     try:
         set_command = Set(profile, region, log_level)
-        set_command(function)
-    except (BotoCoreError, ClientError) as e:
+        set_command(
+            list(function),
+            max_workers=max_workers,
+            wait=wait,
+            rate_limit=rate_limit,
+            dry_run=dry_run,
+            lockfile=lockfile,
+            update_lock=update_lock,
+            resolve_ttl=resolve_ttl,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
-    except LamblayerBaseError as e:
+        ctx.exit(1)
+    else:
+        logger.info("completed")
+
+
+@main.command(name="list", help="show list of the layers.")
+@click.pass_context
+@click.option(
+    "--profile",
+    default=None,
+    help="AWS credential profile",
+    show_default=True,
+)
+@click.option(
+    "--region",
+    default=None,
+    help="AWS region",
+)
+@click.option(
+    "--log-level",
+    default=None,
+    type=click.Choice(
+        ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False
+    ),
+    help="log level",
+    show_default=True,
+)
+@click.option(
+    "--all-versions",
+    is_flag=True,
+    default=False,
+    help="show all versions of each layer.",
+    show_default=True,
+)
+@click.option(
+    "--compatible-runtime",
+    default=None,
+    help="show only the layers compatible with the runtime",
+)
+@click.option(
+    "--compatible-architecture",
+    default=None,
+    type=click.Choice(["x86_64", "arm64"]),
+    help="show only the layers compatible with the architecture",
+)
+@click.option(
+    "--name",
+    default=None,
+    help="show only the layers whose name matches the glob pattern",
+)
+@click.option(
+    "--regex",
+    default=None,
+    help="show only the layers whose name matches the regular expression",
+)
+@click.option(
+    "--output",
+    default="json",
+    type=click.Choice(["json", "ndjson", "csv", "table"]),
+    help="output format",
+    show_default=True,
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent API calls",
+    show_default=True,
+)
+def list_(
+    ctx,
+    profile,
+    region,
+    log_level,
+    all_versions,
+    compatible_runtime,
+    compatible_architecture,
+    name,
+    regex,
+    output,
+    max_workers,
+):
+    if profile is None:
+        profile = ctx.obj["profile"]
+    if region is None:
+        region = ctx.obj["region"]
+    if log_level is None:
+        log_level = ctx.obj["log_level"]
+
+    logger = get_logger(log_level)
+    logger.info(f"lamblayer : v{VERSION}")
+
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .list import List
+
+    try:
+        list_command = List(profile, region, log_level)
+        list_command(
+            all_versions=all_versions,
+            compatible_runtime=compatible_runtime,
+            compatible_architecture=compatible_architecture,
+            name=name,
+            regex=regex,
+            output=output,
+            max_workers=max_workers,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
-    except FileNotFoundError as e:
+        ctx.exit(1)
+    else:
+        logger.info("completed")
+
+
+@main.command(help="show which functions use which layer versions.")
+@click.pass_context
+@click.option(
+    "--profile",
+    default=None,
+    help="AWS credential profile",
+    show_default=True,
+)
+@click.option(
+    "--region",
+    default=None,
+    help="AWS region",
+)
+@click.option(
+    "--log-level",
+    default=None,
+    type=click.Choice(
+        ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False
+    ),
+    help="log level",
+    show_default=True,
+)
+@click.option(
+    "--regions",
+    default=None,
+    help="comma separated AWS regions to index, or 'all'. default: --region",
+)
+@click.option(
+    "--layer",
+    default=None,
+    help="show only the functions using the layer, a name (glob pattern) or an ARN.",
+)
+@click.option(
+    "--function",
+    default=None,
+    help="show only the functions whose name matches the glob pattern",
+)
+@click.option(
+    "--outdated",
+    is_flag=True,
+    default=False,
+    help="show only the layers which are not on the latest version.",
+    show_default=True,
+)
+@click.option(
+    "--all-function-versions",
+    is_flag=True,
+    default=False,
+    help="show published versions of the functions too.",
+    show_default=True,
+)
+@click.option(
+    "--refresh",
+    is_flag=True,
+    default=False,
+    help="refresh the index, even if it is newer than --max-age.",
+    show_default=True,
+)
+@click.option(
+    "--max-age",
+    type=float,
+    default=900.0,
+    help="the seconds to use the index without refreshing it.",
+    show_default=True,
+)
+@click.option(
+    "--db",
+    default=None,
+    help="the path of the index",
+    show_default="{cache_dir}/inventory.sqlite3",
+)
+@click.option(
+    "--output",
+    default="json",
+    type=click.Choice(["json", "ndjson", "csv", "table"]),
+    help="output format",
+    show_default=True,
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of regions to list concurrently",
+    show_default=True,
+)
+def inventory(
+    ctx,
+    profile,
+    region,
+    log_level,
+    regions,
+    layer,
+    function,
+    outdated,
+    all_function_versions,
+    refresh,
+    max_age,
+    db,
+    output,
+    max_workers,
+):
+    if profile is None:
+        profile = ctx.obj["profile"]
+    if region is None:
+        region = ctx.obj["region"]
+    if log_level is None:
+        log_level = ctx.obj["log_level"]
+
+    logger = get_logger(log_level)
+    logger.info(f"lamblayer : v{VERSION}")
+
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .inventory import Inventory
+
+    try:
+        inventory_command = Inventory(profile, region, log_level)
+        inventory_command(
+            regions=split_option(regions),
+            layer=layer,
+            function=function,
+            outdated=outdated,
+            all_function_versions=all_function_versions,
+            refresh=refresh,
+            max_age=max_age,
+            db=db,
+            output=output,
+            max_workers=max_workers,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
+        ctx.exit(1)
     else:
         logger.info("completed")
 
 
-@main.command(help="show list of the layers.")
+@main.command(help="delete unused layer versions.")
 @click.pass_context
 @click.option(
     "--profile",
@@ -222,7 +693,78 @@ def set(ctx, profile, region, log_level, function):
     help="log level",
     show_default=True,
 )
-def list(ctx, profile, region, log_level):
+@click.option(
+    "--layer",
+    multiple=True,
+    help="glob pattern of the layer names to prune. can be repeated. default: all layers.",
+)
+@click.option(
+    "--keep",
+    type=click.IntRange(min=0),
+    default=3,
+    help="the number of the latest versions to keep for each layer.",
+    show_default=True,
+)
+@click.option(
+    "--older-than",
+    type=float,
+    default=None,
+    help="delete only the versions created more than the days ago.",
+)
+@click.option(
+    "--dry-run",
+    is_flag=True,
+    default=False,
+    help="print the plan, and stop without deleting.",
+    show_default=True,
+)
+@click.option(
+    "--yes",
+    is_flag=True,
+    default=False,
+    help="delete without a confirmation.",
+    show_default=True,
+)
+@click.option(
+    "--max-age",
+    type=float,
+    default=0.0,
+    help="the seconds to use the inventory index without refreshing it.",
+    show_default=True,
+)
+@click.option(
+    "--db",
+    default=None,
+    help="the path of the inventory index",
+    show_default="{cache_dir}/inventory.sqlite3",
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent API calls",
+    show_default=True,
+)
+@click.option(
+    "--rate-limit",
+    default=10.0,
+    help="the maximum number of API calls per second",
+    show_default=True,
+)
+def prune(
+    ctx,
+    profile,
+    region,
+    log_level,
+    layer,
+    keep,
+    older_than,
+    dry_run,
+    yes,
+    max_age,
+    db,
+    max_workers,
+    rate_limit,
+):
     if profile is None:
         profile = ctx.obj["profile"]
     if region is None:
@@ -233,15 +775,241 @@ def list(ctx, profile, region, log_level):
     logger = get_logger(log_level)
     logger.info(f"lamblayer : v{VERSION}")
 
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .prune import Prune
+
     try:
-        list_command = List(profile, region, log_level)
-        list_command()
-    except (BotoCoreError, ClientError) as e:
+        prune_command = Prune(profile, region, log_level)
+        prune_command(
+            layers=list(layer),
+            keep=keep,
+            older_than=older_than,
+            dry_run=dry_run,
+            yes=yes,
+            max_age=max_age,
+            db=db,
+            max_workers=max_workers,
+            rate_limit=rate_limit,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
-    except LamblayerBaseError as e:
+        ctx.exit(1)
+    else:
+        logger.info("completed")
+
+
+@main.command(help="show files shipped in more than one layer of functions.")
+@click.pass_context
+@click.option(
+    "--profile",
+    default=None,
+    help="AWS credential profile",
+    show_default=True,
+)
+@click.option(
+    "--region",
+    default=None,
+    help="AWS region",
+)
+@click.option(
+    "--log-level",
+    default=None,
+    type=click.Choice(
+        ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False
+    ),
+    help="log level",
+    show_default=True,
+)
+@click.option(
+    "--function",
+    default=["function.json"],
+    multiple=True,
+    help="function config file, directory, glob pattern or manifest. can be repeated.",
+    show_default=True,
+)
+@click.option(
+    "--lockfile",
+    default=None,
+    help="resolve layer names from the lockfile, without writing it.",
+)
+@click.option(
+    "--output",
+    default="table",
+    type=click.Choice(["json", "ndjson", "csv", "table"]),
+    help="output format",
+    show_default=True,
+)
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent API calls and downloads",
+    show_default=True,
+)
+@click.option(
+    "--rate-limit",
+    default=10.0,
+    help="the maximum number of API calls per second",
+    show_default=True,
+)
+def analyze(
+    ctx,
+    profile,
+    region,
+    log_level,
+    function,
+    lockfile,
+    output,
+    max_workers,
+    rate_limit,
+):
+    if profile is None:
+        profile = ctx.obj["profile"]
+    if region is None:
+        region = ctx.obj["region"]
+    if log_level is None:
+        log_level = ctx.obj["log_level"]
+
+    logger = get_logger(log_level)
+    logger.info(f"lamblayer : v{VERSION}")
+
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .analyze import Analyze
+
+    try:
+        analyze_command = Analyze(profile, region, log_level)
+        analyze_command(
+            list(function),
+            output=output,
+            max_workers=max_workers,
+            rate_limit=rate_limit,
+            lockfile=lockfile,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
-    except FileNotFoundError as e:
+        ctx.exit(1)
+    else:
+        logger.info("completed")
+
+
+@main.command(name="profile", help="show import time of a layer by package.")
+@click.pass_context
+@click.option(
+    "--log-level",
+    default=None,
+    type=click.Choice(
+        ["DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL"], case_sensitive=False
+    ),
+    help="log level",
+    show_default=True,
+)
+@click.option(
+    "--src",
+    is_flag=False,
+    flag_value=".",
+    help="a root directory to put in the layer.",
+    show_default=".",
+)
+@click.option(
+    "--wrap-dir1",
+    default="",
+    help="a wrap directory1 name",
+    show_default=True,
+)
+@click.option(
+    "--wrap-dir2",
+    default="",
+    help="a wrap directory2 name",
+    show_default=True,
+)
+@click.option(
+    "--zip",
+    "zip_paths",
+    multiple=True,
+    help="layer zip archive path, in the order of the function layers. can be repeated.",
+)
+@click.option(
+    "--import",
+    "imports",
+    multiple=True,
+    help="module to import. can be repeated. default: all top-level modules of the layer.",
+)
+@click.option(
+    "--runtime",
+    default=None,
+    help="the interpreter of the runtime to run, ex) python3.9. default: the current one.",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="the number of runs, whose median is reported.",
+    show_default=True,
+)
+@click.option(
+    "--output",
+    default="table",
+    type=click.Choice(["json", "ndjson", "csv", "table"]),
+    help="output format",
+    show_default=True,
+)
+@click.option(
+    "--save",
+    default=None,
+    help="write the result into the json file.",
+)
+@click.option(
+    "--baseline",
+    default=None,
+    help="fail if the import time regressed from the json file saved by --save.",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.2,
+    help="the ratio of the import time to regard as a regression.",
+    show_default=True,
+)
+def profile_(
+    ctx,
+    log_level,
+    src,
+    wrap_dir1,
+    wrap_dir2,
+    zip_paths,
+    imports,
+    runtime,
+    repeat,
+    output,
+    save,
+    baseline,
+    threshold,
+):
+    if log_level is None:
+        log_level = ctx.obj["log_level"]
+
+    logger = get_logger(log_level)
+    logger.info(f"lamblayer : v{VERSION}")
+
+    from .profile import Profile
+
+    try:
+        profile_command = Profile(log_level)
+        profile_command(
+            src=src,
+            zip_paths=list(zip_paths),
+            wrap_dir1=wrap_dir1,
+            wrap_dir2=wrap_dir2,
+            imports=list(imports) or None,
+            runtime=runtime,
+            repeat=repeat,
+            output=output,
+            save=save,
+            baseline=baseline,
+            threshold=threshold,
+        )
+    except (LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
+        ctx.exit(1)
     else:
         logger.info("completed")
 
@@ -281,7 +1049,35 @@ def list(ctx, profile, region, log_level):
     help="download all layers.zip, or not",
     show_default=True,
 )
-def init(ctx, profile, region, log_level, function_name, download):
+@click.option(
+    "--max-workers",
+    default=8,
+    help="the maximum number of concurrent downloads",
+    show_default=True,
+)
+@click.option(
+    "--extract",
+    default=None,
+    help="extract all layers into the directory, as Lambda does into /opt.",
+)
+@click.option(
+    "--hardlink",
+    is_flag=True,
+    default=False,
+    help="share extracted files across functions by hardlinks.",
+    show_default=True,
+)
+def init(
+    ctx,
+    profile,
+    region,
+    log_level,
+    function_name,
+    download,
+    max_workers,
+    extract,
+    hardlink,
+):
     if profile is None:
         profile = ctx.obj["profile"]
     if region is None:
@@ -292,27 +1088,42 @@ def init(ctx, profile, region, log_level, function_name, download):
     logger = get_logger(log_level)
     logger.info(f"lamblayer : v{VERSION}")
 
+    from botocore.exceptions import BotoCoreError, ClientError
+    from .init import Init
+
     try:
         init_command = Init(profile, region, log_level)
-        init_command(function_name, download)
-    except (BotoCoreError, ClientError) as e:
-        logger.error(f"{e.__class__.__name__}: {e}")
-    except LamblayerBaseError as e:
-        logger.error(f"{e.__class__.__name__}: {e}")
-    except FileNotFoundError as e:
+        init_command(
+            function_name,
+            download,
+            max_workers=max_workers,
+            extract=extract,
+            hardlink=hardlink,
+        )
+    except (BotoCoreError, ClientError, LamblayerBaseError, FileNotFoundError) as e:
         logger.error(f"{e.__class__.__name__}: {e}")
+        ctx.exit(1)
     else:
         logger.info("completed")
 
 
+def split_option(value):
+    """
+    Split a comma separated option value into a list.
+    """
+    if value is None:
+        return None
+    return [v.strip() for v in value.split(",") if v.strip()]
+
+
 def get_logger(log_level):
     if log_level is None:
         log_level = "INFO"
     logger = getLogger(__name__)
     logger.setLevel(log_level.upper())
-    ch = StreamHandler()
-    ch.setLevel(log_level.upper())
-    formatter = Formatter("%(asctime)s: [%(levelname)s]: %(message)s")
-    ch.setFormatter(formatter)
-    logger.addHandler(ch)
+    if not logger.handlers:
+        ch = StreamHandler()
+        formatter = Formatter("%(asctime)s: [%(levelname)s]: %(message)s")
+        ch.setFormatter(formatter)
+        logger.addHandler(ch)
     return logger
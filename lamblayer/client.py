@@ -0,0 +1,402 @@
+import copy
+import threading
+from logging import getLogger
+
+from .lamblayer import DEFAULT_MAX_WORKERS
+from .retry import Retrier, DEFAULT_RATE_LIMIT
+from .create import Create
+from .set import Set, normalize_layers
+from .list import List
+from .init import Init
+from .inventory import Inventory, DEFAULT_MAX_AGE
+from .prune import Prune, DEFAULT_KEEP
+from .analyze import Analyze
+from .profile import Profile, DEFAULT_REPEAT
+
+
+class LamblayerClient:
+    """
+    The Python API of lamblayer, which runs the commands in process.
+
+    A client reuses one session per profile and region, and one rate limit for all
+    of its methods. The methods take batches, and return structured results instead
+    of printing them. A failure of an item in a batch doesn't stop the others,
+    and is reported in its result as "Status": "failed" with "Error".
+    Invalid inputs are raised as LamblayerBaseError.
+
+        client = LamblayerClient(profile="dev", region="ap-northeast-1")
+        results = client.publish_layer("layer.json", src="src")
+        plans = client.set_layers_many(
+            [{"FunctionName": "my_function", "Layers": ["my_layer@^1.2"]}]
+        )
+
+    Logs go to the "lamblayer.client" logger, which has no handler,
+    unless a logger is passed.
+    """
+
+    def __init__(
+        self,
+        profile=None,
+        region=None,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        logger=None,
+    ):
+        self.profile = profile
+        self.region = region
+        self.logger = logger if logger is not None else getLogger(__name__)
+        self.retrier = Retrier(rate_limit, logger=self.logger)
+        self.commands = {}
+        self.lock = threading.Lock()
+
+    def publish_layer(
+        self,
+        layer_path,
+        packages=None,
+        src=None,
+        wrap_dir1="",
+        wrap_dir2="",
+        profiles=None,
+        regions=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        **options,
+    ):
+        """
+        Create the layer from packages or src, and publish it to all combinations
+        of profiles and regions.
+
+        Params
+        ======
+        layer_path: str
+            layer config file path
+        packages: str
+            packages file path
+        src: str
+            a root directory to put in the layer.
+        wrap_dir1: str
+            a wrap directory1 name
+        wrap_dir2: str
+            a wrap directory2 name
+        profiles: list
+            AWS credential profiles to publish the layer. default: the client profile.
+        regions: list
+            AWS regions to publish the layer. default: the client region.
+        max_workers: int
+            the maximum number of concurrent publishing.
+        options:
+            the other options of `Create.publish`, ex) use_cache, s3_bucket, slim, split.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerName", "Profile", "Region", "Status", "LayerVersionArn" and
+            "Error" for each layer and target.
+            Status is one of "cached", "unchanged", "created" or "failed".
+        """
+        return self._command(Create).publish(
+            packages,
+            src,
+            wrap_dir1,
+            wrap_dir2,
+            layer_path,
+            profiles=profiles,
+            regions=regions,
+            max_workers=max_workers,
+            **options,
+        )
+
+    def set_layers_many(
+        self,
+        functions,
+        max_workers=DEFAULT_MAX_WORKERS,
+        wait=False,
+        dry_run=False,
+        lockfile=None,
+        update_lock=False,
+        resolve_ttl=None,
+    ):
+        """
+        Set the layers to the functions. Only the functions whose layers differ
+        from the current ones are updated.
+
+        Params
+        ======
+        functions: list
+            dicts of "FunctionName" and "Layers", which are layer specs or ARNs,
+            see `parse_layer_spec`. they are not modified.
+        max_workers: int
+            the maximum number of concurrent API calls.
+        wait: bool
+            wait until `LastUpdateStatus` of each function becomes `Successful`, or not.
+        dry_run: bool
+            only plan the updates, without updating functions and the lockfile.
+        lockfile: str
+            resolve layer names from this lockfile, and write newly resolved ones into it.
+        update_lock: bool
+            resolve all layer names again, ignoring the lockfile.
+        resolve_ttl: float
+            cache the resolved layer names on disk for this seconds, or None.
+
+        Returns
+        =======
+        plans: list
+            dicts of "FunctionName", "Status", "Current", "Layers" and "Error"
+            for each function, in the same order as functions.
+            Status is one of "unchanged", "update" (only in dry_run), "updated" or "failed".
+        """
+        command = self._command(Set)
+        functions = copy.deepcopy(functions)
+        normalize_layers(functions)
+
+        plans = command.plan_layers(
+            functions,
+            max_workers,
+            lockfile,
+            update_lock,
+            resolve_ttl,
+            save=not dry_run,
+        )
+        if not dry_run:
+            command.apply_plans(plans, max_workers, wait)
+        return plans
+
+    def list_layers(
+        self,
+        all_versions=False,
+        compatible_runtime=None,
+        compatible_architecture=None,
+        name=None,
+        regex=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Return the layers.
+
+        Params
+        ======
+        all_versions: bool
+            return all versions of each layer, or only the latest version.
+        compatible_runtime: str
+            return only the layers compatible with the runtime, ex) python3.9
+        compatible_architecture: str
+            return only the layers compatible with the architecture, ex) arm64
+        name: str
+            return only the layers whose name matches the glob pattern.
+        regex: str
+            return only the layers whose name matches the regular expression.
+        max_workers: int
+            the maximum number of concurrent `list_layer_versions` calls.
+
+        Returns
+        =======
+        layers: list
+            the layers as `list_layers` returns, or all versions of them
+            with "LayerName" if all_versions.
+        """
+        return [
+            record
+            for records in self._command(List).iter_layers(
+                all_versions,
+                compatible_runtime,
+                compatible_architecture,
+                name,
+                regex,
+                max_workers,
+            )
+            for record in records
+        ]
+
+    def download_layers(
+        self, layer_version_arns, max_workers=DEFAULT_MAX_WORKERS, download_dir="."
+    ):
+        """
+        Download the layer zip contents concurrently, and verify them.
+        Contents already downloaded with the same CodeSha256 are not downloaded again.
+
+        Params
+        ======
+        layer_version_arns: list
+            the ARNs of the layer versions
+        max_workers: int
+            the maximum number of concurrent downloads.
+        download_dir: str
+            the directory to save the zip contents.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerVersionArn", "Status", "Path" and "Error" for each layer,
+            in the same order as layer_version_arns. Status is "downloaded" or "failed".
+        """
+        return self._command(Init).download_layers(
+            layer_version_arns, max_workers, download_dir
+        )
+
+    def extract_layers(self, zip_paths, extract, hardlink=False):
+        """
+        Extract the downloaded layers into the directory, as Lambda does into `/opt`.
+
+        Params
+        ======
+        zip_paths: list
+            the "Path" of `download_layers` results, in the order of the layers.
+        extract: str
+            the directory to extract the layers.
+        hardlink: bool
+            share extracted files across directories by hardlinks, or not.
+
+        Returns
+        =======
+        stats: dict
+            the numbers of "written", "linked" and "skipped" files.
+        """
+        return self._command(Init).extract_layers(zip_paths, extract, hardlink)
+
+    def find_functions(
+        self,
+        layer=None,
+        function=None,
+        regions=None,
+        outdated=False,
+        all_function_versions=False,
+        refresh=False,
+        max_age=DEFAULT_MAX_AGE,
+        db=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Return which functions use which layer versions, from the local inventory
+        index. Regions whose index is older than max_age are refreshed first.
+        See `Inventory.query` for the params.
+
+        Returns
+        =======
+        records: list
+            dicts of "Region", "FunctionName", "FunctionVersion", "FunctionArn",
+            "LayerName", "LayerArn", "Version", "LayerVersionArn", "CodeSize"
+            and "LastModified", with "LatestVersion" if outdated.
+        """
+        return self._command(Inventory).query(
+            regions,
+            layer,
+            function,
+            outdated,
+            all_function_versions,
+            refresh,
+            max_age,
+            db,
+            max_workers,
+        )
+
+    def prune_layers(
+        self,
+        layers=None,
+        keep=DEFAULT_KEEP,
+        older_than=None,
+        dry_run=False,
+        max_age=0,
+        db=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Delete the layer versions which are not used any more, without a confirmation.
+        See `Prune.plan_prune` for the retention rules and the params.
+
+        Params
+        ======
+        dry_run: bool
+            only plan the deletes, without deleting.
+
+        Returns
+        =======
+        plans: list
+            dicts of "LayerName", "Version", "CreatedDate", "LayerVersionArn",
+            "References", "Status", "Reason" and "Error" for each version.
+            Status is one of "keep", "delete" (only in dry_run), "deleted" or "failed".
+        """
+        command = self._command(Prune)
+        plans = command.plan_prune(layers, keep, older_than, max_age, db, max_workers)
+        if not dry_run:
+            command.apply_prune(plans, max_workers)
+        return plans
+
+    def analyze_layers(self, functions, max_workers=DEFAULT_MAX_WORKERS, lockfile=None):
+        """
+        Find the files shipped in more than one layer of each function,
+        reading only the central directory of each layer zip content.
+        See `Analyze.analyze_functions` for the details.
+
+        Params
+        ======
+        functions: list
+            dicts of "FunctionName" and "Layers", which are layer specs or ARNs.
+            they are not modified.
+        max_workers: int
+            the maximum number of concurrent API calls and HTTP requests.
+        lockfile: str
+            resolve layer names from this lockfile. it is not written.
+
+        Returns
+        =======
+        reports: list
+            dicts of "FunctionName", "Status", "Layers", "UnzippedSize",
+            "DuplicatedBytes", "ShadowedBytes", "Records" and "Error" for each function.
+        """
+        command = self._command(Analyze)
+        functions = copy.deepcopy(functions)
+        normalize_layers(functions)
+        return command.analyze_functions(functions, max_workers, lockfile)
+
+    def profile_layer(
+        self,
+        src=None,
+        zip_paths=None,
+        wrap_dir1="",
+        wrap_dir2="",
+        imports=None,
+        runtime=None,
+        repeat=DEFAULT_REPEAT,
+    ):
+        """
+        Measure the import time of the layer by package, running the interpreter
+        with `-X importtime`. See `Profile.profile_layer` for the details, and
+        `profile.compare_results` to compare the result with a baseline.
+
+        Params
+        ======
+        src: str
+            a root directory to put in the layer.
+        zip_paths: list
+            layer zip archive paths, in the order of the function layers.
+        wrap_dir1: str
+            a wrap directory1 name of src
+        wrap_dir2: str
+            a wrap directory2 name of src
+        imports: list
+            the modules to import. default: all top-level modules of the layer.
+        runtime: str
+            the runtime to run, ex) python3.9. default: the current interpreter.
+        repeat: int
+            the number of runs, whose median is reported.
+
+        Returns
+        =======
+        result: dict
+            "Runtime", "Imports", "Total", "Errors" and "Packages".
+        """
+        # the profiler needs no session, so it is not a shared command.
+        return Profile(logger=self.logger).profile_layer(
+            src, zip_paths, wrap_dir1, wrap_dir2, imports, runtime, repeat
+        )
+
+    def _command(self, command_class):
+        """
+        Return the command of the class, which is created once per client
+        and shares the logger and the rate limit of the client.
+        """
+        with self.lock:
+            command = self.commands.get(command_class)
+            if command is None:
+                command = command_class(self.profile, self.region, None, self.logger)
+                command.retrier = self.retrier
+                self.commands[command_class] = command
+            return command
@@ -1,27 +1,109 @@
+import io
 import os
-import sys
-import time
+import re
 import json
-import shutil
+import base64
 import hashlib
+import tempfile
 
-from .lamblayer import Lamblayer
+from boto3.s3.transfer import TransferConfig
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .lamblayer import (
+    Lamblayer,
+    DEFAULT_MAX_WORKERS,
+    get_session,
+    get_client,
+    get_account_id,
+)
+from .archive import iter_layer_entries, write_ziparchive, COMPRESS_LEVEL
+from .cache import (
+    LayerCache,
+    FileIndex,
+    get_code_sha256,
+    tree_digest,
+)
+from .packages import build_packages
+from .optimize import LayerOptimizer
+from .split import LayerSplitter
+from .utils import echo_table
 from .exceptions import (
     LamblayerInvalidOptionError,
     LamblayerParamValidationError,
+    LamblayerCreateLayerError,
 )
 
 
+# zip archives for S3 upload are kept in memory up to this size, and spill to disk beyond it.
+SPOOL_MAX_SIZE = 16 * 1024 * 1024
+MULTIPART_CHUNKSIZE = 8 * 1024 * 1024
+MULTIPART_MAX_CONCURRENCY = 10
+RESULT_KEYS = ["Profile", "Region", "Status", "LayerVersionArn", "Error"]
+
+
 class Create(Lamblayer):
-    def __init__(self, profile, region, log_level):
-        super().__init__(profile, region, log_level)
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
+
+    def __call__(self, *args, **kwargs):
+        return self.create(*args, **kwargs)
+
+    def create(self, *args, **kwargs):
+        """
+        Creates the layer, and shows the result of each target.
+        The params are the same as `publish`, but LamblayerCreateLayerError is raised
+        if the layer is not created in some of the targets.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerName", "Profile", "Region", "Status", "LayerVersionArn" and
+            "Error" for each layer and target.
+        """
+        results = self.publish(*args, **kwargs)
+        if len(results) > 1:
+            echo_table(
+                results, ["LayerName", "Profile", "Region", "Status", "LayerVersionArn"]
+            )
 
-    def __call__(self, packages, src, wrap_dir1, wrap_dir2, layer_path):
-        self.create(packages, src, wrap_dir1, wrap_dir2, layer_path)
+        failed = [result for result in results if result["Status"] == "failed"]
+        if failed:
+            raise LamblayerCreateLayerError(
+                f"failed to create layer in {len(failed)} of {len(results)} targets."
+            )
+        return results
 
-    def create(self, packages, src, wrap_dir1, wrap_dir2, layer_path):
+    def publish(
+        self,
+        packages,
+        src,
+        wrap_dir1,
+        wrap_dir2,
+        layer_path,
+        use_cache=True,
+        reproducible=False,
+        s3_bucket=None,
+        s3_key=None,
+        profiles=None,
+        regions=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        rate_limit=None,
+        wheelhouse=None,
+        offline=False,
+        exclude=None,
+        include=None,
+        slim=False,
+        pyc_only=None,
+        strip=False,
+        compress_level=COMPRESS_LEVEL,
+        store=None,
+        jobs=None,
+        split=1,
+        function_path=None,
+    ):
         """
-        Creates the layer.
+        Creates the layer, and publishes it to the targets.
+        A failure in a target doesn't stop the others, and is reported in its result.
 
         Params
         ======
@@ -35,8 +117,64 @@ class Create(Lamblayer):
             a wrap directory2 name
         layer_path: str
             create layer config file path
+        use_cache: bool
+            skip publishing, if the same content has already been published.
+        reproducible: bool
+            create a reproducible zip archive, or not.
+        s3_bucket: str
+            upload the zip archive to this S3 bucket, and create the layer from it.
+        s3_key: str
+            the S3 key of the zip archive. default: `{layer_name}/{digest}.zip`,
+            or `{layer_name}/{sha256 of the zip archive}.zip` without use_cache.
+        profiles: list
+            AWS credential profiles to publish the layer. default: current profile.
+        regions: list
+            AWS regions to publish the layer. default: current region.
+        max_workers: int
+            the maximum number of concurrent publishing.
+        rate_limit: float
+            the maximum number of API calls per second.
+        wheelhouse: str
+            a local directory or an index url of wheels for `--packages`.
+        offline: bool
+            build `--packages` only from wheelhouse and the wheel cache.
+        exclude: list
+            glob patterns of the files to drop from the layer.
+        include: list
+            glob patterns of the files to keep, even if they are dropped by other rules.
+        slim: bool
+            drop bytecode caches, dist-info RECORD, tests and docs.
+        pyc_only: str
+            replace `*.py` by `*.pyc` compiled for this runtime, ex) python3.9
+        strip: bool
+            strip debug symbols of native extensions.
+        compress_level: int
+            the deflate level from 1 (fastest) to 9 (smallest), or 0 to store all files.
+        store: list
+            glob patterns of the files to store without compression.
+        jobs: int
+            the number of threads to compress the zip archive. default: the number of CPUs.
+        split: int
+            split the layer into this number of layers `{LayerName}-{n}`,
+            keeping each package in one layer. see `LayerSplitter`.
+        function_path: str
+            replace the layer in "Layers" of this function config file
+            by the created layer versions of the first target.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerName", "Profile", "Region", "Status", "LayerVersionArn" and
+            "Error" for each layer and target.
+            Status is one of "cached", "unchanged", "created" or "failed".
 
         """
+        if rate_limit is not None:
+            # a copy with its own retrier, so the rate limit applies only to this call.
+            params = dict(locals(), rate_limit=None)
+            del params["self"]
+            return self._with_rate_limit(rate_limit).publish(**params)
+
         self.logger.debug(f"packages: {packages}")
         self.logger.debug(f"src: {src}")
         self.logger.debug(f"layer: {layer_path}")
@@ -49,6 +187,22 @@ class Create(Lamblayer):
             raise LamblayerInvalidOptionError(
                 "either `--packages` or `--src` must be specified."
             )
+        if s3_key and not s3_bucket:
+            raise LamblayerInvalidOptionError(
+                "`--s3-key` requires `--s3-bucket` to be specified."
+            )
+        if not 0 <= compress_level <= 9:
+            raise LamblayerInvalidOptionError(
+                f"`--compression-level` must be 0-9: {compress_level}"
+            )
+        if split < 1:
+            raise LamblayerInvalidOptionError(f"`--split` must be 1 or more: {split}")
+        if s3_key and split > 1:
+            raise LamblayerInvalidOptionError(
+                "`--s3-key` cannot be specified with `--split`."
+            )
+        if function_path and not os.path.isfile(function_path):
+            raise FileNotFoundError(f"function config file not found: {function_path}")
 
         (
             layer_name,
@@ -63,43 +217,506 @@ class Create(Lamblayer):
         self.logger.debug(f"compatible_runtimes: {compatible_runtimes}")
         self.logger.debug(f"license_info: {license_info}")
 
-        if src:
-            self.logger.info(f"creating zip archive from {src}")
-
-            # create zip archive
-            zipfile = self._create_ziparchive(src, wrap_dir1, wrap_dir2)
+        params = {
+            "LayerName": layer_name,
+            "Description": description,
+            "CompatibleRuntimes": compatible_runtimes,
+            "LicenseInfo": license_info,
+        }
+        targets = self._get_targets(profiles, regions)
+        if s3_bucket and len(targets) > 1:
+            raise LamblayerInvalidOptionError(
+                "`--s3-bucket` cannot be specified with multiple targets."
+            )
+        options = {
+            "use_cache": use_cache,
+            "reproducible": reproducible,
+            "s3_bucket": s3_bucket,
+            "s3_key": s3_key,
+            "max_workers": max_workers,
+            "optimizer": LayerOptimizer(
+                exclude, include, slim, pyc_only, strip, self.logger
+            ),
+            "compress_level": compress_level,
+            "store": store,
+            "jobs": jobs,
+            "split": split,
+        }
 
-            self.logger.info("creating layer")
+        if packages:
+            arch, runtime, package_list, no_deps = self._parse_packages_json(packages)
+            self.logger.debug(f"arch: {arch}")
+            self.logger.debug(f"runtime: {runtime}")
+            self.logger.debug(f"packages: {package_list}")
+            self.logger.debug(f"no_deps: {no_deps}")
 
-            # create layer
-            response = self.session.client("lambda").publish_layer_version(
-                LayerName=layer_name,
-                Description=description,
-                Content={
-                    "ZipFile": zipfile,
-                },
-                CompatibleRuntimes=compatible_runtimes,
-                LicenseInfo=license_info,
-            )
-            layer_version_arn = response["LayerVersionArn"]
-            self.logger.info(f"created {layer_version_arn}")
+            with tempfile.TemporaryDirectory() as build_dir:
+                build_packages(
+                    build_dir,
+                    arch,
+                    runtime,
+                    package_list,
+                    no_deps,
+                    wheelhouse,
+                    offline,
+                    self.logger,
+                )
+                results = self._create_layer(targets, params, build_dir, **options)
+        else:
+            # the built tree of packages is new every time, only src is indexed.
+            results = self._create_layer(
+                targets,
+                params,
+                src,
+                wrap_dir1,
+                wrap_dir2,
+                index=FileIndex(src),
+                **options,
+            )
 
-        if packages:
-            self.logger.info("This option is currently not available. Coming soon!!")
+        if function_path:
+            self._update_function_json(function_path, layer_name, results)
+        return results
 
-    def _create_ziparchive(self, src, wrap_dir1="", wrap_dir2=""):
+    def _create_layer(
+        self,
+        targets,
+        params,
+        src,
+        wrap_dir1="",
+        wrap_dir2="",
+        use_cache=True,
+        reproducible=False,
+        s3_bucket=None,
+        s3_key=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        optimizer=None,
+        index=None,
+        compress_level=COMPRESS_LEVEL,
+        store=None,
+        jobs=None,
+        split=1,
+    ):
         """
-        Creates a zip archive.
-        In layer, folder structure will be following, `{wrap_dir1}/{wrap_dir2}/your_files`.
+        Creates the layer from the src directory, and publishes it to the targets.
 
         Params
         ======
+        targets: list
+            targets from `_get_targets`
+        params: dict
+            the layer parameters of layer.json
         src: str
             a root directory to put in the layer.
         wrap_dir1: str
-            a wrap directory1 name.
+            a wrap directory1 name
         wrap_dir2: str
-            a wrap directory2 name.
+            a wrap directory2 name
+        use_cache: bool
+            skip publishing, if the same content has already been published.
+        reproducible: bool
+            create a reproducible zip archive, or not.
+        s3_bucket: str
+            upload the zip archive to this S3 bucket, and create the layer from it.
+        s3_key: str
+            the S3 key of the zip archive. default: `{layer_name}/{digest}.zip`,
+            or `{layer_name}/{sha256 of the zip archive}.zip` without use_cache.
+        max_workers: int
+            the maximum number of concurrent publishing.
+        optimizer: LayerOptimizer
+            the pruning stage applied to the entries, or None.
+        index: FileIndex
+            the persistent index of src, or None to hash every file.
+        compress_level: int
+            the deflate level, or 0 to store all files.
+        store: list
+            glob patterns of the files to store without compression.
+        jobs: int
+            the number of threads to compress the zip archive.
+        split: int
+            split the layer into this number of layers.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerName", "Profile", "Region", "Status", "LayerVersionArn" and
+            "Error" for each layer and target.
+        """
+        if index is None:
+            index = FileIndex()
+        entries = list(iter_layer_entries(src, wrap_dir1, wrap_dir2))
+        with tempfile.TemporaryDirectory() as work_dir:
+            if optimizer:
+                entries = optimizer.apply(entries, work_dir)
+                optimizer.log_report()
+            layers = [(params, entries)]
+            if split > 1:
+                parts = LayerSplitter(split, self.logger).split(
+                    params["LayerName"], entries
+                )
+                layers = [
+                    (dict(params, LayerName=f"{params['LayerName']}-{i + 1}"), part)
+                    for i, part in enumerate(parts)
+                    if any(not arcname.endswith("/") for _, arcname in part)
+                ]
+                if len(layers) < split:
+                    self.logger.warning(
+                        f"{split - len(layers)} of {split} parts are empty, "
+                        "and not published."
+                    )
+
+            try:
+                return self._publish_layers(
+                    targets,
+                    layers,
+                    use_cache,
+                    reproducible,
+                    s3_bucket,
+                    s3_key,
+                    max_workers,
+                    index,
+                    compress_level,
+                    store,
+                    jobs,
+                )
+            finally:
+                # hashes are valid whether publishing succeeded or not.
+                index.save()
+
+    def _publish_layers(
+        self,
+        targets,
+        layers,
+        use_cache=True,
+        reproducible=False,
+        s3_bucket=None,
+        s3_key=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        index=None,
+        compress_level=COMPRESS_LEVEL,
+        store=None,
+        jobs=None,
+    ):
+        """
+        Publishes the layers of the entries to the targets, unless they are cached.
+
+        The API calls of all layers and targets run on one thread pool of max_workers,
+        and the zip archives are created one by one before publishing, so the threads
+        and connections never exceed max_workers, whatever the number of layers.
+
+        Params
+        ======
+        targets: list
+            targets from `_get_targets`
+        layers: list
+            (params, entries) pairs of each layer, the layer parameters of layer.json
+            and (path, arcname) pairs of the layer archive.
+        use_cache: bool
+            skip publishing, if the same content has already been published.
+        reproducible: bool
+            create a reproducible zip archive, or not.
+        s3_bucket: str
+            upload the zip archive to this S3 bucket, and create the layer from it.
+        s3_key: str
+            the S3 key of the zip archive. default: `{layer_name}/{digest}.zip`,
+            or `{layer_name}/{sha256 of the zip archive}.zip` without use_cache.
+        max_workers: int
+            the maximum number of concurrent API calls.
+        index: FileIndex
+            the index to look up the content hashes, or None to hash every file.
+        compress_level: int
+            the deflate level, or 0 to store all files.
+        store: list
+            glob patterns of the files to store without compression.
+        jobs: int
+            the number of threads to compress the zip archive.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerName", "Profile", "Region", "Status", "LayerVersionArn" and
+            "Error" for each layer and target. Status is one of "cached", "unchanged",
+            "created" or "failed".
+        """
+        cache = LayerCache()
+        # the digest is only a key of the local cache, so hashing is skipped without it.
+        digests = [None] * len(layers)
+        if use_cache:
+            digests = [
+                tree_digest(entries, params, index) for params, entries in layers
+            ]
+            self.logger.debug(f"digest: {', '.join(digests)}")
+            if index is not None:
+                self.logger.debug(
+                    f"index: {index.reused} files unchanged, {index.hashed} files hashed"
+                )
+
+        # each layer is published to its own copy of the targets.
+        layer_targets = [[dict(target) for target in targets] for _ in layers]
+
+        # resolve the account of each target, and look up the local cache.
+        self._map_concurrently(
+            lambda item: self._lookup_target(item[1], item[0], cache, use_cache),
+            [
+                (digest, target)
+                for digest, copies in zip(digests, layer_targets)
+                for target in copies
+            ],
+            max_workers,
+        )
+
+        publishes = []
+        zipfiles = []
+        for (params, entries), digest, copies in zip(layers, digests, layer_targets):
+            pending = [target for target in copies if target["Status"] is None]
+            if not pending:
+                continue
+            self.logger.info(
+                f"creating zip archive of {params['LayerName']}, {len(entries)} entries"
+            )
+
+            # create zip archive once, and share it with all targets.
+            if s3_bucket:
+                zipfile = self._create_ziparchive_file(
+                    entries, reproducible, index, compress_level, store, jobs
+                )
+                zipfiles.append(zipfile)
+                code_sha256 = self._get_code_sha256(zipfile)
+                key = s3_key
+                if not key:
+                    key = digest or base64.b64decode(code_sha256).hex()
+                    key = f"{params['LayerName']}/{key}.zip"
+            else:
+                zipfile = self._create_ziparchive(
+                    entries, reproducible, index, compress_level, store, jobs
+                )
+                code_sha256 = base64.b64encode(
+                    hashlib.sha256(zipfile).digest()
+                ).decode()
+                key = None
+            self.logger.debug(f"code_sha256: {code_sha256}")
+            publishes.extend(
+                (target, params, zipfile, code_sha256, key) for target in pending
+            )
+
+        try:
+            self._map_concurrently(
+                lambda publish: self._publish_target(
+                    publish[0],
+                    publish[1],
+                    publish[2],
+                    publish[3],
+                    use_cache,
+                    s3_bucket,
+                    publish[4],
+                ),
+                publishes,
+                max_workers,
+            )
+        finally:
+            for zipfile in zipfiles:
+                zipfile.close()
+
+        results = []
+        for (params, _), digest, copies in zip(layers, digests, layer_targets):
+            for target in copies:
+                if digest is not None and target["LayerVersionArn"] is not None:
+                    cache.put(
+                        digest,
+                        target["Region"],
+                        target["AccountId"],
+                        target["LayerVersionArn"],
+                        target["CodeSha256"],
+                    )
+                results.append(
+                    {
+                        "LayerName": params["LayerName"],
+                        **{key: target[key] for key in RESULT_KEYS},
+                    }
+                )
+        return results
+
+    def _get_targets(self, profiles=None, regions=None):
+        """
+        Return the targets to publish the layer.
+        The targets are all combinations of profiles and regions.
+
+        Params
+        ======
+        profiles: list
+            AWS credential profiles. default: the profile of current session.
+        regions: list
+            AWS regions. default: the region of current session.
+
+        Returns
+        =======
+        targets: list
+            dicts of "Profile", "Region", "Session", "AccountId",
+            "Status", "LayerVersionArn", "CodeSha256" and "Error".
+        """
+        profiles = profiles or [self.profile]
+        regions = regions or [self.region]
+
+        targets = []
+        for profile in profiles:
+            for region in regions:
+                if (profile, region) == (self.profile, self.region):
+                    session = self.session
+                else:
+                    session = get_session(profile, region)
+                # the account id is resolved lazily, only if it is needed.
+                targets.append(
+                    {
+                        "Profile": profile,
+                        "Region": region or session.region_name,
+                        "Session": session,
+                        "AccountId": None,
+                        "Status": None,
+                        "LayerVersionArn": None,
+                        "CodeSha256": None,
+                        "Error": None,
+                    }
+                )
+        return targets
+
+    def _lookup_target(self, target, digest, cache, use_cache=True):
+        """
+        Resolve the account id of the target, and look up the local cache.
+        If the layer is cached, target status becomes "cached".
+
+        Params
+        ======
+        target: dict
+            a target from `_get_targets`
+        digest: str
+            digest of the layer
+        cache: LayerCache
+            the local manifest cache
+        use_cache: bool
+            look up the local cache, or not.
+
+        """
+        try:
+            if target["AccountId"] is None:
+                target["AccountId"] = get_account_id(target["Session"])
+            if not use_cache:
+                return
+
+            cached = cache.get(digest, target["Region"], target["AccountId"])
+            client = get_client(target["Session"], "lambda")
+            if cached and self._layer_version_exists(cached["LayerVersionArn"], client):
+                target["Status"] = "cached"
+                target["LayerVersionArn"] = cached["LayerVersionArn"]
+                target["CodeSha256"] = cached["CodeSha256"]
+                self.logger.info(f"layer is up to date {target['LayerVersionArn']}")
+        except (BotoCoreError, ClientError) as e:
+            target["Status"] = "failed"
+            target["Error"] = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{target['Region']}: {target['Error']}")
+
+    def _publish_target(
+        self,
+        target,
+        params,
+        zipfile,
+        code_sha256,
+        use_cache=True,
+        s3_bucket=None,
+        s3_key=None,
+    ):
+        """
+        Publish the layer version to the target, unless the latest version has
+        the same content. Target status becomes "unchanged", "created" or "failed".
+
+        Params
+        ======
+        target: dict
+            a target from `_get_targets`
+        params: dict
+            the layer parameters of layer.json
+        zipfile: byte or file object
+            the zip archive, a file object is used only with s3_bucket.
+        code_sha256: str
+            the CodeSha256 of the zip archive
+        use_cache: bool
+            compare the zip archive with the latest layer version, or not.
+        s3_bucket: str
+            upload the zip archive to this S3 bucket
+        s3_key: str
+            the S3 key of the zip archive
+
+        """
+        client = get_client(target["Session"], "lambda")
+        try:
+            if use_cache:
+                layer_version_arn = self._find_latest_layer_version(
+                    params, code_sha256, client
+                )
+                if layer_version_arn is not None:
+                    target["Status"] = "unchanged"
+                    target["LayerVersionArn"] = layer_version_arn
+                    target["CodeSha256"] = code_sha256
+                    self.logger.info(f"layer is up to date {layer_version_arn}")
+                    return
+
+            if s3_bucket:
+                self.logger.info(f"uploading zip archive to s3://{s3_bucket}/{s3_key}")
+                self._upload_ziparchive(
+                    zipfile, s3_bucket, s3_key, get_client(target["Session"], "s3")
+                )
+                content = {"S3Bucket": s3_bucket, "S3Key": s3_key}
+            else:
+                content = {"ZipFile": zipfile}
+
+            self.logger.info(f"creating layer in {target['Region']}")
+
+            # create layer
+            response = self.retrier.call(
+                client.publish_layer_version,
+                LayerName=params["LayerName"],
+                Description=params["Description"],
+                Content=content,
+                CompatibleRuntimes=params["CompatibleRuntimes"],
+                LicenseInfo=params["LicenseInfo"],
+            )
+        except (BotoCoreError, ClientError) as e:
+            target["Status"] = "failed"
+            target["Error"] = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{target['Region']}: {target['Error']}")
+            return
+
+        target["Status"] = "created"
+        target["LayerVersionArn"] = response["LayerVersionArn"]
+        target["CodeSha256"] = response["Content"]["CodeSha256"]
+        self.logger.info(f"created {target['LayerVersionArn']}")
+
+    def _create_ziparchive(
+        self,
+        entries,
+        reproducible=False,
+        index=None,
+        compress_level=COMPRESS_LEVEL,
+        store=None,
+        jobs=None,
+    ):
+        """
+        Creates a zip archive.
+
+        Params
+        ======
+        entries: list
+            (path, arcname) pairs from `iter_layer_entries`.
+            In layer, folder structure will be following, `{wrap_dir1}/{wrap_dir2}/your_files`.
+        reproducible: bool
+            create a reproducible zip archive, the same tree always yields the same bytes.
+        index: FileIndex
+            the index to look up the content hashes of the files, or None.
+        compress_level: int
+            the deflate level, or 0 to store all files.
+        store: list
+            glob patterns of the files to store without compression.
+        jobs: int
+            the number of threads to compress the zip archive.
 
         Returns
         =======
@@ -107,27 +724,240 @@ class Create(Lamblayer):
             Bytes of the zip file
 
         """
-        # generate a temp dir path from timestamp hash.
-        timestamp = str(time.time())
-        timestamp_hash = hashlib.md5(timestamp.encode()).hexdigest()
-        temp_dir = timestamp_hash
-        # copy src
-        temp_layer_dir = os.path.join(temp_dir, "rawlayer")
-        copy_src_dir = os.path.join(temp_dir, "rawlayer", wrap_dir1, wrap_dir2)
-        shutil.copytree(src, copy_src_dir)
-        # make zip file, and read it into variable.
-        base_name = os.path.join(temp_dir, "ziplayer")
-        shutil.make_archive(base_name, "zip", root_dir=temp_layer_dir)
-        output_path = base_name + ".zip"
-        with open(output_path, "rb") as f:
-            zipfile = f.read()
-        # clean up.
-        shutil.rmtree(temp_dir)
-
-        self.logger.info(f"zip archive wrote {sys.getsizeof(zipfile)} bytes")
+        # stream src into an in-memory archive, without copying it to disk.
+        buffer = io.BytesIO()
+        write_ziparchive(
+            buffer, entries, reproducible, index, compress_level, store, jobs
+        )
+        zipfile = buffer.getvalue()
+
+        self.logger.info(f"zip archive wrote {len(zipfile)} bytes")
 
         return zipfile
 
+    def _create_ziparchive_file(
+        self,
+        entries,
+        reproducible=False,
+        index=None,
+        compress_level=COMPRESS_LEVEL,
+        store=None,
+        jobs=None,
+    ):
+        """
+        Creates a zip archive in a temporary file.
+        Unlike `_create_ziparchive`, the archive spills to disk beyond SPOOL_MAX_SIZE,
+        so the memory usage does not depend on the layer size.
+
+        Params
+        ======
+        entries: list
+            (path, arcname) pairs from `iter_layer_entries`.
+        reproducible: bool
+            create a reproducible zip archive, the same tree always yields the same bytes.
+        index: FileIndex
+            the index to look up the content hashes of the files, or None.
+        compress_level: int
+            the deflate level, or 0 to store all files.
+        store: list
+            glob patterns of the files to store without compression.
+        jobs: int
+            the number of threads to compress the zip archive.
+
+        Returns
+        =======
+        zipfile: file object
+            a temporary file of the zip archive, which is rewound to the beginning.
+
+        """
+        fileobj = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        write_ziparchive(
+            fileobj, entries, reproducible, index, compress_level, store, jobs
+        )
+        size = fileobj.tell()
+        fileobj.seek(0)
+
+        self.logger.info(f"zip archive wrote {size} bytes")
+
+        return fileobj
+
+    def _get_code_sha256(self, fileobj):
+        """
+        Return the CodeSha256 of the zip archive, and rewind the file object.
+
+        Params
+        ======
+        fileobj: file object
+            a readable binary file object of the zip archive.
+
+        Returns
+        =======
+        code_sha256: str
+            base64 encoded sha256 digest, in the same format as Lambda API.
+        """
+        code_sha256 = get_code_sha256(fileobj)
+        fileobj.seek(0)
+        return code_sha256
+
+    def _upload_ziparchive(self, fileobj, s3_bucket, s3_key, client=None):
+        """
+        Upload the zip archive to S3, using concurrent multipart upload.
+
+        Params
+        ======
+        fileobj: file object
+            a readable binary file object of the zip archive.
+        s3_bucket: str
+            the S3 bucket name
+        s3_key: str
+            the S3 key of the zip archive
+        client: S3.Client
+            default: a client of current session.
+
+        """
+        if client is None:
+            client = self._get_client("s3")
+        config = TransferConfig(
+            multipart_threshold=MULTIPART_CHUNKSIZE,
+            multipart_chunksize=MULTIPART_CHUNKSIZE,
+            max_concurrency=MULTIPART_MAX_CONCURRENCY,
+        )
+        client.upload_fileobj(fileobj, s3_bucket, s3_key, Config=config)
+
+    def _layer_version_exists(self, layer_version_arn, client=None):
+        """
+        Return whether the layer version still exists.
+
+        Params
+        ======
+        layer_version_arn: str
+            the ARN of the layer version
+        client: Lambda.Client
+            default: a client of current session.
+
+        Returns
+        =======
+        exists: bool
+        """
+        if client is None:
+            client = self._get_client("lambda")
+        layer_arn, version = layer_version_arn.rsplit(":", 1)
+        try:
+            self.retrier.call(
+                client.get_layer_version,
+                LayerName=layer_arn,
+                VersionNumber=int(version),
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                return False
+            raise
+        return True
+
+    def _find_latest_layer_version(self, params, code_sha256, client=None):
+        """
+        Return the latest layer version, if it has the same content and parameters.
+
+        Params
+        ======
+        params: dict
+            the layer parameters of layer.json
+        code_sha256: str
+            the CodeSha256 of the zip archive
+        client: Lambda.Client
+            default: a client of current session.
+
+        Returns
+        =======
+        layer_version_arn: str or None
+            the ARN of the layer version, or None if the content has changed.
+        """
+        if client is None:
+            client = self._get_client("lambda")
+        response = self.retrier.call(
+            client.list_layer_versions,
+            LayerName=params["LayerName"],
+            MaxItems=1,
+        )
+        if not response["LayerVersions"]:
+            return None
+
+        latest = response["LayerVersions"][0]
+        if (
+            latest.get("Description", "") != (params["Description"] or "")
+            or sorted(latest.get("CompatibleRuntimes", []))
+            != sorted(params["CompatibleRuntimes"] or [])
+            or latest.get("LicenseInfo", "") != (params["LicenseInfo"] or "")
+        ):
+            return None
+
+        response = self.retrier.call(
+            client.get_layer_version,
+            LayerName=params["LayerName"],
+            VersionNumber=latest["Version"],
+        )
+        if response["Content"]["CodeSha256"] != code_sha256:
+            return None
+
+        return latest["LayerVersionArn"]
+
+    def _update_function_json(self, function_path, layer_name, results):
+        """
+        Replace the layer in "Layers" of the functions in the config file by the
+        created layer versions of the first target, in the order of the parts.
+        The layers named `{layer_name}` or `{layer_name}-{n}` are replaced at the
+        position of the first of them, or the versions are appended.
+
+        Params
+        ======
+        function_path: str
+            function config file path, or a manifest which has "Functions".
+        layer_name: str
+            the name of the layer
+        results: list
+            results from `publish`
+        """
+        if not results:
+            return
+        default = (results[0]["Profile"], results[0]["Region"])
+        layer_version_arns = [
+            result["LayerVersionArn"]
+            for result in results
+            if (result["Profile"], result["Region"]) == default
+        ]
+        if not all(layer_version_arns):
+            self.logger.warning(
+                f"{function_path} is not updated, since some of the layers are not created."
+            )
+            return
+
+        with open(function_path, "r") as f:
+            function_param = json.load(f)
+
+        pattern = re.compile(re.escape(layer_name) + r"(-\d+)?")
+        for function in function_param.get("Functions", [function_param]):
+            layers = function.get("Layers", [])
+            if isinstance(layers, str):
+                layers = [layers]
+            matched = [
+                pattern.fullmatch(
+                    layer.split(":")[6]
+                    if layer.startswith("arn:")
+                    else layer.split("@")[0].strip()
+                )
+                is not None
+                for layer in layers
+            ]
+            position = matched.index(True) if any(matched) else len(layers)
+            layers = [layer for layer, m in zip(layers, matched) if not m]
+            function["Layers"] = (
+                layers[:position] + layer_version_arns + layers[position:]
+            )
+
+        with open(function_path, "w") as f:
+            json.dump(function_param, f, indent=4)
+        self.logger.info(f"updated layers in {function_path}")
+
     def _parse_packages_json(self, packages_path):
         """
         Parses a packages config file.
@@ -142,6 +972,7 @@ class Create(Lamblayer):
         arch: str
         runtime: str
         packages: list
+            pip requirement specifiers
         no_deps: int
         """
         with open(packages_path, "r") as f:
@@ -160,8 +991,8 @@ class Create(Lamblayer):
         if not isinstance(no_deps, int):
             raise LamblayerParamValidationError("No_deps", no_deps, int)
 
-        if isinstance(packages, list):
-            packages = "&".join(packages)
+        if isinstance(packages, str):
+            packages = packages.replace("&", " ").split()
 
         return arch, runtime, packages, no_deps
 
@@ -25,3 +25,48 @@ class LamblayerParamValidationError(LamblayerBaseError):
 class LamblayerCreateLayerError(LamblayerBaseError):
     def __init__(self, message="-"):
         super().__init__(message)
+
+
+class LamblayerSetLayerError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerUpdateFunctionError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerDownloadError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerExtractError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerResolveLayerError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerInventoryError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerPruneError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerAnalyzeError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
+
+
+class LamblayerProfileError(LamblayerBaseError):
+    def __init__(self, message="-"):
+        super().__init__(message)
@@ -1,20 +1,32 @@
 import os
 import json
-import requests
 
 import click
+import requests
+from requests.adapters import HTTPAdapter
+from botocore.exceptions import BotoCoreError, ClientError
 
-from .lamblayer import Lamblayer
+from .lamblayer import Lamblayer, DEFAULT_MAX_WORKERS
+from .archive import extract_layers
+from .cache import CHUNK_SIZE, get_cache_dir, get_code_sha256
+from .exceptions import LamblayerDownloadError
 
 
 class Init(Lamblayer):
-    def __init__(self, profile, region, log_level):
-        super().__init__(profile, region, log_level)
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
 
-    def __call__(self, function_name, download):
-        self.init(function_name, download)
+    def __call__(self, *args, **kwargs):
+        self.init(*args, **kwargs)
 
-    def init(self, function_name, download):
+    def init(
+        self,
+        function_name,
+        download,
+        max_workers=DEFAULT_MAX_WORKERS,
+        extract=None,
+        hardlink=False,
+    ):
         """
         Inisialize function config file, and download layer zip contents.
 
@@ -24,11 +36,19 @@ class Init(Lamblayer):
             the name of function for inisialize
         download: bool
             download all layer zip contents, or not.
+        max_workers: int
+            the maximum number of concurrent downloads.
+        extract: str
+            extract all layers into this directory as Lambda does into `/opt`.
+            it implies download.
+        hardlink: bool
+            share extracted files across functions by hardlinks, or not.
 
         """
         self.logger.info(f"starting init {function_name}")
-        response = self.session.client("lambda").get_function(
-            FunctionName=function_name
+        response = self.retrier.call(
+            self._get_client("lambda").get_function,
+            FunctionName=function_name,
         )
         try:
             layers = response["Configuration"]["Layers"]
@@ -42,13 +62,122 @@ class Init(Lamblayer):
 
         self._gen_function_json(function_name, layer_version_arns)
 
-        if download:
+        if download or extract:
             self.logger.info("starging download layers")
 
-            for layer_version_arn in layer_version_arns:
-                self.logger.info(f"downloading {layer_version_arn}")
-                layer_content_url = self._get_layer_url(layer_version_arn)
-                self._download_layer(layer_content_url)
+            results = self.download_layers(layer_version_arns, max_workers)
+            failed = [result for result in results if result["Status"] == "failed"]
+            if failed:
+                raise LamblayerDownloadError(
+                    f"failed to download {len(failed)} of {len(results)} layers."
+                )
+
+            if extract:
+                self.extract_layers(
+                    [result["Path"] for result in results], extract, hardlink
+                )
+
+    def download_layers(
+        self, layer_version_arns, max_workers=DEFAULT_MAX_WORKERS, download_dir="."
+    ):
+        """
+        Download the layer zip contents concurrently, and verify them.
+        A failure in a layer doesn't stop the others, and is reported in its result.
+
+        Params
+        ======
+        layer_version_arns: list
+            the ARNs of the layer versions
+        max_workers: int
+            the maximum number of concurrent downloads.
+        download_dir: str
+            the directory to save the zip contents.
+
+        Returns
+        =======
+        results: list
+            dicts of "LayerVersionArn", "Status", "Path" and "Error" for each layer,
+            in the same order as layer_version_arns. Status is "downloaded" or "failed".
+        """
+        client = self._get_client("lambda")
+        http = get_http_session(max_workers)
+        return self._map_concurrently(
+            lambda layer_version_arn: self._download_layer_version(
+                layer_version_arn, client, http, download_dir
+            ),
+            layer_version_arns,
+            max_workers,
+        )
+
+    def extract_layers(self, zip_paths, extract, hardlink=False):
+        """
+        Extract the layer zip contents into the directory, as Lambda does into `/opt`.
+
+        Params
+        ======
+        zip_paths: list
+            the paths of layer zip contents, in the order of the layers.
+        extract: str
+            the directory to extract the layers.
+        hardlink: bool
+            share extracted files across functions by hardlinks, or not.
+
+        Returns
+        =======
+        stats: dict
+            the numbers of "written", "linked" and "skipped" files.
+        """
+        self.logger.info(f"extracting layers into {extract}")
+        store = os.path.join(get_cache_dir(), "objects") if hardlink else None
+        stats = extract_layers(zip_paths, extract, store)
+        self.logger.info(
+            f"extracted {stats['written'] + stats['linked']} files, "
+            f"skipped {stats['skipped']} unchanged files"
+        )
+        return stats
+
+    def _download_layer_version(
+        self, layer_version_arn, client, http, download_dir="."
+    ):
+        """
+        Download a layer zip content, and verify it.
+
+        Params
+        ======
+        layer_version_arn: str
+            the ARN of the layer version
+        client: Lambda.Client
+        http: requests.Session
+        download_dir: str
+            the directory to save the zip content.
+
+        Returns
+        =======
+        result: dict
+            "LayerVersionArn", "Status", "Path" and "Error" of the download.
+        """
+        self.logger.info(f"downloading {layer_version_arn}")
+        result = {
+            "LayerVersionArn": layer_version_arn,
+            "Status": "failed",
+            "Path": None,
+            "Error": None,
+        }
+        try:
+            layer_content_url, code_sha256 = self._get_layer_content(
+                layer_version_arn, client
+            )
+            save_path = self._download_layer(
+                layer_content_url, code_sha256, http, download_dir
+            )
+        except (BotoCoreError, ClientError, OSError, LamblayerDownloadError) as e:
+            result["Error"] = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{layer_version_arn}: {result['Error']}")
+            return result
+        self.logger.info(f"downloaded {save_path}")
+        result["Status"] = "downloaded"
+        result["Path"] = save_path
+        return result
 
     def _gen_function_json(self, function_name, layer_version_arns):
         """
@@ -91,29 +220,155 @@ class Init(Lamblayer):
         content_url: str
             a url of layer zip content
         """
-        version = int(layer_version_arn.split(":")[-1])
-        layer_arn = layer_version_arn.rsplit(":", 1)[0]
-        response = self.session.client("lambda").get_layer_version(
-            LayerName=layer_arn,
-            VersionNumber=version,
-        )
-        content_url = response["Content"]["Location"]
+        content_url, _ = self._get_layer_content(layer_version_arn)
         return content_url
 
-    def _download_layer(self, layer_content_url):
+    def _get_layer_content(self, layer_version_arn, client=None):
+        """
+        Return a layer zip content url, and its CodeSha256, see `get_layer_content`.
+
+        Params
+        ======
+        layer_version_arn: str
+            the ARN of the layer version
+        client: Lambda.Client
+            default: a client of current session.
+        """
+        if client is None:
+            client = self._get_client("lambda")
+        return get_layer_content(layer_version_arn, client, self.retrier)
+
+    def _download_layer(
+        self, layer_content_url, code_sha256=None, http=None, download_dir="."
+    ):
         """
         Download layer zip contents.
-        save path format : ./{layer name}-xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx.zip
+        save path format : {download_dir}/{layer name}-xxxxxxxx-xxxx-xxxx-xxxx-xxxxxxxxxxxx.zip
+
+        The content is streamed to `{save path}.part` in chunks, and an interrupted
+        download is resumed with a Range request on the next run.
+        If code_sha256 is passed, the content is verified before it is renamed to save path.
 
         Params
         ======
         layer_content_url: str
             a url of layer zip content
+        code_sha256: str
+            base64 encoded sha256 digest of layer zip content
+        http: requests.Session
+            default: a new session.
+        download_dir: str
+            the directory to save the zip content.
+
+        Returns
+        =======
+        save_path: str
+            the path of downloaded zip
+        """
+        save_path = os.path.join(
+            download_dir, layer_content_url.split("/")[-1].split("?")[0] + ".zip"
+        )
+        part_path = save_path + ".part"
+
+        if code_sha256 is not None and os.path.exists(save_path):
+            if self._get_code_sha256(save_path) == code_sha256:
+                self.logger.debug(f"{save_path} is already downloaded")
+                return save_path
 
+        if http is None:
+            http = requests.Session()
+
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        with http.get(layer_content_url, headers=headers, stream=True) as response:
+            if response.status_code == 416:
+                # the part file is already complete.
+                pass
+            else:
+                response.raise_for_status()
+                if response.status_code == 206:
+                    self.logger.debug(f"resuming {save_path} from {offset} bytes")
+                    mode = "ab"
+                else:
+                    mode = "wb"
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                        f.write(chunk)
+
+        if code_sha256 is not None:
+            actual = self._get_code_sha256(part_path)
+            if actual != code_sha256:
+                os.remove(part_path)
+                raise LamblayerDownloadError(
+                    f"CodeSha256 mismatch for {save_path}, "
+                    f"expected {code_sha256}, got {actual}."
+                )
+
+        os.replace(part_path, save_path)
+        return save_path
+
+    def _get_code_sha256(self, path):
         """
-        save_path = layer_content_url.split("/")[-1].split("?")[0] + ".zip"
+        Return the CodeSha256 of the file.
+
+        Params
+        ======
+        path: str
+            the file path
+
+        Returns
+        =======
+        code_sha256: str
+            base64 encoded sha256 digest, in the same format as Lambda API.
+        """
+        with open(path, "rb") as f:
+            return get_code_sha256(f)
+
+
+def get_http_session(max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Return a HTTP session, whose connection pool is shared by all downloads.
+
+    Params
+    ======
+    max_workers: int
+        the maximum number of concurrent downloads.
+
+    Returns
+    =======
+    http: requests.Session
+    """
+    http = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+    http.mount("https://", adapter)
+    http.mount("http://", adapter)
+    return http
+
+
+def get_layer_content(layer_version_arn, client, retrier):
+    """
+    Return a layer zip content url, and its CodeSha256.
 
-        response = requests.get(layer_content_url)
+    Params
+    ======
+    layer_version_arn: str
+        the ARN of the layer version
+    client: Lambda.Client
+    retrier: Retrier
 
-        with open(save_path, "wb") as f:
-            f.write(response.content)
+    Returns
+    =======
+    content_url: str
+        a url of layer zip content
+    code_sha256: str
+        base64 encoded sha256 digest of layer zip content
+    """
+    version = int(layer_version_arn.split(":")[-1])
+    layer_arn = layer_version_arn.rsplit(":", 1)[0]
+    response = retrier.call(
+        client.get_layer_version,
+        LayerName=layer_arn,
+        VersionNumber=version,
+    )
+    content = response["Content"]
+    return content["Location"], content["CodeSha256"]
@@ -0,0 +1,494 @@
+import os
+import time
+import sqlite3
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .lamblayer import (
+    Lamblayer,
+    DEFAULT_MAX_WORKERS,
+    get_session,
+    get_client,
+)
+from .cache import get_cache_dir
+from .resolver import is_layer_version_arn
+from .utils import RecordWriter
+from .exceptions import LamblayerInventoryError
+
+
+# the index of a region is used as is within this seconds, without calling the API.
+DEFAULT_MAX_AGE = 15 * 60
+COLUMNS = [
+    "Region",
+    "FunctionName",
+    "FunctionVersion",
+    "LayerName",
+    "Version",
+    "LatestVersion",
+    "LayerVersionArn",
+    "LastModified",
+]
+# the errors of a region which is not enabled for the account, ex) an opt-in region.
+DISABLED_REGION_ERRORS = ("UnrecognizedClientException", "AuthFailure")
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS functions (
+    function_arn TEXT PRIMARY KEY,
+    account_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    function_name TEXT NOT NULL,
+    function_version TEXT NOT NULL,
+    runtime TEXT,
+    last_modified TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS functions_region ON functions (account_id, region);
+CREATE INDEX IF NOT EXISTS functions_name ON functions (function_name);
+
+CREATE TABLE IF NOT EXISTS function_layers (
+    function_arn TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    layer_arn TEXT NOT NULL,
+    layer_name TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    code_size INTEGER,
+    PRIMARY KEY (function_arn, position)
+);
+CREATE INDEX IF NOT EXISTS function_layers_layer ON function_layers (layer_arn, version);
+CREATE INDEX IF NOT EXISTS function_layers_name ON function_layers (layer_name);
+
+CREATE TABLE IF NOT EXISTS refreshes (
+    account_id TEXT NOT NULL,
+    region TEXT NOT NULL,
+    refreshed_at REAL NOT NULL,
+    PRIMARY KEY (account_id, region)
+);
+"""
+
+
+class InventoryStore:
+    """
+    A SQLite index of functions and the layer versions they use,
+    at `{cache_dir}/inventory.sqlite3` by default.
+
+    Functions are indexed by the region, and layers by the layer ARN and name,
+    so both "functions of a layer" and "layers of a function" are answered
+    without calling the API. A store is used by one thread at a time.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            path = os.path.join(get_cache_dir(), "inventory.sqlite3")
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        with self.conn:
+            self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def refreshed_at(self, account_id, region):
+        """
+        Return the unix time when the region was refreshed last, or None.
+        """
+        row = self.conn.execute(
+            "SELECT refreshed_at FROM refreshes WHERE account_id = ? AND region = ?",
+            (account_id, region),
+        ).fetchone()
+        return row["refreshed_at"] if row is not None else None
+
+    def update_region(self, account_id, region, functions, refreshed_at=None):
+        """
+        Replace the index of the region by the functions, in a transaction.
+        Only the functions whose `LastModified` changed are written again.
+
+        Params
+        ======
+        account_id: str
+        region: str
+        functions: list
+            function configurations of `list_functions`
+        refreshed_at: float
+            the unix time when the functions were listed. default: now.
+
+        Returns
+        =======
+        stats: dict
+            the numbers of "added", "updated", "removed" and "unchanged" functions.
+        """
+        stats = {"added": 0, "updated": 0, "removed": 0, "unchanged": 0}
+        with self.conn:
+            indexed = {
+                row["function_arn"]: row["last_modified"]
+                for row in self.conn.execute(
+                    "SELECT function_arn, last_modified FROM functions "
+                    "WHERE account_id = ? AND region = ?",
+                    (account_id, region),
+                )
+            }
+            for function in functions:
+                function_arn = function["FunctionArn"]
+                last_modified = indexed.pop(function_arn, None)
+                if last_modified == function["LastModified"]:
+                    stats["unchanged"] += 1
+                    continue
+                stats["added" if last_modified is None else "updated"] += 1
+                self._write_function(account_id, region, function)
+
+            # the functions which are not listed any more.
+            for function_arn in indexed:
+                self._delete_function(function_arn)
+                stats["removed"] += 1
+
+            self.conn.execute(
+                "INSERT OR REPLACE INTO refreshes VALUES (?, ?, ?)",
+                (account_id, region, refreshed_at or time.time()),
+            )
+        return stats
+
+    def query(
+        self, account_id, layer=None, function=None, regions=None, all_versions=False
+    ):
+        """
+        Return the layers of the functions of the account, ordered by the region,
+        the function and the position of the layer.
+
+        Params
+        ======
+        account_id: str
+        layer: str
+            a layer name (glob pattern), a layer ARN, or a layer version ARN.
+        function: str
+            a function name (glob pattern).
+        regions: list
+            the regions to query. default: all indexed regions.
+        all_versions: bool
+            include published versions of the functions, or only $LATEST.
+
+        Returns
+        =======
+        records: list
+            dicts of "Region", "FunctionName", "FunctionVersion", "FunctionArn",
+            "LayerName", "LayerArn", "Version", "LayerVersionArn", "CodeSize"
+            and "LastModified".
+        """
+        conditions = ["f.account_id = ?"]
+        params = [account_id]
+        if layer is not None:
+            if is_layer_version_arn(layer):
+                layer_arn, version = layer.rsplit(":", 1)
+                conditions.append("l.layer_arn = ? AND l.version = ?")
+                params.extend([layer_arn, int(version)])
+            elif layer.startswith("arn:"):
+                conditions.append("l.layer_arn = ?")
+                params.append(layer)
+            else:
+                conditions.append("l.layer_name GLOB ?")
+                params.append(layer)
+        if function is not None:
+            conditions.append("f.function_name GLOB ?")
+            params.append(function)
+        if regions:
+            conditions.append(f"f.region IN ({', '.join('?' for _ in regions)})")
+            params.extend(regions)
+        if not all_versions:
+            conditions.append("f.function_version = '$LATEST'")
+
+        rows = self.conn.execute(
+            "SELECT f.region, f.function_name, f.function_version, f.function_arn, "
+            "f.last_modified, l.layer_name, l.layer_arn, l.version, l.code_size "
+            "FROM functions f JOIN function_layers l ON f.function_arn = l.function_arn"
+            + " WHERE "
+            + " AND ".join(conditions)
+            + " ORDER BY f.region, f.function_name, f.function_version, l.position",
+            params,
+        )
+        return [
+            {
+                "Region": row["region"],
+                "FunctionName": row["function_name"],
+                "FunctionVersion": row["function_version"],
+                "FunctionArn": row["function_arn"],
+                "LayerName": row["layer_name"],
+                "LayerArn": row["layer_arn"],
+                "Version": row["version"],
+                "LayerVersionArn": f"{row['layer_arn']}:{row['version']}",
+                "CodeSize": row["code_size"],
+                "LastModified": row["last_modified"],
+            }
+            for row in rows
+        ]
+
+    def _write_function(self, account_id, region, function):
+        function_arn = function["FunctionArn"]
+        self.conn.execute(
+            "INSERT OR REPLACE INTO functions VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                function_arn,
+                account_id,
+                region,
+                function["FunctionName"],
+                function.get("Version", "$LATEST"),
+                function.get("Runtime"),
+                function["LastModified"],
+            ),
+        )
+        self.conn.execute(
+            "DELETE FROM function_layers WHERE function_arn = ?", (function_arn,)
+        )
+        self.conn.executemany(
+            "INSERT INTO function_layers VALUES (?, ?, ?, ?, ?, ?)",
+            [
+                (
+                    function_arn,
+                    position,
+                    layer["Arn"].rsplit(":", 1)[0],
+                    layer["Arn"].split(":")[6],
+                    int(layer["Arn"].rsplit(":", 1)[1]),
+                    layer.get("CodeSize"),
+                )
+                for position, layer in enumerate(function.get("Layers", []))
+            ],
+        )
+
+    def _delete_function(self, function_arn):
+        self.conn.execute(
+            "DELETE FROM function_layers WHERE function_arn = ?", (function_arn,)
+        )
+        self.conn.execute(
+            "DELETE FROM functions WHERE function_arn = ?", (function_arn,)
+        )
+
+
+class Inventory(Lamblayer):
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
+
+    def __call__(self, *args, **kwargs):
+        return self.inventory(*args, **kwargs)
+
+    def inventory(self, *args, output="json", **kwargs):
+        """
+        Show which functions use which layer versions, from the local index.
+        The params are the same as `query`, and output is the format.
+        [json | ndjson | csv | table]
+
+        Returns
+        =======
+        records: list
+            records from `query`
+        """
+        records = self.query(*args, **kwargs)
+        with RecordWriter(output, COLUMNS) as writer:
+            writer.write(records)
+        return records
+
+    def query(
+        self,
+        regions=None,
+        layer=None,
+        function=None,
+        outdated=False,
+        all_function_versions=False,
+        refresh=False,
+        max_age=DEFAULT_MAX_AGE,
+        db=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Return the layers of the functions from the local index.
+        Regions whose index is older than max_age are refreshed first.
+
+        Params
+        ======
+        regions: list
+            AWS regions, or ["all"] for all regions of Lambda. default: current region.
+        layer: str
+            only the functions which use the layer, a layer name (glob pattern),
+            a layer ARN or a layer version ARN.
+        function: str
+            only the functions whose name matches the glob pattern.
+        outdated: bool
+            only the layers which are not on the latest version.
+        all_function_versions: bool
+            include published versions of the functions, or only $LATEST.
+        refresh: bool
+            refresh the index, even if it is newer than max_age.
+        max_age: float
+            the seconds to use the index without refreshing it.
+        db: str
+            the path of the index. default: `{cache_dir}/inventory.sqlite3`
+        max_workers: int
+            the maximum number of regions to list concurrently.
+
+        Returns
+        =======
+        records: list
+            records from `InventoryStore.query`, with "LatestVersion" if outdated.
+        """
+        regions = self._get_regions(regions)
+        store = InventoryStore(db)
+        try:
+            self.refresh(store, regions, 0 if refresh else max_age, max_workers)
+            records = store.query(
+                self.account_id, layer, function, regions, all_function_versions
+            )
+        finally:
+            store.close()
+
+        if outdated:
+            records = self._filter_outdated(records, max_workers)
+        return records
+
+    def refresh(
+        self, store, regions, max_age=DEFAULT_MAX_AGE, max_workers=DEFAULT_MAX_WORKERS
+    ):
+        """
+        List the functions of the regions concurrently, and update the index.
+        The regions indexed within max_age are skipped.
+
+        Params
+        ======
+        store: InventoryStore
+        regions: list
+            AWS regions
+        max_age: float
+            the seconds to use the index without refreshing it.
+        max_workers: int
+            the maximum number of regions to list concurrently.
+
+        Returns
+        =======
+        stats: dict
+            region -> the stats of `InventoryStore.update_region`, or None if skipped.
+        """
+        account_id = self.account_id
+        stale = []
+        for region in regions:
+            refreshed_at = store.refreshed_at(account_id, region)
+            if refreshed_at is not None and time.time() - refreshed_at < max_age:
+                self.logger.debug(f"{region}: the index is up to date")
+            else:
+                stale.append(region)
+
+        # regions are listed concurrently, and written by this thread.
+        started_at = time.time()
+        listed = self._map_concurrently(self._list_functions, stale, max_workers)
+        stats = {region: None for region in regions}
+        failed = []
+        for region, functions in zip(stale, listed):
+            if functions is None:
+                failed.append(region)
+                continue
+            if functions is False:
+                continue
+            stats[region] = store.update_region(
+                account_id, region, functions, started_at
+            )
+            self.logger.info(
+                f"{region}: indexed {len(functions)} functions, "
+                + ", ".join(f"{count} {key}" for key, count in stats[region].items())
+            )
+        if failed:
+            raise LamblayerInventoryError(
+                f"failed to list functions in {', '.join(failed)}."
+            )
+        return stats
+
+    def _list_functions(self, region):
+        """
+        Return all functions of the region, including published versions.
+
+        Params
+        ======
+        region: str
+
+        Returns
+        =======
+        functions: list, None or False
+            function configurations, None if listing failed,
+            or False if the region is not enabled for the account.
+        """
+        client = get_client(get_session(self.profile, region), "lambda")
+        self.logger.info(f"listing functions in {region}")
+        try:
+            return [
+                function
+                for functions in self._paginate(
+                    client.list_functions, "Functions", FunctionVersion="ALL"
+                )
+                for function in functions
+            ]
+        except ClientError as e:
+            if e.response["Error"]["Code"] in DISABLED_REGION_ERRORS:
+                self.logger.warning(
+                    f"{region}: skipped, the region is not enabled: {e}"
+                )
+                return False
+            self.logger.error(f"{region}: {e.__class__.__name__}: {e}")
+            return None
+        except BotoCoreError as e:
+            self.logger.error(f"{region}: {e.__class__.__name__}: {e}")
+            return None
+
+    def _filter_outdated(self, records, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Return the records whose layer is not on the latest version,
+        with "LatestVersion". The latest versions are looked up once per layer.
+        """
+        layer_arns = sorted({record["LayerArn"] for record in records})
+        latest = dict(
+            zip(
+                layer_arns,
+                self._map_concurrently(
+                    self._get_latest_version, layer_arns, max_workers
+                ),
+            )
+        )
+        outdated = []
+        for record in records:
+            record["LatestVersion"] = latest[record["LayerArn"]]
+            if (
+                record["LatestVersion"] is not None
+                and record["Version"] < record["LatestVersion"]
+            ):
+                outdated.append(record)
+        return outdated
+
+    def _get_latest_version(self, layer_arn):
+        """
+        Return the latest version number of the layer, or None if it can't be read,
+        ex) a layer of another account without permission.
+        """
+        region = layer_arn.split(":")[3]
+        client = get_client(get_session(self.profile, region), "lambda")
+        try:
+            response = self.retrier.call(
+                client.list_layer_versions, LayerName=layer_arn, MaxItems=1
+            )
+        except (BotoCoreError, ClientError) as e:
+            self.logger.warning(f"{layer_arn}: {e.__class__.__name__}: {e}")
+            return None
+        if not response["LayerVersions"]:
+            return None
+        return response["LayerVersions"][0]["Version"]
+
+    def _get_regions(self, regions=None):
+        """
+        Return the regions to index. "all" is expanded to the regions enabled for
+        the account, so that opt-in regions not enabled are not listed.
+        """
+        if not regions:
+            return [self.region or self.session.region_name]
+        if "all" in regions:
+            client = self._get_client("ec2")
+            try:
+                response = self.retrier.call(client.describe_regions)
+            except (BotoCoreError, ClientError) as e:
+                self.logger.warning(
+                    f"failed to describe the enabled regions: {e.__class__.__name__}: {e}"
+                )
+                return self.session.get_available_regions("lambda")
+            return sorted(region["RegionName"] for region in response["Regions"])
+        return regions
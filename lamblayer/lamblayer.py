@@ -1,8 +1,155 @@
 import os
+import copy
+import json
+import time
+import hashlib
+import threading
 
-from logging import getLogger, StreamHandler, Formatter
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
+
+from .retry import Retrier
+from .cache import get_cache_dir, write_json_atomic
+from .utils import get_logger
+
+
+DEFAULT_MAX_WORKERS = 8
+# botocore keeps 10 connections by default, which caps the concurrent calls of a client.
+MAX_POOL_CONNECTIONS = 64
+# the account id of a profile rarely changes, but a profile can be edited.
+ACCOUNT_ID_TTL = 12 * 60 * 60
+
+# sessions, clients and account ids are shared by all commands in the process.
+_sessions = {}
+_clients = {}
+_account_ids = {}
+_lock = threading.Lock()
+
+
+def get_session(profile=None, region=None):
+    """
+    Return the session of the profile and region, which is created once per process.
+
+    Params
+    ======
+    profile: str
+        AWS credential profile, or None for the default credentials.
+    region: str
+        AWS region, or None for the default region.
+
+    Returns
+    =======
+    session: boto3.session.Session
+    """
+    with _lock:
+        session = _sessions.get((profile, region))
+        if session is None:
+            session = boto3.Session(profile_name=profile, region_name=region)
+            _sessions[(profile, region)] = session
+        return session
+
+
+def get_client(session, service):
+    """
+    Return the client of the service, which is created once per session.
+    Clients are thread safe, but sessions are not, so clients are created under a lock.
+
+    Params
+    ======
+    session: boto3.session.Session
+        a session from `get_session`
+    service: str
+        the name of the service, ex) "lambda"
+
+    Returns
+    =======
+    client: botocore.client.BaseClient
+    """
+    with _lock:
+        client = _clients.get((session, service))
+        if client is None:
+            client = session.client(
+                service, config=Config(max_pool_connections=MAX_POOL_CONNECTIONS)
+            )
+            _clients[(session, service)] = client
+        return client
+
+
+def get_account_id(session, ttl=ACCOUNT_ID_TTL):
+    """
+    Return the account id of the session.
+
+    The account id is cached in memory and at `{cache_dir}/accounts.json` for ttl seconds,
+    keyed by the sha256 of the access key, whichever source the credentials come from.
+    So STS `get_caller_identity` is called only once per access key in ttl, and
+    credentials of another role, ex) on an instance or in CI, never share the account id.
+
+    Params
+    ======
+    session: boto3.session.Session
+    ttl: float
+        seconds to trust the cached account id.
+
+    Returns
+    =======
+    account_id: str
+    """
+    credentials = session.get_credentials()
+    if credentials is None:
+        # STS raises NoCredentialsError, as any other API call does.
+        return get_client(session, "sts").get_caller_identity().get("Account")
+    # the access key id itself is not written to the disk.
+    key = "key:" + hashlib.sha256(credentials.access_key.encode()).hexdigest()
+
+    with _lock:
+        if key in _account_ids:
+            return _account_ids[key]
+
+    path = os.path.join(get_cache_dir(), "accounts.json")
+    try:
+        with open(path, "r") as f:
+            accounts = json.load(f)
+    except (FileNotFoundError, ValueError):
+        accounts = {}
+
+    cached = accounts.get(key)
+    if cached is not None and time.time() - cached["CachedAt"] < ttl:
+        account_id = cached["AccountId"]
+    else:
+        identity = get_client(session, "sts").get_caller_identity()
+        account_id = identity.get("Account")
+        accounts[key] = {"AccountId": account_id, "CachedAt": time.time()}
+        write_json_atomic(path, accounts)
+
+    with _lock:
+        _account_ids[key] = account_id
+    return account_id
+
+
+def map_concurrently(func, items, max_workers=DEFAULT_MAX_WORKERS):
+    """
+    Apply func to every item on a bounded thread pool.
+
+    Params
+    ======
+    func: callable
+        a function which takes an item.
+    items: list
+        the items to apply func.
+    max_workers: int
+        the maximum number of threads.
+
+    Returns
+    =======
+    results: list
+        the return values of func, in the same order as items.
+    """
+    if len(items) <= 1:
+        return [func(item) for item in items]
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(func, items))
 
 
 class Lamblayer:
@@ -11,6 +158,7 @@ class Lamblayer:
         profile,
         region,
         log_level,
+        logger=None,
     ):
         self.profile = profile
         self.region = region
@@ -18,9 +166,39 @@ class Lamblayer:
         if self.log_level is None:
             self.log_level = "INFO"
 
-        self.logger = self._get_logger()
+        # a logger passed by library users is used as is, without any handler.
+        self.logger = logger if logger is not None else self._get_logger()
+        self.retrier = Retrier(logger=self.logger)
         self.session = self._get_session()
-        self.account_id = self._get_account_id()
+        self._account_id = None
+
+    @property
+    def account_id(self):
+        """
+        The account id of current session, which is resolved on first use.
+        """
+        if self._account_id is None:
+            self._account_id = self._get_account_id()
+        return self._account_id
+
+    def _with_rate_limit(self, rate_limit):
+        """
+        Return a shallow copy of the command with a retrier of the rate limit.
+        The session and the logger are shared, but the retrier of this command is not
+        replaced, so a rate limit of a call doesn't leak into the later calls.
+
+        Params
+        ======
+        rate_limit: float
+            the maximum number of API calls per second.
+
+        Returns
+        =======
+        command: Lamblayer
+        """
+        command = copy.copy(self)
+        command.retrier = Retrier(rate_limit, logger=self.logger)
+        return command
 
     def _get_session(self):
         """
@@ -40,6 +218,8 @@ class Lamblayer:
         7. Instance metadata service on an Amazon EC2 instance that has an IAM role configured.
 
 
+        The session is shared by all commands of the same profile and region in the process.
+
         Returns
         =======
         session:
@@ -47,14 +227,14 @@ class Lamblayer:
         """
         # create session.
         if (self.profile is not None) and (self.region is not None):
-            session = boto3.Session(profile_name=self.profile, region_name=self.region)
+            session = get_session(profile=self.profile, region=self.region)
         elif (self.profile is not None) and (self.region is None):
-            session = boto3.Session(profile_name=self.profile)
+            session = get_session(profile=self.profile)
             self.region = os.getenv("AWS_DEFAULT_REGION")
         elif (self.profile is None) and (self.region is not None):
-            session = boto3.Session(region_name=self.region)
+            session = get_session(region=self.region)
         elif (self.profile is None) and (self.region is None):
-            session = boto3.Session()
+            session = get_session()
             self.region = os.getenv("AWS_DEFAULT_REGION")
 
         self.logger.debug(f"session: {session}")
@@ -69,21 +249,52 @@ class Lamblayer:
         account_id: str
             the account id of current session
         """
-        return self.session.client("sts").get_caller_identity().get("Account")
+        return get_account_id(self.session)
 
-    def _get_logger(self):
+    def _get_client(self, service):
         """
-        Return a logger.
+        Return the client of the service for current session, which is reused.
+
+        Params
+        ======
+        service: str
+            the name of the service, ex) "lambda"
 
         Returns
         =======
-        logger
-        """
-        logger = getLogger(__name__)
-        logger.setLevel(self.log_level.upper())
-        ch = StreamHandler()
-        ch.setLevel(self.log_level.upper())
-        formatter = Formatter("%(asctime)s: [%(levelname)s]: %(message)s")
-        ch.setFormatter(formatter)
-        logger.addHandler(ch)
-        return logger
+        client: botocore.client.BaseClient
+        """
+        return get_client(self.session, service)
+
+    def _paginate(self, method, key, **kwargs):
+        """
+        Call the paginated client method until `NextMarker` runs out.
+        Each call goes through the retrier.
+
+        Params
+        ======
+        method: callable
+            a boto3 client method, ex) `client.list_layers`
+        key: str
+            the key of items in the response, ex) "Layers"
+        kwargs:
+            parameters of the method
+
+        Yields
+        ======
+        items: list
+            the items of each page
+        """
+        return self.retrier.paginate(method, key, **kwargs)
+
+    def _map_concurrently(self, func, items, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Apply func to every item on a bounded thread pool, see `map_concurrently`.
+        """
+        return map_concurrently(func, items, max_workers)
+
+    def _get_logger(self):
+        """
+        Return the logger shared by all commands, see `get_logger`.
+        """
+        return get_logger(self.log_level)
@@ -1,24 +1,150 @@
-import json
+import re
+import fnmatch
 
-import click
+from .lamblayer import Lamblayer, DEFAULT_MAX_WORKERS
+from .utils import RecordWriter
+from .exceptions import LamblayerInvalidOptionError
 
-from .lamblayer import Lamblayer
+
+COLUMNS = [
+    "LayerName",
+    "Version",
+    "CreatedDate",
+    "CompatibleRuntimes",
+    "CompatibleArchitectures",
+    "LayerVersionArn",
+    "Description",
+]
 
 
 class List(Lamblayer):
-    def __init__(self, profile, region, log_level):
-        super().__init__(profile, region, log_level)
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
 
-    def __call__(self):
-        self.list_()
+    def __call__(self, *args, **kwargs):
+        self.list_(*args, **kwargs)
 
-    def list_(self):
+    def list_(
+        self,
+        all_versions=False,
+        compatible_runtime=None,
+        compatible_architecture=None,
+        name=None,
+        regex=None,
+        output="json",
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
         """
         Show list of the layers.
+        Layers are written page by page, as soon as each page arrives.
+
+        Params
+        ======
+        all_versions: bool
+            show all versions of each layer, or only the latest version.
+        compatible_runtime: str
+            show only the layers compatible with the runtime, ex) python3.9
+        compatible_architecture: str
+            show only the layers compatible with the architecture, ex) arm64
+        name: str
+            show only the layers whose name matches the glob pattern.
+        regex: str
+            show only the layers whose name matches the regular expression.
+        output: str
+            output format. [json | ndjson | csv | table]
+        max_workers: int
+            the maximum number of concurrent `list_layer_versions` calls.
+
         """
         self.logger.info("starting list layers")
-        response = self.session.client("lambda").list_layers()
-        layers = response["Layers"]
 
-        for layer in layers:
-            click.echo(json.dumps(layer, indent=2))
+        with RecordWriter(output, COLUMNS) as writer:
+            for records in self.iter_layers(
+                all_versions,
+                compatible_runtime,
+                compatible_architecture,
+                name,
+                regex,
+                max_workers,
+            ):
+                writer.write(records)
+
+    def iter_layers(
+        self,
+        all_versions=False,
+        compatible_runtime=None,
+        compatible_architecture=None,
+        name=None,
+        regex=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Yield the layers page by page. The params are the same as `list_`.
+
+        Yields
+        ======
+        records: list
+            the latest versions of the layers of a page, as `list_layers` returns,
+            or all versions of them with "LayerName" if all_versions.
+        """
+        filters = {}
+        if compatible_runtime:
+            filters["CompatibleRuntime"] = compatible_runtime
+        if compatible_architecture:
+            filters["CompatibleArchitecture"] = compatible_architecture
+        try:
+            pattern = re.compile(regex) if regex else None
+        except re.error as e:
+            raise LamblayerInvalidOptionError(f"invalid `--regex` {regex}: {e}")
+
+        client = self._get_client("lambda")
+
+        for layers in self._paginate(client.list_layers, "Layers", **filters):
+            layers = [
+                layer
+                for layer in layers
+                if (name is None or fnmatch.fnmatchcase(layer["LayerName"], name))
+                and (pattern is None or pattern.search(layer["LayerName"]))
+            ]
+            if not all_versions:
+                yield layers
+                continue
+
+            # expand the versions of the page concurrently, and keep the order of layers.
+            pages = self._map_concurrently(
+                lambda layer: self._list_layer_versions(
+                    layer["LayerName"], client, filters
+                ),
+                layers,
+                max_workers,
+            )
+            for layer_versions in pages:
+                yield layer_versions
+
+    def _list_layer_versions(self, layer_name, client, filters):
+        """
+        Return all versions of the layer.
+
+        Params
+        ======
+        layer_name: str
+            the name of the layer
+        client: Lambda.Client
+        filters: dict
+            "CompatibleRuntime" and "CompatibleArchitecture" for the API call.
+
+        Returns
+        =======
+        layer_versions: list
+            the layer versions, newest first. each version has "LayerName".
+        """
+        return [
+            {"LayerName": layer_name, **layer_version}
+            for layer_versions in self._paginate(
+                client.list_layer_versions,
+                "LayerVersions",
+                LayerName=layer_name,
+                **filters,
+            )
+            for layer_version in layer_versions
+        ]
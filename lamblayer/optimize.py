@@ -0,0 +1,255 @@
+import os
+import sys
+import json
+import shutil
+import fnmatch
+import subprocess
+
+from .packages import parse_runtime
+from .exceptions import LamblayerInvalidOptionError, LamblayerCreateLayerError
+
+
+# rules of `--slim`, which are safe for most of python packages at runtime.
+SLIM_RULES = {
+    "bytecode": ["*__pycache__/*", "*.pyc", "*.pyo"],
+    "dist-info": [
+        "*.dist-info/RECORD",
+        "*.dist-info/INSTALLER",
+        "*.dist-info/REQUESTED",
+        "*.dist-info/direct_url.json",
+    ],
+}
+# rules of `--slim` by directory name. a directory is dropped only if it is not
+# a package, since some packages import them at runtime, ex) botocore.docs
+SLIM_DIR_RULES = {
+    "tests": ["tests", "test"],
+    "docs": ["docs", "doc"],
+}
+NATIVE_PATTERNS = ["*.so", "*.so.*"]
+
+# compiles [[source, cfile, dfile], ...] from stdin with the target interpreter.
+COMPILE_SCRIPT = """
+import sys, json, py_compile
+kwargs = {}
+if hasattr(py_compile, "PycInvalidationMode"):
+    kwargs["invalidation_mode"] = py_compile.PycInvalidationMode.UNCHECKED_HASH
+failed = []
+for source, cfile, dfile in json.load(sys.stdin):
+    try:
+        py_compile.compile(source, cfile=cfile, dfile=dfile, doraise=True, **kwargs)
+    except py_compile.PyCompileError:
+        failed.append(source)
+json.dump(failed, sys.stdout)
+"""
+
+
+class LayerOptimizer:
+    """
+    A pruning stage of the layer entries, which runs before the zip archive is written.
+
+    Stages are applied in the following order,
+    1. exclude: drop entries matching `--exclude` patterns and `--slim` rules,
+       unless they match `--include` patterns.
+    2. pyc-only: replace `*.py` by `*.pyc` compiled for the target runtime.
+    3. strip: strip debug symbols of native extensions.
+
+    Files changed by 2. and 3. are written into a work directory, the src directory
+    is never modified.
+    """
+
+    def __init__(
+        self,
+        exclude=None,
+        include=None,
+        slim=False,
+        pyc_only=None,
+        strip=False,
+        logger=None,
+    ):
+        self.rules = {f"exclude {pattern}": [pattern] for pattern in exclude or []}
+        self.dir_rules = {}
+        if slim:
+            self.rules.update(SLIM_RULES)
+            self.dir_rules.update(SLIM_DIR_RULES)
+        self.include = list(include or [])
+        self.pyc_only = pyc_only
+        self.strip = strip
+        self.logger = logger
+        self.report = {}
+
+        if pyc_only is not None:
+            self.python = self._find_interpreter(pyc_only)
+        if strip:
+            self.strip_command = shutil.which("strip")
+            if self.strip_command is None:
+                raise LamblayerInvalidOptionError(
+                    "`--strip` requires `strip` command, install binutils."
+                )
+
+    def __bool__(self):
+        return bool(self.rules or self.dir_rules or self.pyc_only or self.strip)
+
+    def apply(self, entries, work_dir):
+        """
+        Apply the stages to the entries.
+
+        Params
+        ======
+        entries: list
+            (path, arcname) pairs of the layer archive
+        work_dir: str
+            a directory to write changed files
+
+        Returns
+        =======
+        entries: list
+            optimized (path, arcname) pairs
+        """
+        self.report = {}
+        entries = self._exclude(entries)
+        if self.pyc_only is not None:
+            entries = self._compile(entries, work_dir)
+        if self.strip:
+            entries = self._strip(entries, work_dir)
+        return entries
+
+    def log_report(self):
+        """
+        Log the number of files and bytes saved by each rule.
+        """
+        if self.logger is None:
+            return
+        total = 0
+        for rule, (files, saved) in self.report.items():
+            self.logger.info(f"optimize {rule}: {files} files, saved {saved} bytes")
+            total += saved
+        self.logger.info(f"optimize total: saved {total} bytes")
+
+    def _count(self, rule, saved):
+        files, total = self.report.get(rule, (0, 0))
+        self.report[rule] = (files + 1, total + saved)
+
+    def _exclude(self, entries):
+        if not self.rules and not self.dir_rules:
+            return entries
+        packages = {
+            arcname.rsplit("/", 1)[0] + "/"
+            for _, arcname in entries
+            if arcname.endswith(("/__init__.py", "/__init__.pyc"))
+        }
+        kept = []
+        for path, arcname in entries:
+            if self._match(arcname, self.include):
+                kept.append((path, arcname))
+                continue
+            for rule, patterns in self.rules.items():
+                if self._match(arcname, patterns):
+                    break
+            else:
+                rule = self._match_dir(arcname, packages)
+            if rule is None:
+                kept.append((path, arcname))
+            elif not arcname.endswith("/"):
+                # directories are dropped with their files, and not counted.
+                self._count(rule, os.path.getsize(path))
+        return kept
+
+    def _match_dir(self, arcname, packages):
+        """
+        Return the directory rule which drops the entry, or None.
+        The entry is dropped if any of its directories has a name of the rule,
+        and is not a package, which has `__init__.py`.
+        """
+        names = arcname.rstrip("/").split("/")
+        # the directory entry itself is matched as well as the files under it.
+        depth = len(names) if arcname.endswith("/") else len(names) - 1
+        for i in range(1, depth):
+            directory = "/".join(names[: i + 1]) + "/"
+            for rule, dir_names in self.dir_rules.items():
+                if names[i] in dir_names and directory not in packages:
+                    return rule
+        return None
+
+    def _compile(self, entries, work_dir):
+        sources = [
+            (path, arcname)
+            for path, arcname in entries
+            if arcname.endswith(".py") and not self._match(arcname, self.include)
+        ]
+        jobs = [
+            [path, os.path.join(work_dir, "pyc", arcname + "c"), arcname]
+            for path, arcname in sources
+        ]
+        for _, cfile, _ in jobs:
+            os.makedirs(os.path.dirname(cfile), exist_ok=True)
+
+        process = subprocess.run(
+            [self.python, "-c", COMPILE_SCRIPT],
+            input=json.dumps(jobs),
+            capture_output=True,
+            text=True,
+        )
+        if process.returncode != 0:
+            raise LamblayerCreateLayerError(
+                f"failed to compile for {self.pyc_only}:\n{process.stderr.strip()}"
+            )
+        # sources which can't be compiled for the runtime are kept as is.
+        failed = set(json.loads(process.stdout))
+
+        compiled = {
+            path: (cfile, arcname + "c")
+            for path, cfile, arcname in jobs
+            if path not in failed
+        }
+        optimized = []
+        for path, arcname in entries:
+            if path in compiled and arcname.endswith(".py"):
+                cfile, pyc_arcname = compiled[path]
+                # a small module may grow by the header of the bytecode.
+                saved = os.path.getsize(path) - os.path.getsize(cfile)
+                self._count("pyc-only", max(saved, 0))
+                optimized.append((cfile, pyc_arcname))
+            else:
+                optimized.append((path, arcname))
+        return optimized
+
+    def _strip(self, entries, work_dir):
+        optimized = []
+        for path, arcname in entries:
+            if arcname.endswith("/") or not self._match(arcname, NATIVE_PATTERNS):
+                optimized.append((path, arcname))
+                continue
+            stripped = os.path.join(work_dir, "strip", arcname)
+            os.makedirs(os.path.dirname(stripped), exist_ok=True)
+            process = subprocess.run(
+                [self.strip_command, "--strip-unneeded", "-o", stripped, path],
+                capture_output=True,
+                text=True,
+            )
+            if process.returncode != 0:
+                # ex. the host strip does not support the target arch.
+                if self.logger is not None:
+                    self.logger.debug(f"strip {arcname}: {process.stderr.strip()}")
+                optimized.append((path, arcname))
+                continue
+            saved = os.path.getsize(path) - os.path.getsize(stripped)
+            self._count("strip", max(saved, 0))
+            optimized.append((stripped, arcname))
+        return optimized
+
+    def _match(self, arcname, patterns):
+        return any(fnmatch.fnmatchcase(arcname, pattern) for pattern in patterns)
+
+    def _find_interpreter(self, runtime):
+        """
+        Return the interpreter of the runtime, bytecode depends on the python version.
+        """
+        python_version = parse_runtime(runtime)
+        if python_version == f"{sys.version_info[0]}.{sys.version_info[1]}":
+            return sys.executable
+        python = shutil.which(f"python{python_version}")
+        if python is None:
+            raise LamblayerInvalidOptionError(
+                f"`--pyc-only {runtime}` requires python{python_version} in PATH."
+            )
+        return python
@@ -0,0 +1,166 @@
+import os
+import re
+import sys
+import subprocess
+
+from .cache import get_cache_dir
+from .exceptions import LamblayerInvalidOptionError, LamblayerCreateLayerError
+
+
+# manylinux tags which can run on Amazon Linux 2 (glibc 2.26) and later.
+PLATFORMS = {
+    "x86_64": [
+        "manylinux2014_x86_64",
+        "manylinux2010_x86_64",
+        "manylinux1_x86_64",
+    ],
+    "arm64": [
+        "manylinux2014_aarch64",
+    ],
+}
+RUNTIME_RE = re.compile(r"^(?:py|python)(\d)\.?(\d+)$")
+
+
+def parse_runtime(runtime):
+    """
+    Return the python version of the runtime.
+
+    Params
+    ======
+    runtime: str
+        the runtime name, ex) "py39" or "python3.9"
+
+    Returns
+    =======
+    python_version: str
+        ex) "3.9"
+    """
+    m = RUNTIME_RE.match(runtime)
+    if m is None:
+        raise LamblayerInvalidOptionError(f"unsupported Runtime: {runtime}")
+    return f"{m.group(1)}.{m.group(2)}"
+
+
+def get_wheel_cache_dir(arch, python_version):
+    """
+    Return the persistent wheel cache directory for the arch and python version.
+
+    Params
+    ======
+    arch: str
+        the instruction set architecture [x86_64 | arm64]
+    python_version: str
+        ex) "3.9"
+
+    Returns
+    =======
+    wheel_cache_dir: str
+    """
+    tag = "cp" + python_version.replace(".", "")
+    return os.path.join(get_cache_dir(), "wheels", f"{arch}-{tag}")
+
+
+def build_packages(
+    build_dir,
+    arch,
+    runtime,
+    packages,
+    no_deps=0,
+    wheelhouse=None,
+    offline=False,
+    logger=None,
+):
+    """
+    Install the packages into `{build_dir}/python/lib/python3.x/site-packages`,
+    using wheels for the target arch and runtime.
+
+    Wheels are downloaded into the persistent wheel cache first, so rebuilding a layer
+    only fetches the wheels which are not cached yet, and then installed from the cache.
+
+    Params
+    ======
+    build_dir: str
+        the root directory of the layer.
+    arch: str
+        the instruction set architecture [x86_64 | arm64]
+    runtime: str
+        the runtime name, ex) "py39" or "python3.9"
+    packages: list
+        pip requirement specifiers.
+    no_deps: int
+        do not install the dependencies of the packages, if it is not 0.
+    wheelhouse: str
+        a local directory or an index url of wheels, which is searched
+        before the package index.
+    offline: bool
+        never access the package index, only wheelhouse and the wheel cache are used.
+    logger: logging.Logger
+
+    Returns
+    =======
+    site_packages: str
+        the directory where the packages are installed.
+    """
+    if arch not in PLATFORMS:
+        raise LamblayerInvalidOptionError(f"unsupported Arch: {arch}")
+    python_version = parse_runtime(runtime)
+    wheel_cache_dir = get_wheel_cache_dir(arch, python_version)
+    os.makedirs(wheel_cache_dir, exist_ok=True)
+
+    site_packages = os.path.join(
+        build_dir, "python", "lib", f"python{python_version}", "site-packages"
+    )
+
+    target_options = ["--only-binary=:all:", "--implementation", "cp"]
+    target_options += ["--python-version", python_version]
+    for platform in PLATFORMS[arch]:
+        target_options += ["--platform", platform]
+    if no_deps:
+        target_options.append("--no-deps")
+
+    # find-links the wheel cache, so pinned wheels already cached are not fetched again.
+    index_options = ["--find-links", wheel_cache_dir]
+    if wheelhouse:
+        if os.path.isdir(wheelhouse):
+            index_options += ["--find-links", wheelhouse]
+        else:
+            index_options += ["--extra-index-url", wheelhouse]
+    if offline:
+        index_options.append("--no-index")
+
+    if logger is not None:
+        logger.info(f"downloading wheels for {arch} python{python_version}")
+    _run_pip(
+        ["download", "--dest", wheel_cache_dir]
+        + target_options
+        + index_options
+        + list(packages),
+        logger,
+    )
+
+    if logger is not None:
+        logger.info(f"installing packages into {site_packages}")
+    _run_pip(
+        ["install", "--target", site_packages, "--no-compile", "--no-index"]
+        + ["--find-links", wheel_cache_dir]
+        + target_options
+        + list(packages),
+        logger,
+    )
+    return site_packages
+
+
+def _run_pip(args, logger=None):
+    """
+    Run pip with the current interpreter.
+    """
+    command = [sys.executable, "-m", "pip", "--disable-pip-version-check"] + args
+    if logger is not None:
+        logger.debug(f"running {' '.join(command)}")
+    process = subprocess.run(command, capture_output=True, text=True)
+    if logger is not None and process.stdout:
+        logger.debug(process.stdout)
+    if process.returncode != 0:
+        raise LamblayerCreateLayerError(
+            f"pip {args[0]} failed:\n{process.stderr.strip()}"
+        )
@@ -0,0 +1,495 @@
+import os
+import sys
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+
+import click
+
+from .archive import iter_layer_entries, extract_layers
+from .split import PACKAGE_ROOTS_RE, METADATA_DIR_RE, get_unit, split_package_root
+from .cache import write_json_atomic
+from .utils import RecordWriter, get_logger
+from .exceptions import LamblayerInvalidOptionError, LamblayerProfileError
+
+
+DEFAULT_REPEAT = 3
+DEFAULT_THRESHOLD = 0.2
+# a regression smaller than this is regarded as noise, regardless of the ratio.
+MIN_REGRESSION_US = 1000
+RUNTIME_PACKAGE = "(runtime)"
+COLUMNS = ["Package", "Self", "Cumulative", "Modules", "Files", "Bytes"]
+# the imports of the layer are between the markers in the output of -X importtime,
+# after the imports of the interpreter startup.
+START_MARKER = "lamblayer: start imports"
+END_MARKER = "lamblayer: end imports"
+# run in the interpreter under -X importtime. json is imported after the imports,
+# so that it is not cached for the layer.
+SCRIPT = """
+import sys
+sys.path[:0] = {paths!r}
+errors = {{}}
+sys.stderr.write({start!r} + "\\n")
+sys.stderr.flush()
+for name in {imports!r}:
+    try:
+        __import__(name)
+    except Exception as e:
+        errors[name] = f"{{e.__class__.__name__}}: {{e}}"
+sys.stderr.write({end!r} + "\\n")
+sys.stderr.flush()
+files = {{}}
+for name, module in list(sys.modules.items()):
+    path = getattr(module, "__file__", None)
+    if path is None:
+        path = next(iter(getattr(module, "__path__", None) or []), None)
+    files[name] = path
+import json
+sys.stdout.write(json.dumps({{"Files": files, "Errors": errors}}))
+"""
+
+
+class Profile:
+    """
+    The import time profiler of a layer. Unlike the other commands, it runs only
+    local interpreters, so no AWS session is created.
+    """
+
+    def __init__(self, log_level=None, logger=None):
+        self.log_level = log_level or "INFO"
+        # a logger passed by library users is used as is, without any handler.
+        self.logger = logger if logger is not None else get_logger(self.log_level)
+
+    def __call__(self, *args, **kwargs):
+        return self.profile_(*args, **kwargs)
+
+    def profile_(
+        self,
+        src=None,
+        zip_paths=None,
+        wrap_dir1="",
+        wrap_dir2="",
+        imports=None,
+        runtime=None,
+        repeat=DEFAULT_REPEAT,
+        output="table",
+        save=None,
+        baseline=None,
+        threshold=DEFAULT_THRESHOLD,
+    ):
+        """
+        Show the import time of the layer by package, and compare it with a baseline.
+
+        Params
+        ======
+        src: str
+            a root directory to put in the layer.
+        zip_paths: list
+            layer zip archive paths, in the order of the function layers.
+        wrap_dir1: str
+            a wrap directory1 name of src
+        wrap_dir2: str
+            a wrap directory2 name of src
+        imports: list
+            the modules to import. default: all top-level modules of the layer.
+        runtime: str
+            the runtime to run, ex) python3.9. default: the current interpreter.
+        repeat: int
+            the number of runs, whose median is reported.
+        output: str
+            the format of the records. [json | ndjson | csv | table]
+        save: str
+            write the result into this json file.
+        baseline: str
+            compare the result with this json file, saved by `save`.
+        threshold: float
+            the ratio of the import time to regard as a regression.
+
+        Returns
+        =======
+        result: dict
+            result from `profile_layer`, with "Regressions" if baseline.
+        """
+        result = self.profile_layer(
+            src, zip_paths, wrap_dir1, wrap_dir2, imports, runtime, repeat
+        )
+        with RecordWriter(output, COLUMNS) as writer:
+            writer.write(result["Packages"])
+        if output == "table":
+            click.echo(
+                f"Total: {result['Total']} us to import {len(result['Imports'])} "
+                f"modules on {result['Runtime']}, median of {repeat} runs."
+            )
+        if save:
+            write_json_atomic(save, result)
+            self.logger.info(f"saved the result to {save}")
+
+        if baseline:
+            with open(baseline, "r") as f:
+                regressions = compare_results(json.load(f), result, threshold)
+            result["Regressions"] = regressions
+            for regression in regressions:
+                self.logger.error(
+                    f"{regression['Package']}: {regression['Baseline']} us -> "
+                    f"{regression['Cumulative']} us (+{regression['Ratio']:.0%})"
+                )
+            if regressions:
+                raise LamblayerProfileError(
+                    f"import time regressed in {len(regressions)} packages "
+                    f"over {threshold:.0%} of {baseline}."
+                )
+        return result
+
+    def profile_layer(
+        self,
+        src=None,
+        zip_paths=None,
+        wrap_dir1="",
+        wrap_dir2="",
+        imports=None,
+        runtime=None,
+        repeat=DEFAULT_REPEAT,
+    ):
+        """
+        Set up the layer as `/opt` in a temporary directory, run the interpreter
+        with `-X importtime` importing the modules, and sum up the import time
+        by package.
+
+        The layer is on `sys.path` as Lambda does, `/opt/python/lib/pythonX.Y/site-packages`
+        and `/opt/python`, and the site-packages of the interpreter are not.
+        Bytecode is not written, since `/opt` is read-only on Lambda.
+
+        Returns
+        =======
+        result: dict
+            "Runtime", "Imports", "Total" (us), "Errors" and "Packages", which are
+            dicts of "Package", "Self", "Cumulative" (us), "Modules", "Files" and
+            "Bytes", the slowest first. a package is a unit of `split.get_unit`,
+            and the modules outside the layer are summed up as "(runtime)".
+        """
+        if (src is None) == (not zip_paths):
+            raise LamblayerInvalidOptionError(
+                "either `--src` or `--zip` must be specified."
+            )
+        if repeat < 1:
+            raise LamblayerInvalidOptionError(f"`--repeat` must be 1 or more: {repeat}")
+        python = self._get_interpreter(runtime)
+
+        with tempfile.TemporaryDirectory() as temp_dir:
+            opt = os.path.join(os.path.realpath(temp_dir), "opt")
+            if src is not None:
+                self._copy_layer(src, wrap_dir1, wrap_dir2, opt)
+            else:
+                extract_layers(zip_paths, opt)
+            files = self._get_package_files(opt)
+            if imports is None:
+                imports = self._find_imports(opt)
+            if not imports:
+                raise LamblayerProfileError("no module to import in the layer.")
+            self.logger.info(f"importing {len(imports)} modules: {' '.join(imports)}")
+
+            version = self._run(
+                [
+                    python,
+                    "-S",
+                    "-c",
+                    "import sys; print('%d.%d' % sys.version_info[:2])",
+                ],
+                temp_dir,
+            ).stdout.strip()
+            paths = [
+                os.path.join(opt, "python", "lib", f"python{version}", "site-packages"),
+                os.path.join(opt, "python"),
+            ]
+            runs = [
+                self._run_importtime(python, paths, imports, temp_dir)
+                for _ in range(repeat)
+            ]
+
+            modules = {}
+            for timings, _, _, _ in runs:
+                for name, timing in timings.items():
+                    modules.setdefault(name, []).append(timing)
+            module_files, errors = runs[-1][1], runs[-1][2]
+            for name, error in errors.items():
+                self.logger.warning(f"failed to import {name}: {error}")
+
+            packages = {}
+            for name, timings in modules.items():
+                path = module_files.get(name)
+                if path and os.path.realpath(path).startswith(opt + os.sep):
+                    arcname = os.path.relpath(path, opt).replace(os.sep, "/")
+                    if os.path.isdir(path):
+                        arcname += "/"
+                    package = get_unit(arcname)
+                else:
+                    package = RUNTIME_PACKAGE
+                packages.setdefault(package, []).append(name)
+
+            parents = runs[-1][3]
+            records = []
+            for package, names in packages.items():
+                names = set(names)
+                # the cumulative time of a package is of its modules imported
+                # from outside the package, which include the rest of it.
+                entries = [
+                    name
+                    for name in names
+                    if not any(
+                        ancestor in names for ancestor in iter_ancestors(name, parents)
+                    )
+                ]
+                package_files = files.get(package, (0, 0))
+                records.append(
+                    {
+                        "Package": package,
+                        "Self": median(modules, names, "Self"),
+                        "Cumulative": median(modules, entries, "Cumulative"),
+                        "Modules": len(names),
+                        "Files": package_files[0],
+                        "Bytes": package_files[1],
+                    }
+                )
+
+        records.sort(key=lambda record: (-record["Cumulative"], record["Package"]))
+        roots = [name for name in modules if parents.get(name) is None]
+        return {
+            "Runtime": f"python{version}",
+            "Imports": imports,
+            "Total": median(modules, roots, "Cumulative"),
+            "Errors": errors,
+            "Packages": records,
+        }
+
+    def _get_interpreter(self, runtime=None):
+        """
+        Return the interpreter of the runtime, ex) python3.9 -> /usr/bin/python3.9
+        """
+        if runtime is None:
+            return sys.executable
+        python = shutil.which(runtime)
+        if python is None:
+            raise LamblayerInvalidOptionError(
+                f"the interpreter is not found: {runtime}"
+            )
+        return python
+
+    def _copy_layer(self, src, wrap_dir1, wrap_dir2, opt):
+        """
+        Copy src into opt, in the same layout as the layer archive.
+        """
+        for path, arcname in iter_layer_entries(src, wrap_dir1, wrap_dir2):
+            target = os.path.join(opt, *arcname.split("/"))
+            if arcname.endswith("/"):
+                os.makedirs(target, exist_ok=True)
+            else:
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                shutil.copy2(path, target)
+
+    def _get_package_files(self, opt):
+        """
+        Return the number of files and the bytes of each package in the layer.
+
+        Returns
+        =======
+        files: dict
+            package -> (files, bytes)
+        """
+        files = {}
+        for root, _, names in os.walk(opt):
+            for name in names:
+                path = os.path.join(root, name)
+                unit = get_unit(os.path.relpath(path, opt).replace(os.sep, "/"))
+                count, size = files.get(unit, (0, 0))
+                files[unit] = (count + 1, size + os.path.getsize(path))
+        return files
+
+    def _find_imports(self, opt):
+        """
+        Return the top-level modules under the package roots of the layer.
+        Private modules, ex) _cffi_backend, and metadata directories are skipped.
+        """
+        imports = set()
+        for root, dirs, names in os.walk(opt):
+            for name in dirs + names:
+                arcname = os.path.relpath(os.path.join(root, name), opt)
+                arcname = arcname.replace(os.sep, "/")
+                if name in dirs:
+                    arcname += "/"
+                if not PACKAGE_ROOTS_RE.match(arcname):
+                    continue
+                _, top, rest = split_package_root(arcname)
+                if rest.strip("/") != top:
+                    continue
+                module = top.split(".")[0]
+                is_package = name in dirs and os.path.exists(
+                    os.path.join(root, name, "__init__.py")
+                )
+                is_module = name not in dirs and name.endswith((".py", ".so"))
+                if (
+                    (is_package or is_module)
+                    and module.isidentifier()
+                    and not module.startswith("_")
+                    and not METADATA_DIR_RE.match(top)
+                ):
+                    imports.add(module)
+        return sorted(imports)
+
+    def _run_importtime(self, python, paths, imports, cwd):
+        """
+        Run the interpreter with `-X importtime` importing the modules.
+
+        Returns
+        =======
+        timings: dict
+            module -> {"Self": us, "Cumulative": us}
+        files: dict
+            module -> the path of the module, or None.
+        errors: dict
+            module -> the error of the failed import.
+        parents: dict
+            module -> the module which imported it, or None.
+        """
+        completed = self._run(
+            [
+                python,
+                "-S",
+                "-X",
+                "importtime",
+                "-c",
+                SCRIPT.format(
+                    paths=paths, imports=imports, start=START_MARKER, end=END_MARKER
+                ),
+            ],
+            cwd,
+        )
+        stderr = completed.stderr.split(START_MARKER, 1)[-1].split(END_MARKER, 1)[0]
+        timings, parents = parse_importtime(stderr)
+        result = json.loads(completed.stdout)
+        return timings, result["Files"], result["Errors"], parents
+
+    def _run(self, args, cwd):
+        env = dict(os.environ, PYTHONDONTWRITEBYTECODE="1")
+        env.pop("PYTHONPATH", None)
+        completed = subprocess.run(
+            args, cwd=cwd, env=env, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            raise LamblayerProfileError(
+                f"{args[0]} exited with {completed.returncode}: "
+                f"{(completed.stderr.strip().splitlines() or [''])[-1]}"
+            )
+        return completed
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of `-X importtime`, ex)
+    import time: self [us] | cumulative | imported package
+    import time:       120 |        120 |     requests.compat
+    import time:       500 |        620 |   requests
+
+    A module is printed after the modules it imported, indented one more level.
+
+    Returns
+    =======
+    timings: dict
+        module -> {"Self": us, "Cumulative": us}
+    parents: dict
+        module -> the module which imported it, or None.
+    """
+    timings = {}
+    parents = {}
+    pending = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        fields = line[len("import time:") :].split("|")
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            continue
+        name = fields[2].strip()
+        depth = len(fields[2]) - len(fields[2].lstrip())
+        for child in pending.pop(depth + 2, []):
+            parents[child] = name
+        pending.setdefault(depth, []).append(name)
+        parents.setdefault(name, None)
+        timings[name] = {"Self": int(fields[0]), "Cumulative": int(fields[1])}
+    return timings, parents
+
+
+def iter_ancestors(name, parents):
+    """
+    Yield the modules which imported the module, the nearest first.
+    """
+    parent = parents.get(name)
+    while parent is not None:
+        yield parent
+        parent = parents.get(parent)
+
+
+def median(modules, names, key):
+    """
+    Return the median of the sum of the timings of the modules across runs.
+
+    Params
+    ======
+    modules: dict
+        module -> timings of each run
+    names: list
+        the modules to sum up
+    key: str
+        "Self" or "Cumulative"
+    """
+    runs = max((len(modules[name]) for name in names), default=0)
+    totals = [
+        sum(modules[name][i][key] for name in names if i < len(modules[name]))
+        for i in range(runs)
+    ]
+    return int(statistics.median(totals)) if totals else 0
+
+
+def compare_results(baseline, result, threshold=DEFAULT_THRESHOLD):
+    """
+    Compare the cumulative import time of the total and each package with the baseline.
+    A regression is slower than the baseline by more than the threshold ratio,
+    and MIN_REGRESSION_US.
+
+    Params
+    ======
+    baseline: dict
+        the result saved before.
+    result: dict
+        the result of `Profile.profile_layer`
+    threshold: float
+        the ratio of the import time to regard as a regression.
+
+    Returns
+    =======
+    regressions: list
+        dicts of "Package", "Baseline", "Cumulative" and "Ratio", the worst first.
+        the total is reported as "(total)".
+    """
+    before = {package["Package"]: package for package in baseline.get("Packages", [])}
+    pairs = [("(total)", baseline.get("Total", 0), result["Total"])] + [
+        (
+            package["Package"],
+            before[package["Package"]]["Cumulative"],
+            package["Cumulative"],
+        )
+        for package in result["Packages"]
+        if package["Package"] in before
+    ]
+    regressions = [
+        {
+            "Package": package,
+            "Baseline": old,
+            "Cumulative": new,
+            "Ratio": (new - old) / old if old else float("inf"),
+        }
+        for package, old, new in pairs
+        if new - old > max(old * threshold, MIN_REGRESSION_US)
+    ]
+    regressions.sort(key=lambda regression: -regression["Ratio"])
+    return regressions
@@ -0,0 +1,347 @@
+import fnmatch
+from datetime import datetime, timezone
+
+import click
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .lamblayer import Lamblayer, DEFAULT_MAX_WORKERS
+from .inventory import Inventory, InventoryStore
+from .utils import echo_table
+from .exceptions import LamblayerInvalidOptionError, LamblayerPruneError
+
+
+DEFAULT_KEEP = 3
+COLUMNS = ["LayerName", "Version", "CreatedDate", "Status", "LayerVersionArn"]
+
+
+class Prune(Lamblayer):
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
+
+    def __call__(self, *args, **kwargs):
+        return self.prune(*args, **kwargs)
+
+    def prune(
+        self,
+        layers=None,
+        keep=DEFAULT_KEEP,
+        older_than=None,
+        dry_run=False,
+        yes=False,
+        max_age=0,
+        db=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+        rate_limit=None,
+    ):
+        """
+        Delete the layer versions which are not used any more.
+
+        The versions to delete are planned by `plan_prune`, and printed first.
+        Then they are deleted concurrently after a confirmation.
+
+        Params
+        ======
+        layers: list
+            glob patterns of the layer names to prune. default: all layers.
+        keep: int
+            the number of the latest versions to keep for each layer.
+        older_than: float
+            delete only the versions created more than this days ago, or None.
+        dry_run: bool
+            print the plan, and stop without deleting.
+        yes: bool
+            delete without a confirmation.
+        max_age: float
+            the seconds to use the inventory index without refreshing it.
+        db: str
+            the path of the inventory index. default: `{cache_dir}/inventory.sqlite3`
+        max_workers: int
+            the maximum number of concurrent API calls.
+        rate_limit: float
+            the maximum number of API calls per second.
+
+        Returns
+        =======
+        plans: list
+            plans from `plan_prune`, Status of deleted versions becomes
+            "deleted" or "failed".
+        """
+        if rate_limit is not None:
+            # a copy with its own retrier, so the rate limit applies only to this call.
+            params = dict(locals(), rate_limit=None)
+            del params["self"]
+            return self._with_rate_limit(rate_limit).prune(**params)
+
+        plans = self.plan_prune(layers, keep, older_than, max_age, db, max_workers)
+        deletes = [plan for plan in plans if plan["Status"] == "delete"]
+        self._print_plan(plans)
+        if dry_run or not deletes:
+            return plans
+        if not yes:
+            click.confirm(f"Delete {len(deletes)} layer versions?", abort=True)
+
+        self.apply_prune(plans, max_workers)
+
+        failed = [plan for plan in plans if plan["Status"] == "failed"]
+        if failed:
+            raise LamblayerPruneError(
+                f"failed to delete {len(failed)} of {len(deletes)} layer versions."
+            )
+        return plans
+
+    def plan_prune(
+        self,
+        layers=None,
+        keep=DEFAULT_KEEP,
+        older_than=None,
+        max_age=0,
+        db=None,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        Decide which versions of the layers to delete. A version is kept if,
+        - it is one of the `keep` latest versions of the layer. ("latest")
+        - any version of any function in the region uses it. ("referenced")
+        - it is created within `older_than` days. ("recent")
+        - it is shared with other accounts by a layer version policy,
+          since their functions are not visible. ("shared")
+
+        The references are looked up in the inventory index, refreshed if it is
+        older than max_age, so that no version in use is deleted.
+
+        Params
+        ======
+        layers: list
+            glob patterns of the layer names to prune. default: all layers.
+        keep: int
+            the number of the latest versions to keep for each layer.
+        older_than: float
+            delete only the versions created more than this days ago, or None.
+        max_age: float
+            the seconds to use the inventory index without refreshing it.
+        db: str
+            the path of the inventory index.
+        max_workers: int
+            the maximum number of concurrent API calls.
+
+        Returns
+        =======
+        plans: list
+            dicts of "LayerName", "Version", "CreatedDate", "LayerVersionArn",
+            "References", "Status", "Reason" and "Error" for each version, newest first.
+            Status is "keep" with Reason, or "delete".
+        """
+        if keep < 0:
+            raise LamblayerInvalidOptionError(f"`--keep` must be 0 or more: {keep}")
+
+        client = self._get_client("lambda")
+        layer_names = [
+            layer["LayerName"]
+            for page in self._paginate(client.list_layers, "Layers")
+            for layer in page
+            if not layers
+            or any(
+                fnmatch.fnmatchcase(layer["LayerName"], pattern) for pattern in layers
+            )
+        ]
+        self.logger.info(f"listing versions of {len(layer_names)} layers")
+        versions = self._map_concurrently(
+            lambda layer_name: [
+                layer_version
+                for page in self._paginate(
+                    client.list_layer_versions, "LayerVersions", LayerName=layer_name
+                )
+                for layer_version in page
+            ],
+            layer_names,
+            max_workers,
+        )
+        references = self._get_references(max_age, db, max_workers)
+
+        now = datetime.now(timezone.utc)
+        plans = []
+        for layer_name, layer_versions in zip(layer_names, versions):
+            layer_versions = sorted(
+                layer_versions, key=lambda layer_version: -layer_version["Version"]
+            )
+            for i, layer_version in enumerate(layer_versions):
+                layer_version_arn = layer_version["LayerVersionArn"]
+                age = now - parse_created_date(layer_version["CreatedDate"])
+                plan = {
+                    "LayerName": layer_name,
+                    "Version": layer_version["Version"],
+                    "CreatedDate": layer_version["CreatedDate"],
+                    "LayerVersionArn": layer_version_arn,
+                    "References": references.get(layer_version_arn, 0),
+                    "Status": "keep",
+                    "Reason": None,
+                    "Error": None,
+                }
+                if i < keep:
+                    plan["Reason"] = "latest"
+                elif plan["References"]:
+                    plan["Reason"] = "referenced"
+                elif (
+                    older_than is not None and age.total_seconds() < older_than * 86400
+                ):
+                    plan["Reason"] = "recent"
+                else:
+                    plan["Status"] = "delete"
+                plans.append(plan)
+
+        candidates = [plan for plan in plans if plan["Status"] == "delete"]
+        shared = self._map_concurrently(
+            lambda plan: self._is_shared(plan, client), candidates, max_workers
+        )
+        for plan, is_shared in zip(candidates, shared):
+            if is_shared:
+                plan["Status"] = "keep"
+                plan["Reason"] = "shared"
+        return plans
+
+    def apply_prune(self, plans, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Delete the versions whose plan is "delete", concurrently.
+        A failure in a version doesn't stop the others, and the status of each plan
+        becomes "deleted" or "failed" in place.
+
+        Params
+        ======
+        plans: list
+            plans from `plan_prune`
+        max_workers: int
+            the maximum number of concurrent deletes.
+
+        Returns
+        =======
+        plans: list
+            the same plans.
+        """
+        client = self._get_client("lambda")
+        deletes = [plan for plan in plans if plan["Status"] == "delete"]
+        errors = self._map_concurrently(
+            lambda plan: self._delete_layer_version(plan, client),
+            deletes,
+            max_workers,
+        )
+        for plan, error in zip(deletes, errors):
+            plan["Status"] = "failed" if error else "deleted"
+            plan["Error"] = error
+        return plans
+
+    def _get_references(self, max_age=0, db=None, max_workers=DEFAULT_MAX_WORKERS):
+        """
+        Return the number of function versions using each layer version in the region.
+
+        Returns
+        =======
+        references: dict
+            layer version ARN -> the number of function versions
+        """
+        inventory = Inventory(self.profile, self.region, self.log_level, self.logger)
+        inventory.retrier = self.retrier
+        regions = inventory._get_regions()
+        store = InventoryStore(db)
+        try:
+            inventory.refresh(store, regions, max_age, max_workers)
+            records = store.query(
+                inventory.account_id, regions=regions, all_versions=True
+            )
+        finally:
+            store.close()
+
+        references = {}
+        for record in records:
+            layer_version_arn = record["LayerVersionArn"]
+            references[layer_version_arn] = references.get(layer_version_arn, 0) + 1
+        return references
+
+    def _is_shared(self, plan, client):
+        """
+        Return whether the layer version has a policy, which grants other accounts.
+        A policy which can't be read is regarded as shared.
+        """
+        try:
+            self.retrier.call(
+                client.get_layer_version_policy,
+                LayerName=plan["LayerName"],
+                VersionNumber=plan["Version"],
+            )
+        except ClientError as e:
+            if e.response["Error"]["Code"] == "ResourceNotFoundException":
+                return False
+            self.logger.warning(
+                f"{plan['LayerVersionArn']}: {e.__class__.__name__}: {e}"
+            )
+        return True
+
+    def _delete_layer_version(self, plan, client):
+        """
+        Delete the layer version.
+
+        Params
+        ======
+        plan: dict
+            a plan to delete
+        client: Lambda.Client
+
+        Returns
+        =======
+        error: str or None
+            the error message if the delete failed, or None.
+        """
+        self.logger.info(f"deleting {plan['LayerVersionArn']}")
+        try:
+            self.retrier.call(
+                client.delete_layer_version,
+                LayerName=plan["LayerName"],
+                VersionNumber=plan["Version"],
+            )
+        except (BotoCoreError, ClientError) as e:
+            error = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{plan['LayerVersionArn']}: {error}")
+            return error
+        return None
+
+    def _print_plan(self, plans):
+        """
+        Print the versions to delete, and a summary of the versions to keep.
+
+        Params
+        ======
+        plans: list
+            plans from `plan_prune`
+        """
+        deletes = [plan for plan in plans if plan["Status"] == "delete"]
+        if deletes:
+            echo_table(deletes, COLUMNS)
+
+        reasons = {}
+        for plan in plans:
+            if plan["Status"] == "keep":
+                reasons[plan["Reason"]] = reasons.get(plan["Reason"], 0) + 1
+        summary = f"Plan: {len(deletes)} to delete, {len(plans) - len(deletes)} to keep"
+        if reasons:
+            summary += (
+                " ("
+                + ", ".join(f"{count} {reason}" for reason, count in reasons.items())
+                + ")"
+            )
+        click.echo(summary + ".")
+
+
+def parse_created_date(created_date):
+    """
+    Parse `CreatedDate` of a layer version, ex) "2018-11-27T15:10:45.123+0000"
+
+    Returns
+    =======
+    created_date: datetime.datetime
+        an aware datetime.
+    """
+    for date_format in ("%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"):
+        try:
+            return datetime.strptime(created_date, date_format)
+        except ValueError:
+            continue
+    raise LamblayerPruneError(f"invalid CreatedDate: {created_date}")
@@ -0,0 +1,287 @@
+import os
+import re
+import json
+import time
+import operator
+import threading
+
+from .cache import get_cache_dir, write_json_atomic
+from .exceptions import LamblayerInvalidOptionError, LamblayerResolveLayerError
+
+
+# a semantic version in the description of a layer version, ex) "my layer v1.2.3"
+SEMVER_RE = re.compile(r"\bv?(\d+)\.(\d+)\.(\d+)\b")
+CONSTRAINT_RE = re.compile(
+    r"^(\^|~|==|!=|>=|<=|>|<)?\s*v?(\d+)(?:\.(\d+))?(?:\.(\d+))?$"
+)
+OPERATORS = {
+    "==": operator.eq,
+    "!=": operator.ne,
+    ">=": operator.ge,
+    "<=": operator.le,
+    ">": operator.gt,
+    "<": operator.lt,
+}
+FILTER_KEYS = {
+    "runtime": "CompatibleRuntime",
+    "arch": "CompatibleArchitecture",
+}
+
+
+def parse_layer_spec(spec):
+    """
+    Parse a layer spec of function.json, which is a layer name (or a layer ARN
+    without version) with optional pinning rules after "@".
+
+    - `my_layer`, `my_layer@latest`: the latest version.
+    - `my_layer@runtime=python3.9,arch=arm64`: the latest version compatible
+      with the runtime and/or the architecture.
+    - `my_layer@^1.2`: the highest semantic version in the description of versions,
+      which matches the constraint. `^`, `~`, `==`, `!=`, `>=`, `<=`, `>` and `<`
+      are supported, ex) `my_layer@>=1.2,<2`.
+
+    Rules can be combined with commas, ex) `my_layer@runtime=python3.9,~1.4`.
+
+    Params
+    ======
+    spec: str
+        the layer spec
+
+    Returns
+    =======
+    layer_name: str
+        the layer name or ARN.
+    filters: dict
+        "CompatibleRuntime" and "CompatibleArchitecture" of `list_layer_versions`.
+    constraints: list
+        (operator, version) pairs of the semantic version.
+    """
+    layer_name, _, rules = spec.partition("@")
+    filters = {}
+    constraints = []
+    for rule in rules.split(","):
+        rule = rule.strip()
+        if not rule or rule == "latest":
+            continue
+        key, sep, value = rule.partition("=")
+        if sep and key in FILTER_KEYS:
+            filters[FILTER_KEYS[key]] = value
+        else:
+            constraints.extend(_parse_constraint(rule, spec))
+    return layer_name, filters, constraints
+
+
+def _parse_constraint(rule, spec):
+    """
+    Parse a semantic version constraint into (operator, version) pairs.
+    """
+    m = CONSTRAINT_RE.match(rule)
+    if m is None:
+        raise LamblayerInvalidOptionError(f"invalid pinning rule `{rule}` in {spec}")
+    op, *parts = m.groups()
+    parts = [int(part) for part in parts if part is not None]
+    version = tuple(parts + [0] * (3 - len(parts)))
+
+    if op == "^":
+        # the left-most non-zero part must not change.
+        if version[0] > 0 or len(parts) == 1:
+            upper = (version[0] + 1, 0, 0)
+        elif version[1] > 0 or len(parts) == 2:
+            upper = (0, version[1] + 1, 0)
+        else:
+            upper = (0, 0, version[2] + 1)
+        return [(">=", version), ("<", upper)]
+    if op == "~":
+        if len(parts) == 1:
+            upper = (version[0] + 1, 0, 0)
+        else:
+            upper = (version[0], version[1] + 1, 0)
+        return [(">=", version), ("<", upper)]
+    if op is None:
+        # a partial version matches the versions with the prefix, ex) "1.2" is "~1.2".
+        if len(parts) == 3:
+            return [("==", version)]
+        return _parse_constraint("~" + rule, spec)
+    return [(op, version)]
+
+
+def parse_version(description):
+    """
+    Return the semantic version in the description as a tuple, or None.
+    """
+    m = SEMVER_RE.search(description or "")
+    if m is None:
+        return None
+    return tuple(int(part) for part in m.groups())
+
+
+def is_layer_version_arn(spec):
+    """
+    Return whether the spec is already a layer version ARN,
+    ex) arn:aws:lambda:{region}:{account}:layer:{name}:{version}
+    """
+    return spec.startswith("arn:") and len(spec.split(":")) == 8
+
+
+class LayerResolver:
+    """
+    Resolve layer specs to layer version ARNs, each spec only once.
+
+    Resolved ARNs are looked up in the following order,
+    1. the lockfile, if passed. resolving from it needs no API call.
+    2. the on-disk cache `{cache_dir}/resolved.json`, if ttl is passed.
+    3. `list_layer_versions`
+
+    The lockfile and the cache are keyed by the account id and the region, since
+    the same layer name resolves to a layer of the account.
+
+    `resolve` is thread safe, and `save` writes the lockfile and the cache.
+    """
+
+    def __init__(
+        self,
+        client,
+        retrier,
+        region,
+        account_id=None,
+        profile=None,
+        lockfile=None,
+        update_lock=False,
+        ttl=None,
+        logger=None,
+        cache_dir=None,
+    ):
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        self.client = client
+        self.retrier = retrier
+        self.region = region
+        self.account_id = account_id
+        self.profile = profile
+        self.lockfile = lockfile
+        self.update_lock = update_lock
+        self.ttl = ttl
+        self.logger = logger
+        self.cache_path = os.path.join(cache_dir, "resolved.json")
+
+        self.resolved = {}
+        self.lock = threading.Lock()
+        self.locked = self._load_lockfile() if lockfile else {}
+        self.locked.setdefault("Layers", {}).setdefault(self._lock_key(), {})
+        self.cached = self._load_cache() if ttl else {}
+
+    def resolve(self, spec):
+        """
+        Resolve the spec to the layer version ARN.
+
+        Params
+        ======
+        spec: str
+            a layer spec, see `parse_layer_spec`. a layer version ARN is returned as is.
+
+        Returns
+        =======
+        layer_version_arn: str
+        """
+        if is_layer_version_arn(spec):
+            return spec
+        with self.lock:
+            if spec in self.resolved:
+                return self.resolved[spec]
+
+        source = "api"
+        locked = self.locked["Layers"][self._lock_key()].get(spec)
+        cached = self.cached.get(self._cache_key(spec))
+        if locked is not None and not self.update_lock:
+            layer_version_arn = locked
+            source = "lockfile"
+        elif cached is not None and time.time() - cached["ResolvedAt"] < self.ttl:
+            layer_version_arn = cached["LayerVersionArn"]
+            source = "cache"
+        else:
+            layer_version_arn = self._resolve_remote(spec)
+
+        with self.lock:
+            self.resolved[spec] = layer_version_arn
+            self.locked["Layers"][self._lock_key()][spec] = layer_version_arn
+            if source == "api":
+                self.cached[self._cache_key(spec)] = {
+                    "LayerVersionArn": layer_version_arn,
+                    "ResolvedAt": time.time(),
+                }
+        if self.logger is not None:
+            self.logger.debug(f"resolved {spec} to {layer_version_arn} ({source})")
+        return layer_version_arn
+
+    def save(self):
+        """
+        Write the resolved ARNs into the lockfile and the on-disk cache.
+        """
+        if self.lockfile:
+            write_json_atomic(self.lockfile, self.locked)
+        if self.ttl:
+            write_json_atomic(self.cache_path, self.cached)
+
+    def _resolve_remote(self, spec):
+        """
+        Resolve the spec with `list_layer_versions`.
+        Versions are listed newest first, so the first one is the latest.
+        """
+        layer_name, filters, constraints = parse_layer_spec(spec)
+        if not constraints:
+            response = self.retrier.call(
+                self.client.list_layer_versions,
+                LayerName=layer_name,
+                MaxItems=1,
+                **filters,
+            )
+            if response["LayerVersions"]:
+                return response["LayerVersions"][0]["LayerVersionArn"]
+            raise LamblayerResolveLayerError(f"no version of layer matches {spec}")
+
+        candidates = []
+        for layer_versions in self.retrier.paginate(
+            self.client.list_layer_versions,
+            "LayerVersions",
+            LayerName=layer_name,
+            **filters,
+        ):
+            for layer_version in layer_versions:
+                version = parse_version(layer_version.get("Description"))
+                if version is not None and all(
+                    OPERATORS[op](version, bound) for op, bound in constraints
+                ):
+                    candidates.append(
+                        (
+                            version,
+                            layer_version["Version"],
+                            layer_version["LayerVersionArn"],
+                        )
+                    )
+        if not candidates:
+            raise LamblayerResolveLayerError(f"no version of layer matches {spec}")
+        # the highest semantic version, and the newest one of the same version.
+        return max(candidates)[2]
+
+    def _lock_key(self):
+        return f"{self.account_id}:{self.region}"
+
+    def _cache_key(self, spec):
+        return f"{self.account_id}:{self.region}:{spec}"
+
+    def _load_lockfile(self):
+        try:
+            with open(self.lockfile, "r") as f:
+                locked = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except ValueError:
+            raise LamblayerInvalidOptionError(f"invalid lockfile: {self.lockfile}")
+        return locked
+
+    def _load_cache(self):
+        try:
+            with open(self.cache_path, "r") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
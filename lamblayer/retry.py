@@ -0,0 +1,183 @@
+import time
+import random
+import threading
+
+from botocore.exceptions import ClientError
+
+from .exceptions import LamblayerUpdateFunctionError
+
+
+# Lambda control plane allows 15 requests per second per account and region.
+DEFAULT_RATE_LIMIT = 10.0
+DEFAULT_MAX_ATTEMPTS = 8
+DEFAULT_BASE_DELAY = 0.5
+DEFAULT_MAX_DELAY = 20.0
+DEFAULT_WAIT_TIMEOUT = 300.0
+DEFAULT_WAIT_INTERVAL = 1.0
+
+RETRYABLE_ERROR_CODES = {
+    "TooManyRequestsException",
+    "ThrottlingException",
+    "ResourceConflictException",
+    "ResourceNotReadyException",
+    "ServiceException",
+}
+
+
+class TokenBucket:
+    """
+    A thread safe token bucket, which allows `rate` calls per second
+    and bursts up to `capacity` calls.
+    """
+
+    def __init__(self, rate=DEFAULT_RATE_LIMIT, capacity=None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token, blocking until one is available.
+        """
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated_at) * self.rate
+                )
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+class Retrier:
+    """
+    Call AWS APIs with token bucket rate limiting, and retry throttled or
+    conflicting calls with jittered exponential backoff.
+    A Retrier is shared by all threads of a command, so the rate limit applies
+    to the command as a whole.
+    """
+
+    def __init__(
+        self,
+        rate_limit=DEFAULT_RATE_LIMIT,
+        max_attempts=DEFAULT_MAX_ATTEMPTS,
+        base_delay=DEFAULT_BASE_DELAY,
+        max_delay=DEFAULT_MAX_DELAY,
+        logger=None,
+    ):
+        self.bucket = TokenBucket(rate_limit)
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.logger = logger
+
+    def call(self, method, **kwargs):
+        """
+        Call the client method, retrying on RETRYABLE_ERROR_CODES.
+
+        Params
+        ======
+        method: callable
+            a boto3 client method, ex) `client.update_function_configuration`
+        kwargs:
+            parameters of the method
+
+        Returns
+        =======
+        response: dict
+            the response of the method
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.bucket.acquire()
+            try:
+                return method(**kwargs)
+            except ClientError as e:
+                code = e.response["Error"]["Code"]
+                if code not in RETRYABLE_ERROR_CODES or attempt == self.max_attempts:
+                    raise
+                # full jitter, see "Exponential Backoff And Jitter" on AWS Architecture Blog.
+                delay = random.uniform(
+                    0, min(self.max_delay, self.base_delay * 2**attempt)
+                )
+                if self.logger is not None:
+                    self.logger.debug(
+                        f"{method.__name__}: {code}, retrying in {delay:.2f}s "
+                        f"({attempt}/{self.max_attempts})"
+                    )
+                time.sleep(delay)
+
+    def paginate(self, method, key, **kwargs):
+        """
+        Call the paginated client method until `NextMarker` runs out.
+        Each call goes through `call`.
+
+        Params
+        ======
+        method: callable
+            a boto3 client method, ex) `client.list_layers`
+        key: str
+            the key of items in the response, ex) "Layers"
+        kwargs:
+            parameters of the method
+
+        Yields
+        ======
+        items: list
+            the items of each page
+        """
+        while True:
+            response = self.call(method, **kwargs)
+            yield response.get(key, [])
+            marker = response.get("NextMarker")
+            if not marker:
+                return
+            kwargs["Marker"] = marker
+
+    def wait_function_updated(
+        self,
+        client,
+        function_name,
+        timeout=DEFAULT_WAIT_TIMEOUT,
+        interval=DEFAULT_WAIT_INTERVAL,
+    ):
+        """
+        Poll `LastUpdateStatus` of the function until it becomes `Successful`.
+
+        Params
+        ======
+        client: Lambda.Client
+        function_name: str
+            the name of the function
+        timeout: float
+            the maximum seconds to wait.
+        interval: float
+            the seconds between polls.
+
+        Returns
+        =======
+        configuration: dict
+            the response of `get_function_configuration`
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            configuration = self.call(
+                client.get_function_configuration, FunctionName=function_name
+            )
+            status = configuration.get("LastUpdateStatus", "Successful")
+            if status == "Successful":
+                return configuration
+            if status == "Failed":
+                raise LamblayerUpdateFunctionError(
+                    f"{function_name}: {configuration.get('LastUpdateStatusReason')}"
+                )
+            if time.monotonic() > deadline:
+                raise LamblayerUpdateFunctionError(
+                    f"{function_name}: timed out waiting for the update, status is {status}."
+                )
+            time.sleep(interval)
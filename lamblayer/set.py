@@ -1,37 +1,320 @@
+import os
+import glob
 import json
 
-from .lamblayer import Lamblayer
+import click
+from botocore.exceptions import BotoCoreError, ClientError
+
+from .lamblayer import Lamblayer, DEFAULT_MAX_WORKERS, map_concurrently
+from .resolver import LayerResolver
+from .exceptions import (
+    LamblayerInvalidOptionError,
+    LamblayerParamValidationError,
+    LamblayerResolveLayerError,
+    LamblayerSetLayerError,
+    LamblayerUpdateFunctionError,
+)
 
 
 class Set(Lamblayer):
-    def __init__(self, profile, region, log_level):
-        super().__init__(profile, region, log_level)
+    def __init__(self, profile, region, log_level, logger=None):
+        super().__init__(profile, region, log_level, logger)
 
-    def __call__(self, function_path):
-        self.set_(function_path)
+    def __call__(self, *args, **kwargs):
+        return self.set_(*args, **kwargs)
 
-    def set_(self, function_path):
+    def set_(
+        self,
+        function_paths,
+        max_workers=DEFAULT_MAX_WORKERS,
+        wait=False,
+        rate_limit=None,
+        dry_run=False,
+        lockfile=None,
+        update_lock=False,
+        resolve_ttl=None,
+    ):
         """
         Set the layers.
 
+        The current layers of each function are compared with the config first,
+        and only the functions whose layers differ are updated.
+
+        Params
+        ======
+        function_paths: str, list
+            function config file paths, directories, glob patterns,
+            or manifest files which have the list of functions as "Functions".
+        max_workers: int
+            the maximum number of concurrent updates.
+        wait: bool
+            wait until `LastUpdateStatus` of each function becomes `Successful`, or not.
+        rate_limit: float
+            the maximum number of API calls per second.
+        dry_run: bool
+            print the plan, and stop without updating functions and config files.
+        lockfile: str
+            resolve layer names from this lockfile, and write newly resolved ones into it.
+        update_lock: bool
+            resolve all layer names again, ignoring the lockfile.
+        resolve_ttl: float
+            cache the resolved layer names on disk for this seconds, or None.
+
+        Returns
+        =======
+        plans: list
+            dicts of "FunctionName", "Status", "Current", "Layers" and "Error"
+            for each function.
+            Status is one of "unchanged", "update", "updated" or "failed".
+        """
+        if rate_limit is not None:
+            # a copy with its own retrier, so the rate limit applies only to this call.
+            params = dict(locals(), rate_limit=None)
+            del params["self"]
+            return self._with_rate_limit(rate_limit).set_(**params)
+        if isinstance(function_paths, str):
+            function_paths = [function_paths]
+        self.logger.debug(f"function: {function_paths}")
+
+        function_paths = expand_function_paths(function_paths)
+        configs = [load_function_json(path) for path in function_paths]
+        functions = [function for _, functions in configs for function in functions]
+        specs = [list(function["Layers"]) for function in functions]
+
+        plans = self.plan_layers(
+            functions,
+            max_workers,
+            lockfile,
+            update_lock,
+            resolve_ttl,
+            save=not dry_run,
+        )
+        self._print_plan(plans)
+        if dry_run:
+            return plans
+
+        # update function.json for lambroll, keeping the specs which are resolved
+        # by the pinning rules or the lockfile on the next run.
+        self._keep_layer_specs(functions, specs, keep_all=bool(lockfile))
+        for function_path, (layer_param, _) in zip(function_paths, configs):
+            with open(function_path, "w") as f:
+                json.dump(layer_param, f)
+
+        self.apply_plans(plans, max_workers, wait)
+
+        failed = [plan for plan in plans if plan["Status"] == "failed"]
+        if failed:
+            raise LamblayerSetLayerError(
+                f"failed to set layers to {len(failed)} of {len(plans)} functions."
+            )
+        return plans
+
+    def plan_layers(
+        self,
+        functions,
+        max_workers=DEFAULT_MAX_WORKERS,
+        lockfile=None,
+        update_lock=False,
+        resolve_ttl=None,
+        save=True,
+    ):
+        """
+        Resolve the layer specs of the functions, and compare them with the current
+        layers. The "Layers" of functions are replaced by the resolved ARNs in place.
+
+        Params
+        ======
+        functions: list
+            dicts of "FunctionName" and "Layers".
+        max_workers: int
+            the maximum number of concurrent API calls.
+        lockfile: str
+            resolve layer names from this lockfile, and write newly resolved ones into it.
+        update_lock: bool
+            resolve all layer names again, ignoring the lockfile.
+        resolve_ttl: float
+            cache the resolved layer names on disk for this seconds, or None.
+        save: bool
+            write the lockfile and the on-disk cache, or not.
+
+        Returns
+        =======
+        plans: list
+            plans from `_plan_function_layers`, in the same order as functions.
+        """
+        # resolve each layer name only once, and share it with all functions.
+        client = self._get_client("lambda")
+        resolver = LayerResolver(
+            client,
+            self.retrier,
+            self.session.region_name,
+            self.account_id if lockfile or resolve_ttl else None,
+            self.profile,
+            lockfile,
+            update_lock,
+            resolve_ttl,
+            self.logger,
+        )
+        errors = self._resolve_layers(functions, client, max_workers, resolver)
+
+        plans = self._map_concurrently(
+            lambda function: self._plan_function_layers(function, client, errors),
+            functions,
+            max_workers,
+        )
+        if save:
+            resolver.save()
+        return plans
+
+    def apply_plans(self, plans, max_workers=DEFAULT_MAX_WORKERS, wait=False):
+        """
+        Update the layers of the functions whose plan is "update".
+        A failure in a function doesn't stop the others, and the status of each plan
+        becomes "updated" or "failed" in place.
+
+        Params
+        ======
+        plans: list
+            plans from `plan_layers`
+        max_workers: int
+            the maximum number of concurrent updates.
+        wait: bool
+            wait until `LastUpdateStatus` of each function becomes `Successful`, or not.
+
+        Returns
+        =======
+        plans: list
+            the same plans.
+        """
+        client = self._get_client("lambda")
+        updates = [plan for plan in plans if plan["Status"] == "update"]
+        errors = self._map_concurrently(
+            lambda plan: self._update_function_layers(plan, client, wait),
+            updates,
+            max_workers,
+        )
+        for plan, error in zip(updates, errors):
+            plan["Status"] = "failed" if error else "updated"
+            plan["Error"] = error
+        return plans
+
+    def _plan_function_layers(self, function, client, errors=None):
+        """
+        Compare the current layers of the function with the config.
+
         Params
         ======
-        function_path: str
-            function config file path
+        function: dict
+            "FunctionName" and "Layers" of the function.
+        client: Lambda.Client
+        errors: dict
+            the errors of the layer specs which failed to resolve, from `_resolve_layers`.
 
+        Returns
+        =======
+        plan: dict
+            "FunctionName", "Status", "Current", "Layers" and "Error".
+            Status is "unchanged", "update", or "failed" if a layer can't be resolved
+            or the function can't be read.
         """
-        self.logger.debug(f"function: {function_path}")
+        function_name = function["FunctionName"]
+        plan = {
+            "FunctionName": function_name,
+            "Status": "failed",
+            "Current": None,
+            "Layers": function["Layers"],
+            "Error": None,
+        }
+        unresolved = [spec for spec in function["Layers"] if spec in (errors or {})]
+        if unresolved:
+            plan["Error"] = errors[unresolved[0]]
+            return plan
+        try:
+            configuration = self.retrier.call(
+                client.get_function_configuration, FunctionName=function_name
+            )
+        except (BotoCoreError, ClientError) as e:
+            plan["Error"] = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{function_name}: {plan['Error']}")
+            return plan
+
+        # the order of layers matters, a later layer overrides the earlier ones.
+        plan["Current"] = [layer["Arn"] for layer in configuration.get("Layers", [])]
+        if plan["Current"] == plan["Layers"]:
+            plan["Status"] = "unchanged"
+        else:
+            plan["Status"] = "update"
+        return plan
 
-        function_name, layers = self._parse_function_json(function_path)
+    def _print_plan(self, plans):
+        """
+        Print the diff of layers of the functions to update, and a summary.
+
+        Params
+        ======
+        plans: list
+            plans from `_plan_function_layers`
+        """
+        for plan in plans:
+            if plan["Status"] != "update":
+                continue
+            click.echo(f"~ {plan['FunctionName']}")
+            for arn in plan["Current"]:
+                if arn not in plan["Layers"]:
+                    click.echo(f"    - {arn}")
+            for arn in plan["Layers"]:
+                if arn not in plan["Current"]:
+                    click.echo(f"    + {arn}")
+            if sorted(plan["Current"]) == sorted(plan["Layers"]):
+                click.echo("    (order changed)")
+
+        counts = {
+            status: sum(plan["Status"] == status for plan in plans)
+            for status in ("update", "unchanged", "failed")
+        }
+        click.echo(
+            f"Plan: {counts['update']} to update, {counts['unchanged']} unchanged"
+            + (f", {counts['failed']} failed to read." if counts["failed"] else ".")
+        )
+
+    def _update_function_layers(self, function, client, wait=False):
+        """
+        Update the layers of the function.
+        Throttled or conflicting updates are retried with backoff.
+
+        Params
+        ======
+        function: dict
+            "FunctionName" and "Layers" of the function, ex) a plan to update.
+        client: Lambda.Client
+        wait: bool
+            wait until the update is completed, or not.
+
+        Returns
+        =======
+        error: str or None
+            the error message if the update failed, or None.
+        """
+        function_name = function["FunctionName"]
+        layers = function["Layers"]
 
         self.logger.info(f"starting set layers to {function_name}")
         self.logger.debug(f"function: {function_name}")
         self.logger.debug(f"layers: {layers}")
 
-        self.session.client("lambda").update_function_configuration(
-            FunctionName=function_name,
-            Layers=layers,
-        )
+        try:
+            self.retrier.call(
+                client.update_function_configuration,
+                FunctionName=function_name,
+                Layers=layers,
+            )
+            if wait:
+                self.retrier.wait_function_updated(client, function_name)
+        except (BotoCoreError, ClientError, LamblayerUpdateFunctionError) as e:
+            error = f"{e.__class__.__name__}: {e}"
+            self.logger.error(f"{function_name}: {error}")
+            return error
+        return None
 
     def _parse_function_json(self, function_path):
         """
@@ -49,68 +332,202 @@ class Set(Lamblayer):
         layers: list
             the ARNs (Amazon Resource Name) of the layers.
         """
-        with open(function_path, "r") as f:
-            layer_param = json.load(f)
-        function_name = layer_param.get("FunctionName")
-        layers_name = layer_param.get("Layers")
-
-        if isinstance(layers_name, str):
-            layers_name = [layers_name]
-
-        # If the name of layer is only passed, completes it to the ARN(Amazon Resourse Name) with the latest version number.
-        layers = [
-            self._gen_layer_arn(l_name, self._get_layer_latest_version_number(l_name))
-            if ":" not in l_name
-            else l_name
-            for l_name in layers_name
-        ]
+        layer_param, functions = load_function_json(function_path)
+        specs = [list(function["Layers"]) for function in functions]
+        errors = self._resolve_layers(functions)
+        if errors:
+            raise LamblayerResolveLayerError(next(iter(errors.values())))
+        layers = functions[0]["Layers"]
+        self._keep_layer_specs(functions, specs)
 
         # update function.json for lambroll.
-        if layers_name is not None:
-            with open(function_path, "w") as f:
-                layer_param["Layers"] = layers
-                json.dump(layer_param, f)
+        with open(function_path, "w") as f:
+            json.dump(layer_param, f)
 
-        return function_name, layers
+        return layer_param.get("FunctionName"), layers
 
-    def _get_layer_latest_version_number(self, layer_name):
+    def _keep_layer_specs(self, functions, specs, keep_all=False):
         """
-        Return the latest version number of the layer.
+        Put the layer specs with pinning rules back into "Layers" of the functions
+        in place, in place of the resolved ARNs, ex) `my_layer@^1.2`.
+        The other layer names stay resolved to the ARNs, as lambroll reads them.
 
         Params
         ======
-        layer_name: str
-            the layer name or ARN of the layer
+        functions: list
+            dicts of "FunctionName" and the resolved "Layers".
+        specs: list
+            the layer specs of each function before resolving.
+        keep_all: bool
+            keep all layer names, ex) they are resolved from a lockfile.
 
-        Returns
-        =======
-        latest_version: int
-            the latest version number of the layer
         """
-        response = self.session.client("lambda").list_layer_versions(
-            LayerName=layer_name,
-        )
-        try:
-            version = int(response["LayerVersions"][0]["Version"])
-        except IndexError:
-            version = 1
+        for function, function_specs in zip(functions, specs):
+            function["Layers"] = [
+                spec if keep_all or "@" in spec else layer_version_arn
+                for spec, layer_version_arn in zip(function_specs, function["Layers"])
+            ]
 
-        return version
-
-    def _gen_layer_arn(self, layer_name, version):
+    def _resolve_layers(
+        self, functions, client=None, max_workers=DEFAULT_MAX_WORKERS, resolver=None
+    ):
         """
-        Return the ARN of the layer.
+        Resolve layer specs of functions in place, see `resolve_layers`.
 
         Params
         ======
-        layer_name: str
-            the name of the layer
-        version: str, int
-            the version number of the layer
+        functions: list
+            dicts of "FunctionName" and "Layers".
+        client: Lambda.Client
+            default: a client of current session.
+        max_workers: int
+            the maximum number of concurrent API calls.
+        resolver: LayerResolver
+            default: a resolver without lockfile and on-disk cache.
 
         Returns
         =======
-        layer_arn: str
-            the ARN of the layer.
+        errors: dict
+            the error message of each spec which failed to resolve.
         """
-        return f"arn:aws:lambda:{self.region}:{self.account_id}:layer:{layer_name}:{version}"
+        if client is None:
+            client = self._get_client("lambda")
+        if resolver is None:
+            resolver = LayerResolver(
+                client,
+                self.retrier,
+                self.session.region_name,
+                profile=self.profile,
+                logger=self.logger,
+            )
+        return resolve_layers(functions, resolver, max_workers, self.logger)
+
+
+def expand_function_paths(function_paths):
+    """
+    Expand directories and glob patterns into function config file paths.
+
+    Params
+    ======
+    function_paths: list
+        function config file paths, directories or glob patterns.
+
+    Returns
+    =======
+    paths: list
+        function config file paths, without duplicates.
+    """
+    paths = []
+    for function_path in function_paths:
+        if os.path.isdir(function_path):
+            matched = sorted(glob.glob(os.path.join(function_path, "*.json")))
+        elif glob.has_magic(function_path):
+            matched = sorted(glob.glob(function_path))
+        else:
+            matched = [function_path]
+        if not matched:
+            raise LamblayerInvalidOptionError(
+                f"no function config file matches {function_path}."
+            )
+        paths.extend(path for path in matched if path not in paths)
+    return paths
+
+
+def load_function_json(function_path):
+    """
+    Load a function config file, or a manifest of function config.
+
+    Params
+    ======
+    function_path: str
+        function config file path
+
+    Returns
+    =======
+    layer_param: dict
+        the content of the file.
+    functions: list
+        dicts of "FunctionName" and "Layers", which are shared with layer_param.
+    """
+    with open(function_path, "r") as f:
+        layer_param = json.load(f)
+
+    functions = layer_param.get("Functions", [layer_param])
+    normalize_layers(functions)
+
+    return layer_param, functions
+
+
+def normalize_layers(functions):
+    """
+    Make "Layers" of the functions a list in place, ex) "my_layer" -> ["my_layer"]
+
+    Params
+    ======
+    functions: list
+        dicts of "FunctionName" and "Layers".
+
+    """
+    for function in functions:
+        layers_name = function.get("Layers")
+        if isinstance(layers_name, str):
+            function["Layers"] = [layers_name]
+        elif not isinstance(layers_name, list):
+            raise LamblayerParamValidationError("Layers", layers_name, (str, list))
+
+
+def resolve_layers(functions, resolver, max_workers=DEFAULT_MAX_WORKERS, logger=None):
+    """
+    Resolve layer specs of functions to the ARNs (Amazon Resourse Name) of the layer
+    versions, see `parse_layer_spec` for the pinning rules. The "Layers" of functions
+    are updated in place, and each spec is resolved only once, concurrently.
+    A spec which fails to resolve stays as is, and doesn't stop the others.
+
+    Params
+    ======
+    functions: list
+        dicts of "FunctionName" and "Layers".
+    resolver: LayerResolver
+    max_workers: int
+        the maximum number of concurrent API calls.
+    logger: logging.Logger
+        log the errors to this logger, or None.
+
+    Returns
+    =======
+    errors: dict
+        the error message of each spec which failed to resolve.
+    """
+    specs = sorted({spec for function in functions for spec in function["Layers"]})
+    layer_arns = {}
+    errors = {}
+    for spec, (layer_version_arn, error) in zip(
+        specs,
+        map_concurrently(
+            lambda spec: _resolve_layer(spec, resolver, logger), specs, max_workers
+        ),
+    ):
+        layer_arns[spec] = layer_version_arn or spec
+        if error is not None:
+            errors[spec] = error
+    for function in functions:
+        function["Layers"] = [layer_arns[spec] for spec in function["Layers"]]
+    return errors
+
+
+def _resolve_layer(spec, resolver, logger=None):
+    """
+    Resolve a layer spec, and return the ARN or the error.
+
+    Returns
+    =======
+    layer_version_arn: str or None
+    error: str or None
+    """
+    try:
+        return resolver.resolve(spec), None
+    except (BotoCoreError, ClientError, LamblayerResolveLayerError) as e:
+        error = f"{e.__class__.__name__}: {e}"
+        if logger is not None:
+            logger.error(f"{spec}: {error}")
+        return None, error
@@ -0,0 +1,285 @@
+import os
+import re
+import json
+
+from .cache import get_cache_dir, write_json_atomic
+
+
+# the unzipped size limit of a function and all of its layers.
+MAX_UNZIPPED_SIZE = 262144000
+# a part may exceed the even share of the total by this ratio, before units are moved
+# to other parts. a larger slack keeps more units in place across rebuilds.
+SPLIT_SLACK = 0.2
+# the directories whose children are packages, ex) python/requests/
+PACKAGE_ROOTS_RE = re.compile(
+    r"^(python/lib/python\d+\.\d+/site-packages/"
+    r"|python/"
+    r"|nodejs/node\d+/node_modules/"
+    r"|nodejs/node_modules/)"
+)
+METADATA_DIR_RE = re.compile(r"^(.+?)(-[^-]*)?\.(dist-info|egg-info)$")
+
+
+class LayerSplitter:
+    """
+    Split the entries of a layer into parts, keeping each package in one part.
+
+    A package is a unit of the split, which is a top-level module under a package root
+    (ex. `python/`) together with the other modules and the metadata directory of its
+    distribution, which are found by `top_level.txt`.
+
+    Units are bin-packed by their uncompressed size. The assignment of the last build
+    is stored at `{cache_dir}/splits/{layer_name}.json`, and units stay in their part
+    unless it grows too large, so that unchanged parts have the same content, and are
+    not published again.
+    """
+
+    def __init__(self, parts, logger=None, cache_dir=None):
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        self.parts = parts
+        self.logger = logger
+        self.cache_dir = cache_dir
+
+    def split(self, layer_name, entries):
+        """
+        Split the entries into parts.
+
+        Params
+        ======
+        layer_name: str
+            the name of the layer, which keys the assignment of the last build.
+        entries: list
+            (path, arcname) pairs of the layer archive
+
+        Returns
+        =======
+        parts: list
+            (path, arcname) pairs of each part. directories are put in every part,
+            which has files under them.
+        """
+        aliases = self._get_aliases(entries)
+        units = {}
+        sizes = {}
+        for path, arcname in entries:
+            if arcname.endswith("/"):
+                continue
+            unit = get_unit(arcname, aliases)
+            units.setdefault(unit, []).append((path, arcname))
+            sizes[unit] = sizes.get(unit, 0) + os.path.getsize(path)
+
+        state_path = os.path.join(self.cache_dir, "splits", f"{layer_name}.json")
+        previous = self._load_state(state_path)
+        assignment = assign_parts(sizes, self.parts, previous)
+        write_json_atomic(state_path, {"Parts": self.parts, "Units": assignment})
+
+        files = [[] for _ in range(self.parts)]
+        for unit in sorted(units):
+            files[assignment[unit]].extend(units[unit])
+
+        # directories go to every part which has files under them,
+        # and empty directories go to the first part.
+        part_dirs = [
+            {
+                arcname[: i + 1]
+                for _, arcname in part_files
+                for i, char in enumerate(arcname)
+                if char == "/"
+            }
+            for part_files in files
+        ]
+        all_dirs = set().union(*part_dirs)
+        parts = []
+        for i, (part_files, dirs) in enumerate(zip(files, part_dirs)):
+            arcnames = {arcname for _, arcname in part_files}
+            # keep the order of entries, which is the walk order of src.
+            parts.append(
+                [
+                    (path, arcname)
+                    for path, arcname in entries
+                    if arcname in arcnames
+                    or arcname in dirs
+                    or (i == 0 and arcname.endswith("/") and arcname not in all_dirs)
+                ]
+            )
+
+        total = sum(sizes.values())
+        for i, part_files in enumerate(files):
+            size = sum(sizes[unit] for unit in units if assignment[unit] == i)
+            self._log("info", f"part {i + 1}: {len(part_files)} files, {size} bytes")
+        if total > MAX_UNZIPPED_SIZE:
+            self._log(
+                "warning",
+                f"the layer is {total} bytes unzipped, "
+                f"over the limit of {MAX_UNZIPPED_SIZE} bytes for a function.",
+            )
+        return parts
+
+    def _get_aliases(self, entries):
+        """
+        Return the unit of each module, which is shared by all modules and
+        the metadata directory of a distribution.
+
+        Returns
+        =======
+        aliases: dict
+            "{package root}{module}" -> "{package root}{distribution}"
+        """
+        aliases = {}
+        for path, arcname in entries:
+            root, _, rest = split_package_root(arcname)
+            parts = rest.split("/")
+            if len(parts) != 2 or parts[1] != "top_level.txt":
+                continue
+            m = METADATA_DIR_RE.match(parts[0])
+            if m is None:
+                continue
+            unit = root + normalize_name(m.group(1))
+            with open(path, "r", errors="replace") as f:
+                for module in f.read().split():
+                    aliases[root + module.replace("/", ".").split(".")[0]] = unit
+        return aliases
+
+    def _load_state(self, state_path):
+        try:
+            with open(state_path, "r") as f:
+                state = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("Parts") != self.parts:
+            return None
+        return state.get("Units")
+
+    def _log(self, level, message):
+        if self.logger is not None:
+            getattr(self.logger, level)(message)
+
+
+def split_package_root(arcname):
+    """
+    Split the arcname at the package root.
+
+    Returns
+    =======
+    root: str
+        the package root, ex) "python/", or "" if no package root is found.
+    top: str
+        the first component under the root, ex) "requests"
+    rest: str
+        the path under the root, ex) "requests/api.py"
+    """
+    m = PACKAGE_ROOTS_RE.match(arcname)
+    root = m.group(1) if m else ""
+    rest = arcname[len(root) :]
+    return root, rest.split("/")[0], rest
+
+
+def normalize_name(name):
+    """
+    Normalize a module or distribution name, ex) "PyYAML" -> "pyyaml"
+    """
+    return re.sub(r"[-_.]+", "_", name).lower()
+
+
+def get_unit(arcname, aliases=None):
+    """
+    Return the unit of the file, which is the top-level module under a package root,
+    or the distribution of the module if aliases have it.
+
+    Params
+    ======
+    arcname: str
+        the name of the file in the archive, ex) python/yaml/__init__.py
+    aliases: dict
+        the units of modules from `top_level.txt`
+
+    Returns
+    =======
+    unit: str
+        ex) "python/pyyaml"
+    """
+    root, top, rest = split_package_root(arcname)
+    # a file directly under the package root is a module, ex) six.py
+    is_module_file = "/" not in rest
+    m = METADATA_DIR_RE.match(top)
+    if m is not None and not is_module_file:
+        return root + normalize_name(m.group(1))
+
+    if top == "__pycache__" and rest.count("/") == 1:
+        # the bytecode of a top-level module, ex) __pycache__/six.cpython-39.pyc
+        top = rest.split("/")[1]
+        is_module_file = True
+    if is_module_file:
+        # ex) six.py, _cffi_backend.cpython-39-x86_64-linux-gnu.so
+        top = top.split(".")[0] or top
+    module = root + top
+    if aliases and module in aliases:
+        return aliases[module]
+    return root + normalize_name(top)
+
+
+def assign_parts(sizes, parts, previous=None):
+    """
+    Assign the units to parts, balancing the total size of the parts.
+
+    Units of the previous assignment stay in their part, and new units are assigned
+    to the smallest part, largest first. Then, while the largest part exceeds
+    its even share by SPLIT_SLACK, its smallest units are moved to the smallest part.
+    Empty units are never moved, since they don't change the balance.
+    Without previous, this is the longest processing time first bin-packing.
+
+    Params
+    ======
+    sizes: dict
+        unit -> uncompressed size
+    parts: int
+        the number of parts
+    previous: dict
+        unit -> part of the last build, or None.
+
+    Returns
+    =======
+    assignment: dict
+        unit -> part index
+    """
+    assignment = {}
+    loads = [0] * parts
+    previous = previous or {}
+    for unit in sorted(sizes):
+        part = previous.get(unit)
+        if isinstance(part, int) and 0 <= part < parts:
+            assignment[unit] = part
+            loads[part] += sizes[unit]
+
+    new_units = sorted(
+        (unit for unit in sizes if unit not in assignment),
+        key=lambda unit: (-sizes[unit], unit),
+    )
+    for unit in new_units:
+        part = loads.index(min(loads))
+        assignment[unit] = part
+        loads[part] += sizes[unit]
+
+    capacity = sum(loads) / parts * (1 + SPLIT_SLACK)
+    while True:
+        heavy = loads.index(max(loads))
+        light = loads.index(min(loads))
+        if loads[heavy] <= capacity:
+            break
+        movable = sorted(
+            (
+                unit
+                for unit, part in assignment.items()
+                if part == heavy
+                and 0 < sizes[unit]
+                and loads[light] + sizes[unit] < loads[heavy]
+            ),
+            key=lambda unit: (sizes[unit], unit),
+        )
+        if not movable:
+            break
+        unit = movable[0]
+        assignment[unit] = light
+        loads[heavy] -= sizes[unit]
+        loads[light] += sizes[unit]
+    return assignment
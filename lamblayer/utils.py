@@ -0,0 +1,161 @@
+import csv
+import json
+from logging import getLogger, StreamHandler, Formatter
+
+import click
+
+
+# the logger of the commands, named after the module which defined it first.
+LOGGER_NAME = "lamblayer.lamblayer"
+
+
+def echo_table(rows, columns):
+    """
+    Print rows as a plain text table.
+
+    Params
+    ======
+    rows: list
+        dicts which have the columns as keys.
+    columns: list
+        the column names to print.
+
+    """
+    cells = [[str(row.get(column) or "-") for column in columns] for row in rows]
+    widths = [
+        max([len(column)] + [len(line[i]) for line in cells])
+        for i, column in enumerate(columns)
+    ]
+    click.echo(format_row(columns, widths))
+    for line in cells:
+        click.echo(format_row(line, widths))
+
+
+class RecordWriter:
+    """
+    Write API records to stdout in a format, one batch at a time.
+
+    Formats are,
+    - json: pretty printed json for each record.
+    - ndjson: one json per line.
+    - csv: flattened columns with a header.
+    - table: flattened columns with a header, aligned over all batches.
+
+    The table is buffered until `close`, since the widths depend on all records,
+    the other formats are streamed as each batch is written.
+    """
+
+    FORMATS = ["json", "ndjson", "csv", "table"]
+
+    def __init__(self, output, columns):
+        if output not in self.FORMATS:
+            raise ValueError(f"unknown output format: {output}")
+        self.output = output
+        self.columns = columns
+        self.header_written = False
+        self.cells = []
+        if output == "csv":
+            self.csv_writer = csv.DictWriter(
+                click.get_text_stream("stdout"),
+                fieldnames=columns,
+                extrasaction="ignore",
+            )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write(self, records):
+        """
+        Write a batch of records.
+
+        Params
+        ======
+        records: list
+            dicts of API records.
+
+        """
+        if self.output == "json":
+            for record in records:
+                click.echo(json.dumps(record, indent=2, default=str))
+        elif self.output == "ndjson":
+            for record in records:
+                click.echo(json.dumps(record, default=str))
+        elif self.output == "csv":
+            if not self.header_written:
+                self.csv_writer.writeheader()
+                self.header_written = True
+            self.csv_writer.writerows(flatten_record(r) for r in records)
+        elif self.output == "table":
+            for record in records:
+                row = flatten_record(record)
+                self.cells.append([row.get(column) or "-" for column in self.columns])
+
+    def close(self):
+        """
+        Write the buffered table.
+        """
+        if self.output != "table" or not self.cells:
+            return
+        widths = [
+            max([len(column)] + [len(line[i]) for line in self.cells])
+            for i, column in enumerate(self.columns)
+        ]
+        click.echo(format_row(self.columns, widths))
+        for line in self.cells:
+            click.echo(format_row(line, widths))
+        self.cells = []
+
+
+def flatten_record(record):
+    """
+    Flatten a layer or layer version record into strings.
+
+    Params
+    ======
+    record: dict
+        an item of `list_layers` or `list_layer_versions`
+
+    Returns
+    =======
+    row: dict
+        flattened record, lists are joined by space.
+    """
+    version = record.get("LatestMatchingVersion", record)
+    row = {"LayerName": record.get("LayerName")}
+    for key, value in version.items():
+        if isinstance(value, list):
+            value = " ".join(str(v) for v in value)
+        row[key] = str(value)
+    return row
+
+
+def format_row(cells, widths):
+    return "  ".join(c.ljust(w) for c, w in zip(cells, widths)).rstrip()
+
+
+def get_logger(log_level="INFO"):
+    """
+    Return the logger of the commands.
+    The logger is shared by all commands, so the handler is added only once,
+    and the level of the latest command applies.
+
+    Params
+    ======
+    log_level: str
+        the log level, ex) "INFO"
+
+    Returns
+    =======
+    logger
+    """
+    logger = getLogger(LOGGER_NAME)
+    logger.setLevel(log_level.upper())
+    if not logger.handlers:
+        ch = StreamHandler()
+        formatter = Formatter("%(asctime)s: [%(levelname)s]: %(message)s")
+        ch.setFormatter(formatter)
+        logger.addHandler(ch)
+    return logger
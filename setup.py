@@ -20,5 +20,6 @@ setup(
     author_email=["takahashi@adansons.co.jp"],
     packages=["lamblayer"],
     install_requires=["boto3", "click", "requests"],
+    extras_require={"test": ["moto[s3,lambda]>=5", "pytest"]},
     entry_points={"console_scripts": ["lamblayer=lamblayer.cli:main"]},
 )
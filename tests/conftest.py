@@ -0,0 +1,98 @@
+import threading
+import http.server
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def aws_env(monkeypatch, tmp_path):
+    """
+    Isolate the tests from the AWS credentials and the lamblayer cache of the user.
+    """
+    for name in ("AWS_PROFILE", "AWS_DEFAULT_PROFILE", "AWS_CONFIG_FILE"):
+        monkeypatch.delenv(name, raising=False)
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    monkeypatch.setenv("LAMBLAYER_CACHE_DIR", str(tmp_path / "cache"))
+
+
+@pytest.fixture
+def layer_json(tmp_path):
+    path = tmp_path / "layer.json"
+    path.write_text(
+        '{"LayerName": "my_layer", "Description": "test", '
+        '"CompatibleRuntimes": ["python3.9"], "LicenseInfo": ""}'
+    )
+    return str(path)
+
+
+class RangeServer:
+    """
+    A local HTTP server of in-memory files, which supports Range requests
+    as S3 presigned urls do, and records the Range header of each request.
+    """
+
+    def __init__(self):
+        self.files = {}
+        self.ranges = []
+        server = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                data = server.files.get(self.path.split("?")[0])
+                if data is None:
+                    self.send_error(404)
+                    return
+                byte_range = self.headers.get("Range")
+                server.ranges.append(byte_range)
+                if byte_range is None:
+                    self._send(200, data)
+                    return
+
+                start, end = byte_range.split("=")[1].split("-")
+                if not start:
+                    start, end = max(len(data) - int(end), 0), len(data) - 1
+                else:
+                    start, end = int(start), int(end or len(data) - 1)
+                if start >= len(data):
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(data)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                end = min(end, len(data) - 1)
+                self._send(
+                    206,
+                    data[start : end + 1],
+                    {"Content-Range": f"bytes {start}-{end}/{len(data)}"},
+                )
+
+            def _send(self, status, body, headers=None):
+                self.send_response(status)
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def range_server():
+    server = RangeServer()
+    yield server
+    server.close()
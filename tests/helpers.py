@@ -0,0 +1,60 @@
+import io
+import zipfile
+
+import boto3
+
+
+def make_zip(files):
+    """
+    Return the bytes of a zip archive of the {arcname: content} files.
+    """
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        for arcname, content in files.items():
+            zf.writestr(arcname, content)
+    return buf.getvalue()
+
+
+def publish_layer(name, description="", runtimes=("python3.9",), files=None):
+    """
+    Publish a layer version on moto, and return its ARN.
+    """
+    files = files or {"python/my_package.py": f"{name} {description}"}
+    return boto3.client("lambda").publish_layer_version(
+        LayerName=name,
+        Description=description,
+        Content={"ZipFile": make_zip(files)},
+        CompatibleRuntimes=list(runtimes),
+        LicenseInfo="",
+    )["LayerVersionArn"]
+
+
+def make_functions(n, layers=(), prefix="function"):
+    """
+    Create n functions on moto with the layers, named `{prefix}{i}`.
+    """
+    iam = boto3.client("iam")
+    try:
+        role = iam.get_role(RoleName="role")["Role"]["Arn"]
+    except iam.exceptions.NoSuchEntityException:
+        role = iam.create_role(RoleName="role", AssumeRolePolicyDocument="{}")["Role"][
+            "Arn"
+        ]
+    client = boto3.client("lambda")
+    code = make_zip({"handler.py": "def handler(event, context):\n    pass\n"})
+    for i in range(n):
+        client.create_function(
+            FunctionName=f"{prefix}{i}",
+            Runtime="python3.9",
+            Role=role,
+            Handler="handler.handler",
+            Code={"ZipFile": code},
+            Layers=list(layers),
+        )
+
+
+def get_function_layers(function_name):
+    configuration = boto3.client("lambda").get_function_configuration(
+        FunctionName=function_name
+    )
+    return [layer["Arn"] for layer in configuration.get("Layers", [])]
@@ -0,0 +1,25 @@
+import io
+import os
+import zipfile
+
+import requests
+
+from lamblayer.analyze import HTTPRangeFile
+
+
+def test_http_range_file_lists_zip(range_server):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w") as zf:
+        zf.writestr("python/big.bin", os.urandom(1_000_000))
+        zf.writestr("python/my_package/__init__.py", "x = 1")
+    range_server.files["/my_layer-1"] = buf.getvalue()
+
+    fileobj = HTTPRangeFile(range_server.url("/my_layer-1"), requests.Session(), 1024)
+    with zipfile.ZipFile(fileobj) as zf:
+        names = zf.namelist()
+        assert zf.read("python/my_package/__init__.py") == b"x = 1"
+
+    assert names == ["python/big.bin", "python/my_package/__init__.py"]
+    # only the tail and the small file are read, not the large one.
+    assert range_server.ranges[0] == "bytes=-1024"
+    assert fileobj.bytes_read < 4096
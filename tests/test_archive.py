@@ -0,0 +1,136 @@
+import io
+import os
+import zipfile
+
+import pytest
+
+from lamblayer import archive as archive_module
+from lamblayer.archive import (
+    REPRODUCIBLE_DATE_TIME,
+    ZIP_MAX_SIZE,
+    ZipEntry,
+    ZipWriter,
+    iter_layer_entries,
+    write_ziparchive,
+)
+from lamblayer.cache import FileIndex
+from lamblayer.exceptions import LamblayerCreateLayerError
+
+
+FILES = {
+    "my_package/__init__.py": "x = 1\n" * 100,
+    "my_package/data.whl": "wheel" * 100,
+    "my_package/éè.txt": "utf-8 name",
+    "bin/tool": "#!/bin/sh\n",
+}
+
+
+def make_src(path, mtime):
+    for name, content in FILES.items():
+        file_path = path / name
+        file_path.parent.mkdir(parents=True, exist_ok=True)
+        file_path.write_text(content)
+    os.chmod(path / "bin" / "tool", 0o700)
+    for root, dirs, files in os.walk(path):
+        for name in dirs + files:
+            os.utime(os.path.join(root, name), (mtime, mtime))
+    return path
+
+
+def write(src, **kwargs):
+    buffer = io.BytesIO()
+    write_ziparchive(buffer, iter_layer_entries(str(src), "python"), **kwargs)
+    return buffer.getvalue()
+
+
+def test_write_ziparchive(tmp_path):
+    src = make_src(tmp_path / "src", 1_600_000_000)
+
+    with zipfile.ZipFile(io.BytesIO(write(src, jobs=4))) as zf:
+        assert zf.testzip() is None
+        assert sorted(zf.namelist()) == sorted(
+            ["python/", "python/bin/", "python/my_package/"]
+            + [f"python/{name}" for name in FILES]
+        )
+        for name, content in FILES.items():
+            assert zf.read(f"python/{name}").decode() == content
+        zinfo = zf.getinfo("python/bin/tool")
+        assert zinfo.date_time > REPRODUCIBLE_DATE_TIME
+        assert zinfo.external_attr >> 16 & 0o777 == 0o700
+
+
+def test_write_ziparchive_reproducible(tmp_path):
+    src1 = make_src(tmp_path / "src1", 1_600_000_000)
+    src2 = make_src(tmp_path / "src2", 1_700_000_000)
+
+    # neither the mtimes, the compression threads nor the index change the archive.
+    archive = write(src1, reproducible=True, jobs=1)
+    assert write(src2, reproducible=True, jobs=8) == archive
+    for _ in range(2):
+        index = FileIndex(str(src2), str(tmp_path / "cache"))
+        assert write(src2, reproducible=True, index=index, jobs=8) == archive
+        index.save()
+
+    with zipfile.ZipFile(io.BytesIO(archive)) as zf:
+        assert zf.testzip() is None
+        assert {zinfo.date_time for zinfo in zf.infolist()} == {REPRODUCIBLE_DATE_TIME}
+        assert zf.getinfo("python/bin/tool").external_attr >> 16 & 0o777 == 0o755
+        assert zf.getinfo("python/my_package/").external_attr >> 16 & 0o777 == 0o755
+
+
+def test_write_ziparchive_store(tmp_path):
+    src = make_src(tmp_path / "src", 1_600_000_000)
+
+    with zipfile.ZipFile(io.BytesIO(write(src, store=["*.whl", "*/bin/*"]))) as zf:
+        assert zf.testzip() is None
+        compress_types = {
+            zinfo.filename: zinfo.compress_type
+            for zinfo in zf.infolist()
+            if not zinfo.is_dir()
+        }
+    assert compress_types == {
+        "python/my_package/__init__.py": zipfile.ZIP_DEFLATED,
+        "python/my_package/data.whl": zipfile.ZIP_STORED,
+        "python/my_package/éè.txt": zipfile.ZIP_DEFLATED,
+        "python/bin/tool": zipfile.ZIP_STORED,
+    }
+
+    with zipfile.ZipFile(io.BytesIO(write(src, compress_level=0))) as zf:
+        assert zf.testzip() is None
+        assert {zinfo.compress_type for zinfo in zf.infolist()} == {zipfile.ZIP_STORED}
+
+
+def test_write_ziparchive_max_entries(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_module, "ZIP_MAX_ENTRIES", 3)
+    src = make_src(tmp_path / "src", 1_600_000_000)
+    buffer = io.BytesIO()
+
+    with pytest.raises(LamblayerCreateLayerError, match="exceeds 3 entries"):
+        write_ziparchive(buffer, iter_layer_entries(str(src)), jobs=4)
+    assert buffer.getvalue() == b""
+
+    # a writer never writes more entries either.
+    writer = ZipWriter(buffer)
+    entry = ZipEntry("a", REPRODUCIBLE_DATE_TIME, 0, zipfile.ZIP_STORED, 0, 0, b"")
+    for _ in range(3):
+        writer.write(entry)
+    size = len(buffer.getvalue())
+    with pytest.raises(LamblayerCreateLayerError, match="exceeds 3 entries at a"):
+        writer.write(entry)
+    assert len(buffer.getvalue()) == size
+
+
+def test_zip_writer_max_size():
+    buffer = io.BytesIO()
+    writer = ZipWriter(buffer)
+
+    entry = ZipEntry("a", REPRODUCIBLE_DATE_TIME, 0, zipfile.ZIP_STORED, 0, 0, b"")
+    with pytest.raises(LamblayerCreateLayerError, match="4 GiB at a"):
+        writer.write(entry._replace(file_size=ZIP_MAX_SIZE + 1))
+
+    # the entry and its central directory header must fit in 4 GiB.
+    writer.offset = ZIP_MAX_SIZE - 100
+    with pytest.raises(LamblayerCreateLayerError, match="4 GiB at a"):
+        writer.write(entry._replace(data=b"x" * 50))
+    assert buffer.getvalue() == b""
+    assert writer.central_directory == []
@@ -0,0 +1,140 @@
+import os
+import time
+
+import pytest
+
+from lamblayer import cache as cache_module
+from lamblayer.cache import FileIndex, hash_file
+
+
+@pytest.fixture
+def src(tmp_path):
+    src = tmp_path / "src"
+    src.mkdir()
+    for name in ("a.py", "b.py"):
+        (src / name).write_text(name)
+    return src
+
+
+@pytest.fixture
+def no_racy_window(monkeypatch):
+    monkeypatch.setattr(cache_module, "RACY_WINDOW_NS", 0)
+
+
+def build(src, cache_dir, names=("a.py", "b.py")):
+    """
+    Hash the files like a build, and return the index after saving it.
+    """
+    index = FileIndex(str(src), str(cache_dir))
+    digests = [index.hash(str(src / name)) for name in names]
+    assert digests == [hash_file(str(src / name)) for name in names]
+    index.save()
+    return index
+
+
+def test_index_reuses_hashes(src, tmp_path, no_racy_window):
+    index = build(src, tmp_path / "cache")
+    assert (index.hashed, index.reused) == (2, 0)
+
+    index = build(src, tmp_path / "cache")
+    assert (index.hashed, index.reused) == (0, 2)
+
+
+def test_index_rehashes_changed_file(src, tmp_path, no_racy_window):
+    build(src, tmp_path / "cache")
+
+    # the same size and mtime, but the ctime tells the content was written.
+    st = os.stat(src / "a.py")
+    time.sleep(0.05)
+    (src / "a.py").write_text("A.py")
+    os.utime(src / "a.py", ns=(st.st_atime_ns, st.st_mtime_ns))
+
+    index = build(src, tmp_path / "cache")
+    assert (index.hashed, index.reused) == (1, 1)
+
+
+def test_index_racy_window(src, tmp_path):
+    # the files written just before the build may be written again in the same tick,
+    # so they are hashed again in the next build.
+    build(src, tmp_path / "cache")
+
+    index = build(src, tmp_path / "cache")
+    assert (index.hashed, index.reused) == (2, 0)
+
+
+def test_index_drops_missing_files(src, tmp_path, no_racy_window):
+    build(src, tmp_path / "cache")
+
+    index = build(src, tmp_path / "cache", names=["a.py"])
+    assert (index.hashed, index.reused) == (0, 1)
+    index = build(src, tmp_path / "cache")
+    assert (index.hashed, index.reused) == (1, 1)
+
+
+def test_index_without_root(src, tmp_path):
+    index = FileIndex(cache_dir=str(tmp_path / "cache"))
+    assert index.hash(str(src / "a.py")) == index.hash(str(src / "a.py"))
+    assert index.hashed == 1
+    index.put_deflated("digest", 6, 0, 1, b"x")
+    index.save()
+
+    assert index.get_deflated("digest", 6) is None
+    assert not (tmp_path / "cache").exists()
+
+
+def pack(src, cache_dir, contents, days=0):
+    """
+    Use and put the deflated contents of {digest: data} in a build `days` later,
+    and return the contents found in the pack.
+    """
+    index = FileIndex(str(src), str(cache_dir))
+    index.started_at += days * 24 * 60 * 60 * 10**9
+    found = {}
+    for digest, data in contents.items():
+        deflated = index.get_deflated(digest, 6)
+        if deflated is not None:
+            found[digest] = deflated[2]
+        else:
+            index.put_deflated(digest, 6, 0, len(data), data)
+    index.save()
+    return found
+
+
+def test_pack_appends(src, tmp_path):
+    cache_dir = tmp_path / "cache"
+    assert pack(src, cache_dir, {"a": b"a" * 10}) == {}
+
+    # only the new content is appended at the end of the pack.
+    assert pack(src, cache_dir, {"a": b"a" * 10, "b": b"b" * 20}) == {"a": b"a" * 10}
+    pack_path = next((cache_dir / "index").glob("*.pack"))
+    assert os.path.getsize(pack_path) == 30
+    assert pack(src, cache_dir, {"a": b"", "b": b""}) == {
+        "a": b"a" * 10,
+        "b": b"b" * 20,
+    }
+
+
+def test_pack_expires_and_compacts(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "PACK_COMPACT_MIN_SIZE", 0)
+    cache_dir = tmp_path / "cache"
+    pack(src, cache_dir, {"a": b"a" * 10, "b": b"b" * 100})
+    pack_path = next((cache_dir / "index").glob("*.pack"))
+    inode = os.stat(pack_path).st_ino
+
+    # "b" is not used for PACK_ENTRY_TTL, and dropped with the pack compacted.
+    assert pack(src, cache_dir, {"a": b""}, days=8) == {"a": b"a" * 10}
+    assert os.path.getsize(pack_path) == 10
+    assert os.stat(pack_path).st_ino != inode
+    assert pack(src, cache_dir, {"a": b"", "b": b"b" * 100}, days=8) == {"a": b"a" * 10}
+
+
+def test_pack_keeps_used_contents(src, tmp_path, monkeypatch):
+    monkeypatch.setattr(cache_module, "PACK_COMPACT_MIN_SIZE", 0)
+    cache_dir = tmp_path / "cache"
+    pack(src, cache_dir, {"a": b"a" * 10, "b": b"b" * 100})
+
+    # the dropped contents are not more than the live ones, so the pack is kept.
+    assert pack(src, cache_dir, {"b": b""}, days=8) == {"b": b"b" * 100}
+    pack_path = next((cache_dir / "index").glob("*.pack"))
+    assert os.path.getsize(pack_path) == 110
+    assert pack(src, cache_dir, {"a": b"", "b": b""}, days=8) == {"b": b"b" * 100}
@@ -0,0 +1,56 @@
+import pytest
+from moto import mock_aws
+
+from lamblayer.client import LamblayerClient
+from lamblayer.create import Create
+
+from .helpers import get_function_layers, make_functions, publish_layer
+
+
+@pytest.fixture
+def client():
+    with mock_aws():
+        yield LamblayerClient(region="us-east-1", rate_limit=1000)
+
+
+def test_set_layers_many_unknown_layer(client):
+    layer_arn = publish_layer("my_layer")
+    make_functions(3)
+    functions = [
+        {"FunctionName": "function0", "Layers": ["my_layer"]},
+        {"FunctionName": "function1", "Layers": ["my_layer", "unknown_layer"]},
+        {"FunctionName": "function2", "Layers": "my_layer@^1"},
+    ]
+
+    plans = client.set_layers_many(functions)
+
+    # a layer which can't be resolved fails only the functions with it.
+    assert [plan["Status"] for plan in plans] == ["updated", "failed", "failed"]
+    assert "unknown_layer" in plans[1]["Error"]
+    assert plans[2]["Error"].startswith("LamblayerResolveLayerError")
+    assert get_function_layers("function0") == [layer_arn]
+    assert get_function_layers("function1") == []
+    assert functions[2]["Layers"] == "my_layer@^1"
+
+
+def test_analyze_layers_unknown_layer(client):
+    make_functions(1)
+
+    reports = client.analyze_layers(
+        [{"FunctionName": "function0", "Layers": ["unknown_layer"]}]
+    )
+
+    assert [report["Status"] for report in reports] == ["failed"]
+    assert "unknown_layer" in reports[0]["Error"]
+
+
+def test_rate_limit_of_a_call(client, tmp_path, layer_json):
+    src = tmp_path / "src"
+    src.mkdir()
+    (src / "my_module.py").write_text("x = 1")
+
+    results = client.publish_layer(layer_json, src=str(src), rate_limit=0.5)
+
+    assert [result["Status"] for result in results] == ["created"]
+    # the shared command keeps the rate limit of the client.
+    assert client._command(Create).retrier is client.retrier
@@ -0,0 +1,176 @@
+import io
+import os
+import base64
+import shutil
+import hashlib
+import zipfile
+import threading
+import time
+
+import boto3
+from moto import mock_aws
+
+from lamblayer import create
+from lamblayer.create import Create
+
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+def test_upload_ziparchive_multipart(monkeypatch):
+    monkeypatch.setattr(create, "MULTIPART_CHUNKSIZE", PART_SIZE)
+    data = os.urandom(2 * PART_SIZE + 1024)
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="bucket")
+
+        Create(None, "us-east-1", "WARNING")._upload_ziparchive(
+            io.BytesIO(data), "bucket", "layer.zip"
+        )
+
+        response = s3.get_object(Bucket="bucket", Key="layer.zip")
+        assert response["Body"].read() == data
+        # a multipart ETag ends with the number of the parts.
+        assert response["ETag"].strip('"').endswith("-3")
+
+
+def test_create_from_s3(monkeypatch, tmp_path, layer_json):
+    monkeypatch.setattr(create, "MULTIPART_CHUNKSIZE", PART_SIZE)
+    src = tmp_path / "src"
+    (src / "my_package").mkdir(parents=True)
+    (src / "my_package" / "__init__.py").write_text("")
+    data = os.urandom(2 * PART_SIZE)
+    (src / "my_package" / "data.bin").write_bytes(data)
+
+    with mock_aws():
+        s3 = boto3.client("s3")
+        s3.create_bucket(Bucket="bucket")
+        command = Create(None, "us-east-1", "WARNING")
+        results = command.create(
+            None,
+            str(src),
+            "python",
+            "",
+            layer_json,
+            reproducible=True,
+            s3_bucket="bucket",
+            store=["*.bin"],
+        )
+        assert [result["Status"] for result in results] == ["created"]
+
+        key = s3.list_objects_v2(Bucket="bucket")["Contents"][0]["Key"]
+        assert key.startswith("my_layer/") and key.endswith(".zip")
+        body = s3.get_object(Bucket="bucket", Key=key)["Body"].read()
+        with zipfile.ZipFile(io.BytesIO(body)) as zf:
+            assert zf.read("python/my_package/data.bin") == data
+
+        version = boto3.client("lambda").get_layer_version(
+            LayerName="my_layer",
+            VersionNumber=int(results[0]["LayerVersionArn"].split(":")[-1]),
+        )
+        code_sha256 = base64.b64encode(hashlib.sha256(body).digest()).decode()
+        assert version["Content"]["CodeSha256"] == code_sha256
+
+        # the same tree is cached, and is not uploaded again.
+        results = command.create(
+            None,
+            str(src),
+            "python",
+            "",
+            layer_json,
+            reproducible=True,
+            s3_bucket="bucket",
+            store=["*.bin"],
+        )
+        assert [result["Status"] for result in results] == ["cached"]
+        assert s3.list_objects_v2(Bucket="bucket")["KeyCount"] == 1
+
+
+def test_create_split_shares_one_pool(monkeypatch, tmp_path, layer_json):
+    src = tmp_path / "src"
+    for name in ["a", "b", "c", "d"]:
+        (src / name).mkdir(parents=True)
+        (src / name / "__init__.py").write_text(name * 1000)
+    lock = threading.Lock()
+    running = []
+    peak = []
+    publish_target = Create._publish_target
+
+    def record_publish_target(self, target, *args):
+        with lock:
+            running.append(target)
+            peak.append(len(running))
+        time.sleep(0.05)
+        try:
+            return publish_target(self, target, *args)
+        finally:
+            with lock:
+                running.remove(target)
+
+    monkeypatch.setattr(Create, "_publish_target", record_publish_target)
+
+    with mock_aws():
+        results = Create(None, "us-east-1", "WARNING").create(
+            None,
+            str(src),
+            "python",
+            "",
+            layer_json,
+            regions=["us-east-1", "us-west-2", "eu-west-1"],
+            max_workers=4,
+            split=2,
+        )
+
+    # 2 parts x 3 regions are published on one pool of max_workers.
+    assert len(results) == 6
+    assert {result["Status"] for result in results} == {"created"}
+    assert max(peak) == 4
+
+
+def test_create_cached(tmp_path, layer_json):
+    src = tmp_path / "src"
+    (src / "my_package").mkdir(parents=True)
+    (src / "my_package" / "__init__.py").write_text("x = 1")
+
+    with mock_aws():
+        command = Create(None, "us-east-1", "WARNING")
+        client = boto3.client("lambda")
+
+        def create_layer(**kwargs):
+            return command.create(
+                None, str(src), "python", "", layer_json, reproducible=True, **kwargs
+            )
+
+        created = create_layer()
+        assert [result["Status"] for result in created] == ["created"]
+
+        # the same tree is found in the local cache, and the version still exists.
+        results = create_layer()
+        assert [result["Status"] for result in results] == ["cached"]
+        assert results[0]["LayerVersionArn"] == created[0]["LayerVersionArn"]
+
+        # without the cache, the latest version is compared by CodeSha256.
+        results = create_layer(use_cache=False)
+        assert [result["Status"] for result in results] == ["created"]
+        results = create_layer()
+        assert [result["Status"] for result in results] == ["cached"]
+
+        # the cached version was deleted, so the layer is published again.
+        for version in (1, 2):
+            client.delete_layer_version(LayerName="my_layer", VersionNumber=version)
+        results = create_layer()
+        assert [result["Status"] for result in results] == ["created"]
+        assert results[0]["LayerVersionArn"].endswith(":3")
+
+        # without the local cache, the latest version has the same content.
+        shutil.rmtree(tmp_path / "cache" / "layers")
+        results = create_layer()
+        assert [result["Status"] for result in results] == ["unchanged"]
+        assert results[0]["LayerVersionArn"].endswith(":3")
+
+        (src / "my_package" / "__init__.py").write_text("x = 2")
+        results = create_layer()
+        assert [result["Status"] for result in results] == ["created"]
+        assert (
+            len(client.list_layer_versions(LayerName="my_layer")["LayerVersions"]) == 2
+        )
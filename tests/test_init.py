@@ -0,0 +1,118 @@
+import os
+import base64
+import hashlib
+
+import pytest
+
+from lamblayer.init import Init
+from lamblayer.exceptions import LamblayerDownloadError
+
+from .helpers import make_zip
+
+
+def code_sha256(data):
+    return base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+@pytest.fixture
+def init():
+    return Init(None, "us-east-1", "WARNING")
+
+
+def test_download_layer(init, range_server, tmp_path):
+    data = os.urandom(100_000)
+    range_server.files["/snapshots/my_layer-1"] = data
+    url = range_server.url("/snapshots/my_layer-1?X-Amz-Signature=x")
+
+    save_path = init._download_layer(url, code_sha256(data), None, str(tmp_path))
+
+    assert save_path == str(tmp_path / "my_layer-1.zip")
+    assert open(save_path, "rb").read() == data
+    assert not os.path.exists(save_path + ".part")
+    assert range_server.ranges == [None]
+
+    # a verified download is not fetched again.
+    init._download_layer(url, code_sha256(data), None, str(tmp_path))
+    assert range_server.ranges == [None]
+
+
+def test_download_layer_resumes_part(init, range_server, tmp_path):
+    data = os.urandom(100_000)
+    range_server.files["/my_layer-1"] = data
+    (tmp_path / "my_layer-1.zip.part").write_bytes(data[:30_000])
+
+    save_path = init._download_layer(
+        range_server.url("/my_layer-1"), code_sha256(data), None, str(tmp_path)
+    )
+
+    assert open(save_path, "rb").read() == data
+    assert range_server.ranges == ["bytes=30000-"]
+
+
+def test_download_layer_completed_part(init, range_server, tmp_path):
+    data = os.urandom(100_000)
+    range_server.files["/my_layer-1"] = data
+    (tmp_path / "my_layer-1.zip.part").write_bytes(data)
+
+    # the server answers 416 for a range from the end of the content.
+    save_path = init._download_layer(
+        range_server.url("/my_layer-1"), code_sha256(data), None, str(tmp_path)
+    )
+
+    assert open(save_path, "rb").read() == data
+    assert range_server.ranges == ["bytes=100000-"]
+
+
+def test_download_layer_code_sha256_mismatch(init, range_server, tmp_path):
+    data = os.urandom(100_000)
+    range_server.files["/my_layer-1"] = data
+    (tmp_path / "my_layer-1.zip.part").write_bytes(b"x" * 30_000)
+
+    with pytest.raises(LamblayerDownloadError):
+        init._download_layer(
+            range_server.url("/my_layer-1"), code_sha256(data), None, str(tmp_path)
+        )
+
+    # the broken part is removed, so the next run downloads it from the start.
+    assert os.listdir(tmp_path) == []
+
+
+def test_download_layers(init, range_server, tmp_path, monkeypatch):
+    contents = {}
+    for n in range(1, 6):
+        data = os.urandom(50_000)
+        range_server.files[f"/my_layer-{n}"] = data
+        arn = f"arn:aws:lambda:us-east-1:123456789012:layer:my_layer:{n}"
+        contents[arn] = (range_server.url(f"/my_layer-{n}"), code_sha256(data))
+    missing = "arn:aws:lambda:us-east-1:123456789012:layer:missing:1"
+    contents[missing] = (range_server.url("/missing-1"), "-")
+    monkeypatch.setattr(
+        init, "_get_layer_content", lambda arn, client=None: contents[arn]
+    )
+
+    results = init.download_layers(list(contents), 4, str(tmp_path))
+
+    # a failed layer doesn't stop the others, and the results keep the order.
+    assert [result["LayerVersionArn"] for result in results] == list(contents)
+    assert [result["Status"] for result in results] == ["downloaded"] * 5 + ["failed"]
+    assert "404" in results[-1]["Error"]
+    for n, result in enumerate(results[:-1], 1):
+        assert result["Path"] == str(tmp_path / f"my_layer-{n}.zip")
+
+
+def test_extract_layers(init, tmp_path):
+    first = tmp_path / "first.zip"
+    first.write_bytes(make_zip({"python/a.py": "first", "python/b.py": "first"}))
+    second = tmp_path / "second.zip"
+    second.write_bytes(make_zip({"python/b.py": "second"}))
+    opt = tmp_path / "opt"
+
+    stats = init.extract_layers([str(first), str(second)], str(opt))
+
+    # the later layer overrides the earlier one, as Lambda does into /opt.
+    assert (opt / "python" / "a.py").read_text() == "first"
+    assert (opt / "python" / "b.py").read_text() == "second"
+    assert stats == {"written": 2, "linked": 0, "skipped": 0}
+
+    stats = init.extract_layers([str(first), str(second)], str(opt))
+    assert stats == {"written": 0, "linked": 0, "skipped": 2}
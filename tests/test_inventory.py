@@ -0,0 +1,170 @@
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from lamblayer import inventory as inventory_module
+from lamblayer.exceptions import LamblayerInventoryError
+from lamblayer.inventory import Inventory, InventoryStore
+
+from .helpers import make_functions, publish_layer
+
+
+ACCOUNT_ID = "123456789012"
+LAYER_ARN = f"arn:aws:lambda:us-east-1:{ACCOUNT_ID}:layer:my_layer"
+
+
+def make_function(name, versions=(1,), version="$LATEST", last_modified="t1"):
+    return {
+        "FunctionName": name,
+        "FunctionArn": f"arn:aws:lambda:us-east-1:{ACCOUNT_ID}:function:{name}"
+        + (f":{version}" if version != "$LATEST" else ""),
+        "Version": version,
+        "Runtime": "python3.9",
+        "LastModified": last_modified,
+        "Layers": [{"Arn": f"{LAYER_ARN}:{v}", "CodeSize": 10} for v in versions],
+    }
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = InventoryStore(str(tmp_path / "inventory.sqlite3"))
+    yield store
+    store.close()
+
+
+def test_store_update_region(store):
+    stats = store.update_region(
+        ACCOUNT_ID, "us-east-1", [make_function("a"), make_function("b")], 100
+    )
+    assert stats == {"added": 2, "updated": 0, "removed": 0, "unchanged": 0}
+    assert store.refreshed_at(ACCOUNT_ID, "us-east-1") == 100
+    assert store.refreshed_at(ACCOUNT_ID, "us-west-2") is None
+
+    # only the changed functions are written, and the missing ones are removed.
+    functions = [
+        make_function("a"),
+        make_function("c", versions=(2,), last_modified="t2"),
+    ]
+    stats = store.update_region(ACCOUNT_ID, "us-east-1", functions)
+    assert stats == {"added": 1, "updated": 0, "removed": 1, "unchanged": 1}
+    functions[1]["Layers"] = []
+    stats = store.update_region(ACCOUNT_ID, "us-east-1", functions)
+    assert stats == {"added": 0, "updated": 0, "removed": 0, "unchanged": 2}
+
+    functions[1]["LastModified"] = "t3"
+    stats = store.update_region(ACCOUNT_ID, "us-east-1", functions)
+    assert stats == {"added": 0, "updated": 1, "removed": 0, "unchanged": 1}
+    assert [record["FunctionName"] for record in store.query(ACCOUNT_ID)] == ["a"]
+
+
+def test_store_query(store):
+    store.update_region(
+        ACCOUNT_ID,
+        "us-east-1",
+        [
+            make_function("a", versions=(1, 2)),
+            make_function("a", versions=(1,), version="1"),
+            make_function("b", versions=(2,)),
+        ],
+    )
+
+    def query(**kwargs):
+        return [
+            (record["FunctionName"], record["FunctionVersion"], record["Version"])
+            for record in store.query(ACCOUNT_ID, **kwargs)
+        ]
+
+    assert query() == [("a", "$LATEST", 1), ("a", "$LATEST", 2), ("b", "$LATEST", 2)]
+    assert query(layer="my_*", function="b") == [("b", "$LATEST", 2)]
+    assert query(layer="other_layer") == []
+    assert query(layer=f"{LAYER_ARN}:1") == [("a", "$LATEST", 1)]
+    assert query(layer=LAYER_ARN, all_versions=True) == [
+        ("a", "$LATEST", 1),
+        ("a", "$LATEST", 2),
+        ("a", "1", 1),
+        ("b", "$LATEST", 2),
+    ]
+    assert query(regions=["us-west-2"]) == []
+    assert store.query("210987654321") == []
+
+
+def test_refresh_within_max_age(store):
+    with mock_aws():
+        layer_arn = publish_layer("my_layer")
+        make_functions(2, layers=[layer_arn])
+        inventory = Inventory(None, "us-east-1", "WARNING")
+
+        stats = inventory.refresh(store, ["us-east-1"], max_age=60)
+        assert stats["us-east-1"]["added"] == 2
+
+        # the index is used as is within max_age.
+        make_functions(1, layers=[layer_arn], prefix="new")
+        assert inventory.refresh(store, ["us-east-1"], max_age=60) == {
+            "us-east-1": None
+        }
+        assert len(store.query(ACCOUNT_ID, layer=layer_arn)) == 2
+
+        stats = inventory.refresh(store, ["us-east-1"], max_age=0)
+        assert stats["us-east-1"]["added"] == 1
+        assert len(store.query(ACCOUNT_ID, layer=layer_arn)) == 3
+
+
+def fail_in_region(monkeypatch, failures):
+    """
+    Make ListFunctions in the regions fail with the error codes of {region: code}.
+    """
+    get_client = inventory_module.get_client
+
+    def get_failing_client(session, service):
+        client = get_client(session, service)
+        code = failures.get(session.region_name)
+        if code is not None:
+
+            def fail(**kwargs):
+                raise ClientError(
+                    {"Error": {"Code": code, "Message": code}}, "ListFunctions"
+                )
+
+            client.meta.events.register("before-call.lambda.ListFunctions", fail)
+        return client
+
+    monkeypatch.setattr(inventory_module, "get_client", get_failing_client)
+
+
+def test_refresh_skips_disabled_region(monkeypatch, store):
+    fail_in_region(monkeypatch, {"ap-east-1": "UnrecognizedClientException"})
+    with mock_aws():
+        make_functions(1, layers=[publish_layer("my_layer")])
+        inventory = Inventory(None, "us-east-1", "WARNING")
+
+        stats = inventory.refresh(store, ["us-east-1", "ap-east-1"], max_age=0)
+
+    assert stats["ap-east-1"] is None
+    assert stats["us-east-1"]["added"] == 1
+    assert store.refreshed_at(ACCOUNT_ID, "ap-east-1") is None
+
+
+def test_refresh_fails_in_region(monkeypatch, store):
+    fail_in_region(monkeypatch, {"us-west-2": "AccessDeniedException"})
+    with mock_aws():
+        inventory = Inventory(None, "us-east-1", "WARNING")
+
+        with pytest.raises(LamblayerInventoryError, match="us-west-2"):
+            inventory.refresh(store, ["us-east-1", "us-west-2"], max_age=0)
+
+    # the regions listed are still indexed.
+    assert store.refreshed_at(ACCOUNT_ID, "us-east-1") is not None
+
+
+def test_get_regions():
+    with mock_aws():
+        inventory = Inventory(None, "us-east-1", "WARNING")
+        enabled = [
+            region["RegionName"]
+            for region in boto3.client("ec2").describe_regions()["Regions"]
+        ]
+
+        assert inventory._get_regions() == ["us-east-1"]
+        assert inventory._get_regions(["us-west-2"]) == ["us-west-2"]
+        assert inventory._get_regions(["all"]) == sorted(enabled)
@@ -0,0 +1,79 @@
+import json
+import time
+import threading
+
+import boto3
+from moto import mock_aws
+
+from lamblayer import lamblayer as lamblayer_module
+from lamblayer.lamblayer import Lamblayer, get_account_id
+from lamblayer.set import Set
+
+from .helpers import get_function_layers, make_functions, publish_layer
+
+
+def test_map_concurrently():
+    lamblayer = Lamblayer(None, "us-east-1", "WARNING")
+    lock = threading.Lock()
+    running = []
+    peak = []
+
+    def func(item):
+        with lock:
+            running.append(item)
+            peak.append(len(running))
+        time.sleep(0.02)
+        with lock:
+            running.remove(item)
+        return item * 2
+
+    results = lamblayer._map_concurrently(func, list(range(300)), 64)
+
+    # the results keep the order of the items, and max_workers run at once.
+    assert results == [item * 2 for item in range(300)]
+    assert max(peak) == 64
+
+
+def test_get_account_id_by_access_key(monkeypatch, tmp_path):
+    monkeypatch.setattr(lamblayer_module, "_account_ids", {})
+    with mock_aws():
+        sessions = [
+            boto3.Session(
+                aws_access_key_id=f"AKIA{i}",
+                aws_secret_access_key="testing",
+                region_name="us-east-1",
+            )
+            for i in range(2)
+        ]
+        assert [get_account_id(session) for session in sessions] == ["123456789012"] * 2
+
+    # both sessions have the default profile, but each access key has its own entry.
+    accounts = json.loads((tmp_path / "cache" / "accounts.json").read_text())
+    assert len(accounts) == 2
+    assert all(key.startswith("key:") for key in accounts)
+    assert not any("AKIA" in key for key in accounts)
+
+
+def test_set_many_functions(tmp_path):
+    with mock_aws():
+        old_arn = publish_layer("my_layer")
+        new_arn = publish_layer("my_layer")
+        other_arn = publish_layer("other_layer")
+        make_functions(200, [old_arn])
+
+        manifest = tmp_path / "functions.json"
+        functions = [
+            {"FunctionName": f"function{i}", "Layers": ["my_layer", "other_layer"]}
+            for i in range(199)
+        ]
+        functions.append({"FunctionName": "function199", "Layers": [old_arn]})
+        manifest.write_text(json.dumps({"Functions": functions}))
+
+        plans = Set(None, "us-east-1", "WARNING")(
+            str(manifest), max_workers=64, rate_limit=1000
+        )
+
+        assert [plan["Status"] for plan in plans] == ["updated"] * 199 + ["unchanged"]
+        for i in range(200):
+            layers = get_function_layers(f"function{i}")
+            assert layers == ([new_arn, other_arn] if i < 199 else [old_arn])
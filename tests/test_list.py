@@ -0,0 +1,108 @@
+import json
+from types import SimpleNamespace
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from lamblayer.exceptions import LamblayerInvalidOptionError
+from lamblayer.list import List
+
+from .helpers import publish_layer
+
+
+@pytest.fixture
+def list_command():
+    with mock_aws():
+        for name in ["my_layer", "my_other_layer", "your_layer"]:
+            publish_layer(name, runtimes=("python3.9",))
+        publish_layer("my_layer", runtimes=("python3.9",))
+        yield List(None, "us-east-1", "WARNING")
+
+
+@pytest.fixture
+def list_calls(list_command):
+    """
+    Serve `list_layers` of moto in pages of 2 layers, and record the params of
+    the Lambda API calls.
+    """
+    layers = boto3.client("lambda").list_layers()["Layers"]
+    calls = []
+
+    def record(params, model, **kwargs):
+        calls.append((model.name, dict(params)))
+
+    def paginate(params, **kwargs):
+        start = int(params["query_string"].get("Marker", 0))
+        response = {"Layers": layers[start : start + 2]}
+        if start + 2 < len(layers):
+            response["NextMarker"] = str(start + 2)
+        return SimpleNamespace(status_code=200, headers={}), response
+
+    events = list_command._get_client("lambda").meta.events
+    events.register("provide-client-params.lambda.*", record)
+    events.register("before-call.lambda.ListLayers", paginate)
+    yield calls
+    events.unregister("provide-client-params.lambda.*", record)
+    events.unregister("before-call.lambda.ListLayers", paginate)
+
+
+def get_names(pages):
+    return [[layer["LayerName"] for layer in page] for page in pages]
+
+
+def test_iter_layers_pages(list_command, list_calls):
+    pages = list(list_command.iter_layers())
+
+    # the latest version of each layer, page by page.
+    assert get_names(pages) == [["my_layer", "my_other_layer"], ["your_layer"]]
+    assert pages[0][0]["LatestMatchingVersion"]["Version"] == 2
+    assert list_calls == [("ListLayers", {}), ("ListLayers", {"Marker": "2"})]
+
+
+def test_iter_layers_filters(list_command, list_calls):
+    pages = list(
+        list_command.iter_layers(
+            compatible_runtime="python3.9",
+            compatible_architecture="arm64",
+            name="my_*",
+            regex="other",
+        )
+    )
+
+    assert get_names(pages) == [["my_other_layer"], []]
+    assert list_calls[0] == (
+        "ListLayers",
+        {"CompatibleRuntime": "python3.9", "CompatibleArchitecture": "arm64"},
+    )
+    with pytest.raises(LamblayerInvalidOptionError, match="--regex"):
+        list(list_command.iter_layers(regex="("))
+
+
+def test_iter_layers_all_versions(list_command, list_calls):
+    pages = list(list_command.iter_layers(all_versions=True, name="*_layer"))
+
+    # a page for each layer, in the order of layers.
+    assert get_names(pages) == [
+        ["my_layer", "my_layer"],
+        ["my_other_layer"],
+        ["your_layer"],
+    ]
+    assert [layer_version["Version"] for layer_version in pages[0]] == [2, 1]
+    assert sorted(
+        params["LayerName"]
+        for name, params in list_calls
+        if name == "ListLayerVersions"
+    ) == ["my_layer", "my_other_layer", "your_layer"]
+
+
+def test_list_ndjson(list_command, list_calls, capsys):
+    list_command.list_(all_versions=True, output="ndjson")
+
+    lines = capsys.readouterr().out.splitlines()
+    assert [json.loads(line)["LayerVersionArn"].split(":", 6)[6] for line in lines] == [
+        "my_layer:2",
+        "my_layer:1",
+        "my_other_layer:1",
+        "your_layer:1",
+    ]
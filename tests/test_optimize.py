@@ -0,0 +1,136 @@
+import sys
+
+from lamblayer.optimize import LayerOptimizer
+
+
+RUNTIME = f"python{sys.version_info[0]}.{sys.version_info[1]}"
+
+
+def make_entries(src, files):
+    """
+    Write the files under src, and return the (path, arcname) pairs with directories.
+    """
+    entries = []
+    dirs = set()
+    for arcname, content in files.items():
+        path = src / arcname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+        parts = arcname.split("/")
+        for i in range(1, len(parts)):
+            directory = "/".join(parts[:i]) + "/"
+            if directory not in dirs:
+                dirs.add(directory)
+                entries.append((str(src.joinpath(*parts[:i])), directory))
+        entries.append((str(path), arcname))
+    return entries
+
+
+def get_arcnames(entries):
+    return [arcname for _, arcname in entries]
+
+
+def test_slim(tmp_path):
+    entries = make_entries(
+        tmp_path / "src",
+        {
+            "python/requests/__init__.py": "x = 1\n",
+            "python/requests/tests/test_api.py": "x = 1\n",
+            "python/requests/__pycache__/__init__.cpython-39.pyc": "pyc",
+            "python/requests-2.0.dist-info/RECORD": "record",
+            "python/requests-2.0.dist-info/METADATA": "metadata",
+            "python/botocore/__init__.py": "x = 1\n",
+            "python/botocore/docs/__init__.py": "x = 1\n",
+            "python/botocore/docs/doc/index.rst": "doc",
+            "python/docs/index.rst": "doc",
+        },
+    )
+    optimizer = LayerOptimizer(slim=True)
+
+    kept = optimizer.apply(entries, str(tmp_path / "work"))
+
+    # a directory of the rules is kept if it is a package, but not under it.
+    assert get_arcnames(kept) == [
+        "python/",
+        "python/requests/",
+        "python/requests/__init__.py",
+        "python/requests-2.0.dist-info/",
+        "python/requests-2.0.dist-info/METADATA",
+        "python/botocore/",
+        "python/botocore/__init__.py",
+        "python/botocore/docs/",
+        "python/botocore/docs/__init__.py",
+    ]
+    assert optimizer.report == {
+        "tests": (1, 6),
+        "bytecode": (1, 3),
+        "dist-info": (1, 6),
+        "docs": (2, 6),
+    }
+
+
+def test_exclude_and_include(tmp_path):
+    entries = make_entries(
+        tmp_path / "src",
+        {
+            "python/my_package/__init__.py": "x = 1\n",
+            "python/my_package/data.csv": "a,b\n",
+            "python/my_package/keep.csv": "a,b\n",
+            "python/my_package/tests/test_a.py": "x = 1\n",
+        },
+    )
+    optimizer = LayerOptimizer(
+        exclude=["*.csv"], include=["*/keep.csv", "*/tests/*"], slim=True
+    )
+
+    kept = optimizer.apply(entries, str(tmp_path / "work"))
+
+    assert get_arcnames(kept) == [
+        "python/",
+        "python/my_package/",
+        "python/my_package/__init__.py",
+        "python/my_package/keep.csv",
+        "python/my_package/tests/",
+        "python/my_package/tests/test_a.py",
+    ]
+    assert optimizer.report == {"exclude *.csv": (1, 4)}
+    assert not LayerOptimizer()
+
+
+def test_pyc_only(tmp_path):
+    entries = make_entries(
+        tmp_path / "src",
+        {
+            "python/small.py": "x = 1\n",
+            "python/large.py": "# comment\n" * 1000,
+            "python/broken.py": "def (\n",
+            "python/data.txt": "text",
+        },
+    )
+    optimizer = LayerOptimizer(pyc_only=RUNTIME)
+
+    optimized = optimizer.apply(entries, str(tmp_path / "work"))
+
+    # a source which can't be compiled is kept as is.
+    assert get_arcnames(optimized) == [
+        "python/",
+        "python/small.pyc",
+        "python/large.pyc",
+        "python/broken.py",
+        "python/data.txt",
+    ]
+    assert all(path.startswith(str(tmp_path / "work")) for path, _ in optimized[1:3])
+    files, saved = optimizer.report["pyc-only"]
+    assert files == 2
+    assert 0 < saved < 10000
+    assert (tmp_path / "src" / "python" / "small.py").exists()
+
+
+def test_pyc_only_small_module(tmp_path):
+    entries = make_entries(tmp_path / "src", {"python/small.py": "x = 1\n"})
+    optimizer = LayerOptimizer(pyc_only=RUNTIME)
+
+    optimizer.apply(entries, str(tmp_path / "work"))
+
+    # the bytecode is larger than the source, which is not a negative saving.
+    assert optimizer.report == {"pyc-only": (1, 0)}
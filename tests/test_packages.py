@@ -0,0 +1,138 @@
+import io
+import os
+import json
+import base64
+import hashlib
+import zipfile
+
+import pytest
+from moto import mock_aws
+
+from lamblayer.create import Create
+from lamblayer.packages import build_packages, get_wheel_cache_dir
+from lamblayer.exceptions import LamblayerCreateLayerError
+
+
+def make_wheel(wheelhouse, name, version, requires=()):
+    """
+    Write a pure python wheel of a package which has only `__init__.py`.
+    """
+    module = name.replace("-", "_")
+    dist_info = f"{module}-{version}.dist-info"
+    metadata = f"Metadata-Version: 2.1\nName: {name}\nVersion: {version}\n"
+    metadata += "".join(f"Requires-Dist: {require}\n" for require in requires)
+    files = {
+        f"{module}/__init__.py": f"__version__ = {version!r}\n",
+        f"{dist_info}/METADATA": metadata,
+        f"{dist_info}/WHEEL": (
+            "Wheel-Version: 1.0\nGenerator: test\n"
+            "Root-Is-Purelib: true\nTag: py3-none-any\n"
+        ),
+    }
+    record = []
+    for arcname, content in files.items():
+        digest = hashlib.sha256(content.encode()).digest()
+        digest = base64.urlsafe_b64encode(digest).rstrip(b"=").decode()
+        record.append(f"{arcname},sha256={digest},{len(content)}")
+    record.append(f"{dist_info}/RECORD,,")
+    files[f"{dist_info}/RECORD"] = "\n".join(record) + "\n"
+
+    path = os.path.join(wheelhouse, f"{module}-{version}-py3-none-any.whl")
+    with zipfile.ZipFile(path, "w") as zf:
+        for arcname, content in files.items():
+            zf.writestr(arcname, content)
+    return path
+
+
+@pytest.fixture
+def wheelhouse(tmp_path):
+    wheelhouse = tmp_path / "wheels"
+    wheelhouse.mkdir()
+    make_wheel(str(wheelhouse), "demo-lib", "1.0")
+    make_wheel(str(wheelhouse), "demo-lib", "2.0")
+    make_wheel(str(wheelhouse), "demo-app", "1.0", ["demo-lib"])
+    return str(wheelhouse)
+
+
+def test_build_packages_offline(tmp_path, wheelhouse):
+    build_dir = str(tmp_path / "build")
+
+    site_packages = build_packages(
+        build_dir, "x86_64", "py39", ["demo-app", "demo-lib==1.0"], 0, wheelhouse, True
+    )
+
+    assert site_packages == os.path.join(
+        build_dir, "python", "lib", "python3.9", "site-packages"
+    )
+    installed = sorted(os.listdir(site_packages))
+    assert "demo_app" in installed and "demo_lib-1.0.dist-info" in installed
+    assert sorted(os.listdir(get_wheel_cache_dir("x86_64", "3.9"))) == [
+        "demo_app-1.0-py3-none-any.whl",
+        "demo_lib-1.0-py3-none-any.whl",
+    ]
+
+    # a changed pin fetches only its wheel into the cache.
+    os.remove(os.path.join(wheelhouse, "demo_app-1.0-py3-none-any.whl"))
+    build_packages(
+        str(tmp_path / "build2"),
+        "x86_64",
+        "py39",
+        ["demo-app", "demo-lib==2.0"],
+        0,
+        wheelhouse,
+        True,
+    )
+    assert sorted(os.listdir(get_wheel_cache_dir("x86_64", "3.9"))) == [
+        "demo_app-1.0-py3-none-any.whl",
+        "demo_lib-1.0-py3-none-any.whl",
+        "demo_lib-2.0-py3-none-any.whl",
+    ]
+
+
+def test_build_packages_no_deps(tmp_path, wheelhouse):
+    site_packages = build_packages(
+        str(tmp_path / "build"), "arm64", "python3.9", ["demo-app"], 1, wheelhouse, True
+    )
+
+    assert "demo_lib" not in os.listdir(site_packages)
+    assert "demo_app" in os.listdir(site_packages)
+
+
+def test_build_packages_offline_missing_wheel(tmp_path, wheelhouse):
+    with pytest.raises(LamblayerCreateLayerError):
+        build_packages(
+            str(tmp_path / "build"), "x86_64", "py39", ["requests"], 0, wheelhouse, True
+        )
+
+
+def test_create_packages_offline(tmp_path, wheelhouse, layer_json, monkeypatch):
+    packages_json = tmp_path / "packages.json"
+    packages_json.write_text(
+        json.dumps({"Arch": "x86_64", "Runtime": "py39", "Packages": ["demo-app"]})
+    )
+    archives = []
+    create_ziparchive = Create._create_ziparchive
+
+    def record_ziparchive(self, *args, **kwargs):
+        archives.append(create_ziparchive(self, *args, **kwargs))
+        return archives[-1]
+
+    monkeypatch.setattr(Create, "_create_ziparchive", record_ziparchive)
+
+    with mock_aws():
+        results = Create(None, "us-east-1", "WARNING").create(
+            str(packages_json),
+            None,
+            "",
+            "",
+            layer_json,
+            wheelhouse=wheelhouse,
+            offline=True,
+        )
+    assert [result["Status"] for result in results] == ["created"]
+
+    with zipfile.ZipFile(io.BytesIO(archives[0])) as zf:
+        names = zf.namelist()
+    site_packages = "python/lib/python3.9/site-packages"
+    assert f"{site_packages}/demo_app/__init__.py" in names
+    assert f"{site_packages}/demo_lib/__init__.py" in names
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+
+from click.testing import CliRunner
+
+from lamblayer.cli import main
+from lamblayer.profile import Profile
+
+
+def make_layer(path):
+    package = path / "python" / "my_package"
+    package.mkdir(parents=True)
+    (package / "__init__.py").write_text("import json\nVALUE = 1\n")
+    return path
+
+
+def test_profile_layer_without_aws(tmp_path, monkeypatch):
+    # the profiler runs local interpreters only, and needs no credentials.
+    monkeypatch.delenv("AWS_ACCESS_KEY_ID")
+    monkeypatch.delenv("AWS_SECRET_ACCESS_KEY")
+    src = make_layer(tmp_path / "src")
+
+    result = Profile("WARNING").profile_layer(src=str(src), repeat=1)
+
+    assert result["Imports"] == ["my_package"]
+    assert result["Errors"] == {}
+    assert "python/my_package" in [package["Package"] for package in result["Packages"]]
+
+
+def test_profile_does_not_import_boto3():
+    code = "import sys, lamblayer.profile; print('boto3' in sys.modules)"
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+    assert output.strip() == "False"
+
+
+def test_profile_cli(tmp_path):
+    src = make_layer(tmp_path / "src")
+
+    result = CliRunner().invoke(
+        main, ["profile", "--src", str(src), "--repeat", "1", "--output", "json"]
+    )
+
+    assert result.exit_code == 0, result.output
+    assert "python/my_package" in result.output
@@ -0,0 +1,93 @@
+import boto3
+import pytest
+from moto import mock_aws
+
+from lamblayer.prune import Prune
+
+from .helpers import make_functions, publish_layer
+
+
+@pytest.fixture
+def layers():
+    with mock_aws():
+        yield [publish_layer("my_layer") for _ in range(5)]
+
+
+@pytest.fixture
+def prune():
+    return Prune(None, "us-east-1", "WARNING")
+
+
+def get_versions(layer_name="my_layer"):
+    return [
+        layer_version["Version"]
+        for layer_version in boto3.client("lambda").list_layer_versions(
+            LayerName=layer_name
+        )["LayerVersions"]
+    ]
+
+
+def get_reasons(plans):
+    return {plan["Version"]: plan["Reason"] or plan["Status"] for plan in plans}
+
+
+def test_prune_keeps_latest(prune, layers):
+    plans = prune(keep=2, yes=True)
+
+    assert get_reasons(plans) == {
+        5: "latest",
+        4: "latest",
+        3: "deleted",
+        2: "deleted",
+        1: "deleted",
+    }
+    assert sorted(get_versions()) == [4, 5]
+
+
+def test_prune_keeps_referenced(prune, layers):
+    make_functions(1, layers=[layers[0]])
+
+    plans = prune(keep=1, yes=True)
+
+    assert get_reasons(plans)[1] == "referenced"
+    assert sorted(get_versions()) == [1, 5]
+
+
+def test_prune_keeps_recent(prune, layers):
+    plans = prune(keep=1, older_than=1, yes=True)
+
+    assert set(get_reasons(plans).values()) == {"latest", "recent"}
+    assert len(get_versions()) == 5
+
+
+def test_prune_keeps_shared(prune, layers):
+    boto3.client("lambda").add_layer_version_permission(
+        LayerName="my_layer",
+        VersionNumber=2,
+        StatementId="share",
+        Action="lambda:GetLayerVersion",
+        Principal="210987654321",
+    )
+
+    plans = prune(keep=1, yes=True)
+
+    assert get_reasons(plans)[2] == "shared"
+    assert sorted(get_versions()) == [2, 5]
+
+
+def test_prune_dry_run(prune, layers):
+    plans = prune(keep=1, dry_run=True)
+
+    assert [plan["Status"] for plan in plans] == ["keep"] + ["delete"] * 4
+    assert len(get_versions()) == 5
+
+
+def test_prune_layer_patterns(prune, layers):
+    publish_layer("other_layer")
+    publish_layer("other_layer")
+
+    plans = prune(layers=["other_*"], keep=1, yes=True)
+
+    assert {plan["LayerName"] for plan in plans} == {"other_layer"}
+    assert get_versions("other_layer") == [2]
+    assert len(get_versions()) == 5
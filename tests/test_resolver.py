@@ -0,0 +1,151 @@
+import json
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from lamblayer.retry import Retrier
+from lamblayer.resolver import LayerResolver, _parse_constraint, parse_layer_spec
+from lamblayer.exceptions import (
+    LamblayerInvalidOptionError,
+    LamblayerResolveLayerError,
+)
+
+from .helpers import publish_layer
+
+
+@pytest.mark.parametrize(
+    "rule, constraints",
+    [
+        ("^1.2.3", [(">=", (1, 2, 3)), ("<", (2, 0, 0))]),
+        ("^1", [(">=", (1, 0, 0)), ("<", (2, 0, 0))]),
+        ("^0.2.3", [(">=", (0, 2, 3)), ("<", (0, 3, 0))]),
+        ("^0.0.3", [(">=", (0, 0, 3)), ("<", (0, 0, 4))]),
+        ("^0.0", [(">=", (0, 0, 0)), ("<", (0, 1, 0))]),
+        ("^0", [(">=", (0, 0, 0)), ("<", (1, 0, 0))]),
+        ("~1.2.3", [(">=", (1, 2, 3)), ("<", (1, 3, 0))]),
+        ("~1.2", [(">=", (1, 2, 0)), ("<", (1, 3, 0))]),
+        ("~1", [(">=", (1, 0, 0)), ("<", (2, 0, 0))]),
+        ("1.2.3", [("==", (1, 2, 3))]),
+        ("v1.2", [(">=", (1, 2, 0)), ("<", (1, 3, 0))]),
+        ("1", [(">=", (1, 0, 0)), ("<", (2, 0, 0))]),
+        (">=1.2", [(">=", (1, 2, 0))]),
+        ("!=1.2.3", [("!=", (1, 2, 3))]),
+        ("< 2", [("<", (2, 0, 0))]),
+    ],
+)
+def test_parse_constraint(rule, constraints):
+    assert _parse_constraint(rule, f"my_layer@{rule}") == constraints
+
+
+@pytest.mark.parametrize("rule", ["^", "1.2.3.4", "=>1", "1.x", "runtime"])
+def test_parse_constraint_invalid(rule):
+    with pytest.raises(LamblayerInvalidOptionError):
+        _parse_constraint(rule, f"my_layer@{rule}")
+
+
+def test_parse_layer_spec():
+    assert parse_layer_spec("my_layer@runtime=python3.9, arch=arm64,>=1.2,<2") == (
+        "my_layer",
+        {"CompatibleRuntime": "python3.9", "CompatibleArchitecture": "arm64"},
+        [(">=", (1, 2, 0)), ("<", (2, 0, 0))],
+    )
+    assert parse_layer_spec("my_layer@latest") == ("my_layer", {}, [])
+
+
+def count_calls(client):
+    calls = []
+    client.meta.events.register(
+        "before-call.lambda.*", lambda model, **kwargs: calls.append(model.name)
+    )
+    return calls
+
+
+@pytest.fixture
+def layers():
+    with mock_aws():
+        arns = [
+            publish_layer("my_layer", description)
+            for description in [
+                "my layer v1.2.0",
+                "my layer v1.3.0",
+                "my layer v1.3.0",
+                "my layer v2.0.0",
+                "no version",
+            ]
+        ]
+        yield arns
+
+
+def make_resolver(**kwargs):
+    return LayerResolver(
+        boto3.client("lambda"), Retrier(), "us-east-1", "123456789012", **kwargs
+    )
+
+
+def test_resolve_remote(layers):
+    resolver = make_resolver()
+
+    assert resolver.resolve("my_layer") == layers[4]
+    assert resolver.resolve("my_layer@latest") == layers[4]
+    # the highest matching semver, and the newest version of it.
+    assert resolver.resolve("my_layer@^1.2") == layers[2]
+    assert resolver.resolve("my_layer@~1.2") == layers[0]
+    assert resolver.resolve("my_layer@>=1,<3") == layers[3]
+    assert resolver.resolve(layers[1]) == layers[1]
+    with pytest.raises(LamblayerResolveLayerError):
+        resolver.resolve("my_layer@^3")
+
+
+def test_resolve_once(layers):
+    resolver = make_resolver()
+    calls = count_calls(resolver.client)
+
+    for _ in range(3):
+        resolver.resolve("my_layer@^1.2")
+    assert calls == ["ListLayerVersions"]
+
+
+def test_lockfile_round_trip(layers, tmp_path):
+    lockfile = str(tmp_path / "lamblayer.lock.json")
+    resolver = make_resolver(lockfile=lockfile)
+    assert resolver.resolve("my_layer@^1.2") == layers[2]
+    resolver.save()
+
+    locked = json.loads(open(lockfile).read())
+    assert locked == {
+        "Layers": {"123456789012:us-east-1": {"my_layer@^1.2": layers[2]}}
+    }
+
+    # a newer version doesn't change the locked one, and no API is called.
+    publish_layer("my_layer", "my layer v1.4.0")
+    resolver = make_resolver(lockfile=lockfile)
+    calls = count_calls(resolver.client)
+    assert resolver.resolve("my_layer@^1.2") == layers[2]
+    assert calls == []
+
+    resolver = make_resolver(lockfile=lockfile, update_lock=True)
+    assert resolver.resolve("my_layer@^1.2").endswith(":6")
+
+    # another account doesn't use the locked layers.
+    resolver = LayerResolver(
+        boto3.client("lambda"),
+        Retrier(),
+        "us-east-1",
+        "210987654321",
+        lockfile=lockfile,
+    )
+    calls = count_calls(resolver.client)
+    resolver.resolve("my_layer@^1.2")
+    assert calls == ["ListLayerVersions"]
+
+
+def test_resolve_ttl_cache(layers, tmp_path):
+    resolver = make_resolver(ttl=60, cache_dir=str(tmp_path))
+    resolver.resolve("my_layer")
+    resolver.save()
+
+    resolver = make_resolver(ttl=60, cache_dir=str(tmp_path))
+    calls = count_calls(resolver.client)
+    assert resolver.resolve("my_layer") == layers[4]
+    assert calls == []
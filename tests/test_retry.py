@@ -0,0 +1,159 @@
+import time
+
+import pytest
+from botocore.exceptions import ClientError
+from moto import mock_aws
+
+from lamblayer import retry as retry_module
+from lamblayer.exceptions import LamblayerUpdateFunctionError
+from lamblayer.retry import Retrier, TokenBucket
+from lamblayer.set import Set
+
+from .helpers import get_function_layers, make_functions, publish_layer
+
+
+def client_error(code):
+    return ClientError({"Error": {"Code": code, "Message": code}}, "Operation")
+
+
+class FlakyMethod:
+    """
+    A client method which fails with the error codes in order, then succeeds.
+    """
+
+    __name__ = "flaky_method"
+
+    def __init__(self, *codes):
+        self.codes = list(codes)
+        self.calls = []
+
+    def __call__(self, **kwargs):
+        self.calls.append(kwargs)
+        if self.codes:
+            raise client_error(self.codes.pop(0))
+        return {"Called": len(self.calls)}
+
+
+@pytest.fixture
+def delays(monkeypatch):
+    delays = []
+    monkeypatch.setattr(retry_module.time, "sleep", delays.append)
+    return delays
+
+
+def test_token_bucket():
+    bucket = TokenBucket(rate=100, capacity=5)
+
+    started_at = time.monotonic()
+    for _ in range(25):
+        bucket.acquire()
+
+    # a burst of the capacity, and the rest at the rate.
+    assert time.monotonic() - started_at >= 0.19
+
+
+def test_retrier_retries(delays):
+    retrier = Retrier(rate_limit=1000, base_delay=1, max_delay=3)
+    method = FlakyMethod(
+        "TooManyRequestsException",
+        "ResourceConflictException",
+        "TooManyRequestsException",
+    )
+
+    assert retrier.call(method, FunctionName="f") == {"Called": 4}
+    assert method.calls == [{"FunctionName": "f"}] * 4
+    # jittered backoff, doubling up to max_delay.
+    assert len(delays) == 3
+    assert all(0 <= delay <= limit for delay, limit in zip(delays, [2, 3, 3]))
+
+
+def test_retrier_gives_up(delays):
+    retrier = Retrier(rate_limit=1000, max_attempts=3)
+
+    method = FlakyMethod(*["ThrottlingException"] * 3)
+    with pytest.raises(ClientError, match="ThrottlingException"):
+        retrier.call(method)
+    assert len(method.calls) == 3
+
+    # other errors are raised without retrying.
+    method = FlakyMethod("ResourceNotFoundException")
+    with pytest.raises(ClientError, match="ResourceNotFoundException"):
+        retrier.call(method)
+    assert len(method.calls) == 1
+    assert len(delays) == 2
+
+
+def test_retrier_paginate(delays):
+    pages = {None: ([1, 2], "m1"), "m1": ([3], "m2"), "m2": ([], None)}
+
+    def list_items(Marker=None, **kwargs):
+        items, marker = pages[Marker]
+        response = {"Items": items}
+        if marker is not None:
+            response["NextMarker"] = marker
+        return response
+
+    retrier = Retrier(rate_limit=1000)
+    assert list(retrier.paginate(list_items, "Items", MaxItems=2)) == [[1, 2], [3], []]
+
+
+def test_wait_function_updated(delays):
+    class Client:
+        def __init__(self, statuses):
+            self.statuses = list(statuses)
+
+        def get_function_configuration(self, FunctionName):
+            return {
+                "LastUpdateStatus": self.statuses.pop(0),
+                "LastUpdateStatusReason": "broken layer",
+            }
+
+    retrier = Retrier(rate_limit=1000)
+    client = Client(["InProgress", "InProgress", "Successful"])
+    configuration = retrier.wait_function_updated(client, "f", interval=0.5)
+    assert configuration["LastUpdateStatus"] == "Successful"
+    assert delays == [0.5, 0.5]
+
+    with pytest.raises(LamblayerUpdateFunctionError, match="broken layer"):
+        retrier.wait_function_updated(Client(["InProgress", "Failed"]), "f")
+
+
+def test_set_retries_conflicting_update(delays):
+    with mock_aws():
+        layer_arn = publish_layer("my_layer")
+        make_functions(2)
+        set_command = Set(None, "us-east-1", "WARNING")
+        set_command.retrier = Retrier(rate_limit=1000)
+        errors = ["TooManyRequestsException", "ResourceConflictException"]
+
+        # the first updates fail, as if another update is in progress.
+        def conflict(params, **kwargs):
+            if errors and params["FunctionName"] == "function0":
+                raise client_error(errors.pop(0))
+
+        events = set_command._get_client("lambda").meta.events
+        events.register(
+            "provide-client-params.lambda.UpdateFunctionConfiguration", conflict
+        )
+        try:
+            plans = set_command.apply_plans(
+                [
+                    {
+                        "FunctionName": f"function{i}",
+                        "Status": "update",
+                        "Layers": [layer_arn],
+                    }
+                    for i in range(2)
+                ],
+                wait=True,
+            )
+        finally:
+            events.unregister(
+                "provide-client-params.lambda.UpdateFunctionConfiguration", conflict
+            )
+
+        assert [plan["Status"] for plan in plans] == ["updated", "updated"]
+        assert len(delays) == 2
+        assert [get_function_layers(f"function{i}") for i in range(2)] == [
+            [layer_arn]
+        ] * 2
@@ -0,0 +1,167 @@
+import json
+
+import pytest
+from moto import mock_aws
+
+from lamblayer.exceptions import LamblayerInvalidOptionError
+from lamblayer.set import Set, expand_function_paths
+
+from .helpers import get_function_layers, make_functions, publish_layer
+
+
+@pytest.fixture
+def layers():
+    with mock_aws():
+        yield {
+            "v1": publish_layer("my_layer", "v1.2.0"),
+            "v2": publish_layer("my_layer", "v2.0.0"),
+            "other": publish_layer("other_layer"),
+        }
+
+
+@pytest.fixture
+def set_command(layers):
+    make_functions(1)
+    return Set(None, "us-east-1", "WARNING")
+
+
+def write_json(path, obj):
+    path.write_text(json.dumps(obj))
+    return str(path)
+
+
+def read_json(path):
+    return json.loads(open(path).read())
+
+
+def test_set_keeps_pinned_specs(set_command, layers, tmp_path):
+    function_path = write_json(
+        tmp_path / "function.json",
+        {"FunctionName": "function0", "Layers": ["my_layer@^1", "other_layer"]},
+    )
+
+    set_command(function_path)
+
+    assert get_function_layers("function0") == [layers["v1"], layers["other"]]
+    # the rule is kept for the next run, and the plain name is resolved for lambroll.
+    assert read_json(function_path)["Layers"] == ["my_layer@^1", layers["other"]]
+
+
+def test_set_with_lockfile_keeps_specs(set_command, layers, tmp_path):
+    function = {"FunctionName": "function0", "Layers": ["my_layer@^1", "other_layer"]}
+    function_path = write_json(tmp_path / "function.json", function)
+    lockfile = str(tmp_path / "lamblayer.lock.json")
+
+    set_command(function_path, lockfile=lockfile)
+    assert read_json(function_path) == function
+
+    # the next run resolves the specs from the lockfile, ignoring a newer version.
+    publish_layer("other_layer")
+    plans = set_command(function_path, lockfile=lockfile)
+    assert [plan["Status"] for plan in plans] == ["unchanged"]
+    assert get_function_layers("function0") == [layers["v1"], layers["other"]]
+
+
+@pytest.fixture
+def lambda_calls(set_command):
+    """
+    Record the names of the Lambda API calls of set_command.
+    """
+    calls = []
+
+    def record(model, **kwargs):
+        calls.append(model.name)
+
+    events = set_command._get_client("lambda").meta.events
+    events.register("before-call.lambda.*", record)
+    yield calls
+    events.unregister("before-call.lambda.*", record)
+
+
+def test_set_skips_unchanged(set_command, layers, tmp_path, lambda_calls, capsys):
+    make_functions(2, layers=[layers["v1"], layers["other"]], prefix="current")
+    function_path = write_json(
+        tmp_path / "functions.json",
+        {
+            "Functions": [
+                {"FunctionName": "current0", "Layers": ["my_layer@^1", "other_layer"]},
+                {"FunctionName": "current1", "Layers": ["other_layer", "my_layer@^1"]},
+                {"FunctionName": "function0", "Layers": "my_layer"},
+            ]
+        },
+    )
+
+    plans = set_command(function_path)
+
+    assert [plan["Status"] for plan in plans] == ["unchanged", "updated", "updated"]
+    assert lambda_calls.count("UpdateFunctionConfiguration") == 2
+    assert get_function_layers("current1") == [layers["other"], layers["v1"]]
+    assert get_function_layers("function0") == [layers["v2"]]
+    out = capsys.readouterr().out
+    assert "~ current0" not in out
+    assert (
+        f"~ current1\n    (order changed)\n~ function0\n    + {layers['v2']}\n" in out
+    )
+    assert "Plan: 2 to update, 1 unchanged." in out
+
+
+def test_set_dry_run(set_command, layers, tmp_path, lambda_calls, capsys):
+    function = {"FunctionName": "function0", "Layers": ["my_layer", "missing"]}
+    function_path = write_json(tmp_path / "function.json", function)
+    lockfile = tmp_path / "lamblayer.lock.json"
+
+    plans = set_command(function_path, dry_run=True, lockfile=str(lockfile))
+
+    assert [plan["Status"] for plan in plans] == ["failed"]
+    function["Layers"] = ["my_layer"]
+    write_json(tmp_path / "function.json", function)
+    plans = set_command(function_path, dry_run=True, lockfile=str(lockfile))
+
+    # neither the function, function.json nor the lockfile is written.
+    assert [plan["Status"] for plan in plans] == ["update"]
+    assert plans[0]["Layers"] == [layers["v2"]]
+    assert "UpdateFunctionConfiguration" not in lambda_calls
+    assert get_function_layers("function0") == []
+    assert read_json(function_path) == function
+    assert not lockfile.exists()
+    assert "Plan: 1 to update, 0 unchanged." in capsys.readouterr().out
+
+
+def test_expand_function_paths(tmp_path):
+    functions_dir = tmp_path / "functions"
+    functions_dir.mkdir()
+    paths = [write_json(functions_dir / f"{name}.json", {}) for name in ("b", "a", "c")]
+    (functions_dir / "README.md").write_text("")
+
+    # directories and globs are sorted, and duplicates are dropped.
+    assert expand_function_paths(
+        [str(functions_dir), str(tmp_path / "*" / "[ab].json"), paths[0]]
+    ) == sorted(paths)
+    with pytest.raises(LamblayerInvalidOptionError, match="no function config"):
+        expand_function_paths([str(tmp_path / "*.json")])
+
+
+def test_set_manifest_and_directory(set_command, layers, tmp_path):
+    make_functions(3, prefix="bulk")
+    functions_dir = tmp_path / "functions"
+    functions_dir.mkdir()
+    manifest = {
+        "Functions": [
+            {"FunctionName": "bulk0", "Layers": "other_layer"},
+            {"FunctionName": "bulk1", "Layers": ["my_layer@^1", "other_layer"]},
+        ]
+    }
+    manifest_path = write_json(functions_dir / "manifest.json", manifest)
+    write_json(functions_dir / "bulk2.json", {"FunctionName": "bulk2", "Layers": []})
+
+    plans = set_command([str(functions_dir), manifest_path])
+
+    assert [plan["FunctionName"] for plan in plans] == ["bulk2", "bulk0", "bulk1"]
+    assert [plan["Status"] for plan in plans] == ["unchanged", "updated", "updated"]
+    assert get_function_layers("bulk0") == [layers["other"]]
+    assert get_function_layers("bulk1") == [layers["v1"], layers["other"]]
+    # the manifest keeps the pinning rule of each function.
+    assert read_json(manifest_path)["Functions"][1]["Layers"] == [
+        "my_layer@^1",
+        layers["other"],
+    ]
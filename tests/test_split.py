@@ -0,0 +1,228 @@
+import json
+
+import pytest
+
+from lamblayer.create import Create
+from lamblayer.split import LayerSplitter, assign_parts, get_unit
+
+
+def get_loads(sizes, assignment, parts):
+    loads = [0] * parts
+    for unit, part in assignment.items():
+        loads[part] += sizes[unit]
+    return loads
+
+
+def test_assign_parts_balance():
+    sizes = {f"unit{i}": size for i, size in enumerate([50, 40, 30, 20, 10, 10])}
+
+    assignment = assign_parts(sizes, 2)
+
+    assert set(assignment) == set(sizes)
+    assert sorted(get_loads(sizes, assignment, 2)) == [80, 80]
+
+
+def test_assign_parts_oversize_unit():
+    sizes = {"large": 1000, "a": 10, "b": 10, "c": 10, "d": 10}
+
+    assignment = assign_parts(sizes, 3)
+
+    # a unit is never split, so the large one takes a part alone.
+    assert [unit for unit in sizes if assignment[unit] == assignment["large"]] == [
+        "large"
+    ]
+    assert sorted(get_loads(sizes, assignment, 3)) == [20, 20, 1000]
+
+
+def test_assign_parts_empty_units():
+    sizes = {"a": 0, "b": 0, "c": 100, "d": 10, "e": 10}
+    previous = {"a": 0, "c": 0, "d": 0, "e": 0}
+
+    assignment = assign_parts(sizes, 2, previous)
+
+    # empty units stay in place while the others are moved, and a new one goes to
+    # the smallest part.
+    assert assignment == {"a": 0, "b": 1, "c": 0, "d": 1, "e": 1}
+    assert assign_parts({"a": 0, "b": 0}, 3) == {"a": 0, "b": 0}
+
+
+def test_assign_parts_previous():
+    sizes = {"a": 30, "b": 30, "c": 30, "d": 30}
+    previous = {"a": 0, "b": 1, "c": 1, "d": 1, "gone": 0}
+
+    assignment = assign_parts(sizes, 2, previous)
+
+    # the units stay in place within the slack, and the rest is moved.
+    assert assignment["a"] == 0 and assignment["c"] == 1
+    assert get_loads(sizes, assignment, 2) == [60, 60]
+    assert "gone" not in assignment
+    # a part out of range is assigned again.
+    assert assign_parts({"a": 10}, 2, {"a": 5}) == {"a": 0}
+    assert assign_parts({"a": 10, "b": 10}, 2, {"a": 1, "b": 1}) == {"a": 0, "b": 1}
+
+
+def test_get_unit():
+    aliases = {"python/yaml": "python/pyyaml", "python/_yaml": "python/pyyaml"}
+
+    assert get_unit("python/yaml/__init__.py", aliases) == "python/pyyaml"
+    assert get_unit("python/_yaml.cpython-39-x86_64-linux-gnu.so", aliases) == (
+        "python/pyyaml"
+    )
+    assert get_unit("python/PyYAML-6.0.dist-info/RECORD") == "python/pyyaml"
+    assert get_unit("python/six.py") == "python/six"
+    assert get_unit("python/__pycache__/six.cpython-39.pyc") == "python/six"
+    assert get_unit("nodejs/node_modules/left-pad/index.js") == (
+        "nodejs/node_modules/left_pad"
+    )
+    assert get_unit("bin/tool") == "bin"
+
+
+def make_entries(tmp_path, files):
+    entries = [(str(tmp_path), "python/")]
+    dirs = {"python/"}
+    for arcname, size in files.items():
+        path = tmp_path / arcname
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(b"x" * size)
+        for i, char in enumerate(arcname):
+            if char == "/" and arcname[: i + 1] not in dirs:
+                dirs.add(arcname[: i + 1])
+                entries.append((str(path.parent), arcname[: i + 1]))
+        entries.append((str(path), arcname))
+    return entries
+
+
+FILES = {
+    "python/yaml/__init__.py": 300,
+    "python/_yaml.so": 100,
+    "python/PyYAML-6.0.dist-info/top_level.txt": 0,
+    "python/requests/__init__.py": 350,
+    "python/six.py": 200,
+    "python/empty/__init__.py": 0,
+}
+
+
+@pytest.fixture
+def entries(tmp_path):
+    entries = make_entries(tmp_path / "src", FILES)
+    (tmp_path / "src" / "python/PyYAML-6.0.dist-info/top_level.txt").write_text(
+        "_yaml\nyaml\n"
+    )
+    return entries
+
+
+def get_parts(parts):
+    return [
+        sorted(arcname for _, arcname in part if not arcname.endswith("/"))
+        for part in parts
+    ]
+
+
+def test_layer_splitter(tmp_path, entries):
+    splitter = LayerSplitter(2, cache_dir=str(tmp_path / "cache"))
+
+    parts = splitter.split("my_layer", entries)
+
+    # a distribution is kept in one part with its metadata, by top_level.txt.
+    assert get_parts(parts) == [
+        [
+            "python/PyYAML-6.0.dist-info/top_level.txt",
+            "python/_yaml.so",
+            "python/empty/__init__.py",
+            "python/yaml/__init__.py",
+        ],
+        ["python/requests/__init__.py", "python/six.py"],
+    ]
+    # the directories go to the parts with files under them.
+    assert [arcname for _, arcname in parts[1] if arcname.endswith("/")] == [
+        "python/",
+        "python/requests/",
+    ]
+
+
+def test_layer_splitter_reuses_state(tmp_path, entries):
+    cache_dir = tmp_path / "cache"
+    first = get_parts(
+        LayerSplitter(2, cache_dir=str(cache_dir)).split("my_layer", entries)
+    )
+
+    # a new package goes to the smaller part, and the others stay in place.
+    entries += make_entries(tmp_path / "new", {"python/attrs/__init__.py": 50})[1:]
+    second = get_parts(
+        LayerSplitter(2, cache_dir=str(cache_dir)).split("my_layer", entries)
+    )
+    assert second == [sorted(first[0] + ["python/attrs/__init__.py"]), first[1]]
+    state = json.loads((cache_dir / "splits" / "my_layer.json").read_text())
+    assert state["Parts"] == 2 and state["Units"]["python/attrs"] == 0
+
+    # the state of another number of parts is not used.
+    third = LayerSplitter(3, cache_dir=str(cache_dir)).split("my_layer", entries)
+    assert len(third) == 3
+
+
+def write_function_json(path, function):
+    path.write_text(json.dumps(function))
+    return str(path)
+
+
+def read_layers(path):
+    function = json.loads(open(path).read())
+    return [f["Layers"] for f in function.get("Functions", [function])]
+
+
+def make_results(*arns, region="us-east-1"):
+    return [{"Profile": None, "Region": region, "LayerVersionArn": arn} for arn in arns]
+
+
+ARN = "arn:aws:lambda:us-east-1:123456789012:layer"
+
+
+def test_update_function_json(tmp_path):
+    create = Create(None, "us-east-1", "WARNING")
+    function_path = write_function_json(
+        tmp_path / "function.json",
+        {
+            "FunctionName": "function0",
+            "Layers": ["other", f"{ARN}:my_layer-1:1", "my_layer-2@^1", "last"],
+        },
+    )
+    results = make_results(f"{ARN}:my_layer-1:2", f"{ARN}:my_layer-2:2") + make_results(
+        f"{ARN}:my_layer-1:9", region="us-west-2"
+    )
+
+    create._update_function_json(function_path, "my_layer", results)
+
+    # the parts replace the old ones at the first of them, only from the first target.
+    assert read_layers(function_path) == [
+        ["other", f"{ARN}:my_layer-1:2", f"{ARN}:my_layer-2:2", "last"]
+    ]
+
+
+def test_update_function_json_manifest(tmp_path):
+    create = Create(None, "us-east-1", "WARNING")
+    function_path = write_function_json(
+        tmp_path / "functions.json",
+        {
+            "Functions": [
+                {"FunctionName": "function0", "Layers": "my_layer"},
+                {"FunctionName": "function1"},
+                {"FunctionName": "function2", "Layers": ["my_layer_other"]},
+            ]
+        },
+    )
+
+    create._update_function_json(
+        function_path, "my_layer", make_results(f"{ARN}:my_layer:3")
+    )
+
+    assert read_layers(function_path) == [
+        [f"{ARN}:my_layer:3"],
+        [f"{ARN}:my_layer:3"],
+        ["my_layer_other", f"{ARN}:my_layer:3"],
+    ]
+
+    # a failed part leaves the file as is.
+    create._update_function_json(
+        function_path, "my_layer", make_results(f"{ARN}:my_layer:4", None)
+    )
+    assert read_layers(function_path)[0] == [f"{ARN}:my_layer:3"]